@@ -0,0 +1,90 @@
+"""
+Times every Excel engine of r2r_pipelines.excel_io on real workbooks and checks they return the same frames.
+
+    python -m benchmarks.excel_engines "//10.99.75.198/Qlik/dna_sandbox/raw_data/mohe_database"
+    python -m benchmarks.excel_engines fees.xlsx --sheets TU TC --header 5
+
+Each workbook (or every .xlsx in a folder) is read sheet by sheet with each engine. The report shows the
+best of --repeat timings per engine and whether the frame equals the 'openpyxl' one, the reference the
+pipelines were written against.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+REFERENCE_ENGINE = 'openpyxl'
+
+
+def workbook_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.xlsx'))
+        else:
+            yield path
+
+
+def time_read(path, sheet, engine, repeat, **kwargs):
+    from r2r_pipelines.excel_io import read_excel
+
+    best, df = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read_excel(path, sheet_name=sheet, engine=engine, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, df
+
+
+def same_frame(left, right):
+    try:
+        pd.testing.assert_frame_equal(left, right, check_dtype=False)
+        return True
+    except AssertionError:
+        return False
+
+
+def run(paths, sheets=None, engines=None, repeat=1, **kwargs):
+    from r2r_pipelines.excel_io import EXCEL_ENGINES, sheet_names
+
+    engines = engines or list(EXCEL_ENGINES)
+    results = []
+    for path in workbook_paths(paths):
+        for sheet in sheets or sheet_names(path):
+            frames = {engine: time_read(path, sheet, engine, repeat, **kwargs) for engine in engines}
+            reference = frames[REFERENCE_ENGINE][1] if REFERENCE_ENGINE in frames \
+                else time_read(path, sheet, REFERENCE_ENGINE, 1, **kwargs)[1]
+            for engine, (seconds, df) in frames.items():
+                results.append({'workbook': os.path.basename(path), 'sheet': sheet, 'engine': engine,
+                                'seconds': seconds, 'rows': len(df), 'same': same_frame(df, reference)})
+    return results
+
+
+def print_report(results):
+    print(f"\n{'workbook':<45}{'sheet':<25}{'engine':<18}{'seconds':>10}{'rows':>10}  output")
+    for r in results:
+        print(f"{r['workbook'][:44]:<45}{str(r['sheet'])[:24]:<25}{r['engine']:<18}{r['seconds']:>10.3f}"
+              f"{r['rows']:>10}  {'identical' if r['same'] else 'DIFFERENT'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Workbooks or folders of workbooks')
+    parser.add_argument('--sheets', nargs='*', help='Sheet names (default: every sheet)')
+    parser.add_argument('--engines', nargs='*', help='Engines to compare (default: all)')
+    parser.add_argument('--header', type=int, default=0)
+    parser.add_argument('--nrows', type=int)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    results = run(args.paths, args.sheets, args.engines, args.repeat, header=args.header, nrows=args.nrows)
+    print_report(results)
+
+    if not all(r['same'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
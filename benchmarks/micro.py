@@ -0,0 +1,210 @@
+"""
+Micro-benchmarks for the row-level business rules, applied the same way the pipelines apply them.
+
+    python -m benchmarks.micro                       # run and compare with benchmarks/micro_baseline.json
+    python -m benchmarks.micro --update-baseline     # record the current timings and outputs as the baseline
+
+Inputs are generated with fixed seeds, so every run sees identical data. Each case stores the best of
+--repeat timings and a hash of its output. The comparison fails (exit code 1) when an output hash differs
+from the baseline, and flags cases slower than --tolerance x baseline. A replacement rule therefore has to
+keep the hash and should show a speedup below 1.0.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'micro_baseline.json')
+SEED = 42
+
+
+def prepare_imports():
+    # r2r_pipelines reads prog_master_file.xlsx at import; point it at a synthetic mapping folder
+    if 'R2R_STG_DIR' not in os.environ:
+        from benchmarks.synthetic import share_paths, make_programmes, write_prog_master
+        root = os.path.join(tempfile.gettempdir(), 'r2r_micro_share')
+        paths = share_paths(root)
+        if not (paths['mapping']/'prog_master_file.xlsx').exists():
+            os.makedirs(paths['mapping'], exist_ok=True)
+            rng = np.random.default_rng(SEED)
+            write_prog_master(paths, rng, make_programmes(rng, 200))
+        os.environ['R2R_STG_DIR'] = root
+
+
+def output_hash(result):
+    values = result.tolist() if isinstance(result, pd.Series) else list(result)
+    return hashlib.sha1('\x1f'.join(map(repr, values)).encode()).hexdigest()
+
+
+def segment_frame(rng, n):
+    return pd.DataFrame({
+        'bucket_domestic_int': rng.choice(['Domestic', 'International', 'ISR', 'Others'], n),
+        'owner_role': rng.choice(['Domestic Sales', 'ISR Team', 'Progression Team', 'Admin'], n),
+        'market_segment': rng.choice(['Domestic', 'Progression', 'International'], n),
+    })
+
+
+def withdrawal_frame(rng, n):
+    base = pd.Timestamp('2024-01-01')
+    days = lambda: base + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+    withdrawn = days().to_series(index=range(n))
+    withdrawn[rng.random(n) < 0.3] = pd.NaT
+    return pd.DataFrame({
+        'programme_status': rng.choice(['Registered', 'Withdrawn (Post-commencement)', 'Cancelled', None], n),
+        'withdrawn_date': withdrawn,
+        'intakeclosingdate': days(),
+        'registered_date': days(),
+    })
+
+
+def ipt_frame(rng, n):
+    return pd.DataFrame({
+        'prev_intake_year': rng.choice([2022, 2023, 2024], n),
+        'prog_intake_year': rng.choice([2023, 2024], n),
+        'prev_prog_status': rng.choice(['Transfer Out', 'Registered', 'Transferred (Institution)', None], n),
+        'ipt_note': rng.choice(['IPT without task', 'IPT from previous year', 'Other', None], n),
+        'prev_intake_month': rng.choice([1, 2, 3, 6, 9, np.nan], n),
+        'cycle_end_date': pd.Timestamp('2024-01-31') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+    })
+
+
+def ipt_frame_with_nulls(rng, n):
+    # Missing intake years, cast as extract_enreg_data casts them: the rules must not see pd.NA
+    from r2r_pipelines.schemas import apply_schema
+    df = ipt_frame(rng, n)
+    for col in ['prev_intake_year', 'prog_intake_year']:
+        df[col] = df[col].where(rng.random(n) >= 0.05)
+    return apply_schema(df, 'sf_opp_enr', report=False)
+
+
+def month_series(rng, n):
+    return pd.Series(rng.choice([1, 2, 3, 5, 7, 10, 12, 13, np.nan], n))
+
+
+def mohe_frame(rng, n):
+    from benchmarks.synthetic import LEVELS, VERTICALS, SPECIALIZATIONS
+    return pd.DataFrame({
+        'level': rng.choice(LEVELS, n),
+        'vertical': rng.choice(VERTICALS, n),
+        'specialization': rng.choice(SPECIALIZATIONS, n),
+    })
+
+
+def rules_frame(rng):
+    from benchmarks.synthetic import make_programmes
+    rules = make_programmes(rng, 200).rename(columns={'prog_name': 'prog_name_main'})
+    rules['specialization'] = rules['specialization'].str.split(';')
+    return rules.explode('specialization').reset_index(drop=True)
+
+
+def fee_frame(rng, n):
+    return pd.DataFrame({
+        'intake_year': rng.choice(range(2020, 2026), n),
+        'amortized_nom': rng.integers(1, 13, n),
+        'amortized_denom': rng.integers(1, 13, n),
+    })
+
+
+def build_cases():
+    # name -> (input builder(rng, n), function applied to the input, largest size worth timing)
+    from r2r_pipelines.utils import assign_intake_cycle
+    from r2r_pipelines.prep_ctd_enreg import (assign_segment_final, calculate_withdrawal_precomm,
+                                              calculate_ipt_prev_year, ipt_same_year_month)
+    from r2r_pipelines.prep_mohe_enrollment import get_matching_labels
+    from r2r_pipelines.prep_fin_fee import select_amortized_nom
+
+    def matching_labels_input(rng, n):
+        return mohe_frame(rng, n), rules_frame(rng)
+
+    return {
+        'assign_segment_final': (segment_frame, lambda df: df.apply(assign_segment_final, axis=1), None),
+        'calculate_withdrawal_precomm': (withdrawal_frame, lambda df: df.apply(calculate_withdrawal_precomm, axis=1), None),
+        'calculate_ipt_prev_year': (ipt_frame, lambda df: df.apply(calculate_ipt_prev_year, axis=1), None),
+        'calculate_ipt_prev_year_nulls': (ipt_frame_with_nulls,
+                                          lambda df: df.apply(calculate_ipt_prev_year, axis=1), None),
+        'ipt_same_year': (ipt_frame, lambda df: df.apply(ipt_same_year_month, axis=1), None),
+        'assign_intake_cycle': (month_series, lambda s: assign_intake_cycle(s.to_frame('prog_intake_month')), None),
+        # One boolean scan of the rules table per row: keep the sizes small
+        'get_matching_labels': (matching_labels_input,
+                                lambda args: args[0].apply(get_matching_labels, axis=1, rules_df=args[1]), 10000),
+        'amortized_nom': (fee_frame, lambda df: df.apply(select_amortized_nom, axis=1), None),
+    }
+
+
+def run_cases(sizes, repeat=3, names=None):
+    results = {}
+    for name, (make_input, func, max_size) in build_cases().items():
+        if names and name not in names:
+            continue
+        for n in sizes:
+            if max_size and n > max_size:
+                continue
+            data = make_input(np.random.default_rng(SEED), n)
+            best = min(timeit.repeat(lambda: func(data), number=1, repeat=repeat))
+            results[f'{name}[{n}]'] = {'seconds': round(best, 6), 'output_hash': output_hash(func(data))}
+            print(f"{name + f'[{n}]':<40}{best:>10.4f}s", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Returns False when any output differs from the baseline
+    identical = True
+    print(f"\n{'case':<40}{'baseline (s)':>14}{'now (s)':>10}{'ratio':>8}  output")
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            print(f"{case:<40}{'-':>14}{result['seconds']:>10.4f}{'-':>8}  new case")
+            continue
+        ratio = result['seconds'] / base['seconds'] if base['seconds'] else float('nan')
+        same = result['output_hash'] == base['output_hash']
+        identical &= same
+        flag = '  SLOWER' if ratio > tolerance else ''
+        print(f"{case:<40}{base['seconds']:>14.4f}{result['seconds']:>10.4f}{ratio:>8.2f}  "
+              f"{'identical' if same else 'DIFFERENT'}{flag}")
+    return identical
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--cases', nargs='*', help='Only run these cases')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='Flag cases slower than this ratio')
+    parser.add_argument('--output', help='Write this run as JSON')
+    args = parser.parse_args(argv)
+
+    prepare_imports()
+    results = run_cases(args.sizes, args.repeat, args.cases)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline first")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if not compare(results, baseline, args.tolerance):
+        print("\nOutputs differ from the baseline")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
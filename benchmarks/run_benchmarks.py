@@ -0,0 +1,202 @@
+"""
+Runs the preprocess_* pipelines against synthetic inputs at several volumes and reports time and peak memory.
+
+    python -m benchmarks.run_benchmarks --scales 1 10 100
+    python -m benchmarks.run_benchmarks --scales 1 --db-url postgresql+psycopg2://user:pw@localhost/r2r_bench
+
+Each scale gets its own synthetic share (R2R_STG_DIR) and stand-in database (R2R_DATABASE_URL). Every pipeline
+runs in a fresh process and reports the peak RSS of its own address space (VmHWM on Linux). SQLite is the default
+stand-in; ctd_enreg queries use Postgres casts and only run against a Postgres URL.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from graphlib import TopologicalSorter
+from pathlib import Path
+
+from benchmarks.synthetic import generate_dataset
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'r2r_benchmarks')
+POSTGRES_ONLY = {'ctd_enreg'}
+SQLITE_SCHEMAS = ['public', 'staging']
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process.
+
+    On Linux VmHWM, the high-water mark of this program's own address space: ru_maxrss would start at the parent's
+    peak, because a forked child inherits it, so every pipeline would report the harness (and data generator) peak.
+    ru_maxrss on macOS, peak working set on Windows.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 ** 2
+        except (ImportError, AttributeError):
+            return None
+
+
+def attach_sqlite_schemas(engine):
+    # SQLite has no schemas; attach one database file per schema the pipelines write to
+    from sqlalchemy import event
+
+    base = os.path.splitext(engine.url.database)[0]
+
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        for schema in SQLITE_SCHEMAS:
+            dbapi_connection.execute(f"ATTACH DATABASE '{base}_{schema}.db' AS {schema}")
+
+
+def run_worker(target, result_file):
+    # Child process: run one pipeline entry point and write its measurements as JSON
+    from r2r_pipelines.engine_registry import get_engine
+    from r2r_pipelines.instrumentation import count_rows
+    from r2r_pipelines.runner import load_target
+
+    if os.environ.get('R2R_DATABASE_URL', '').startswith('sqlite'):
+        for database in ('PG_DATABASE', 'PG_DATABASE_EXPORT'):
+            attach_sqlite_schemas(get_engine(database=database))
+
+    func = load_target(target)
+    if os.environ.get('R2R_BENCH_TRACEMALLOC'):
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    status, rows_out = 'ok', None
+    try:
+        result = func()
+        # Streaming pipelines return the number of rows they wrote
+        rows_out = result if isinstance(result, int) else count_rows(result)
+    except Exception as e:
+        status = f'error: {e!r}'
+    wall_s = time.perf_counter() - start
+
+    with open(result_file, 'w') as f:
+        json.dump({
+            'status': status,
+            'wall_s': round(wall_s, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'py_peak_mb': tracemalloc.get_traced_memory()[1] / 1024 ** 2 if tracemalloc.is_tracing() else None,
+            'rows_out': rows_out,
+        }, f)
+
+
+def benchmark_nodes(names=None):
+    # Pipelines in dependency order, leaving out the ones that need Salesforce, and their dependency graph
+    from r2r_pipelines.runner import select_nodes, build_dependency_graph
+
+    nodes = [node for node in select_nodes(names) if not any(dataset.startswith('sf:') for dataset in node.inputs)]
+    node_map = {node.name: node for node in nodes}
+    graph = build_dependency_graph(nodes)
+    return [node_map[name] for name in TopologicalSorter(graph).static_order()], graph
+
+
+def run_scale(scale, data_dir, db_url=None, names=None, regenerate=False, log_dir=None):
+    root = Path(data_dir)/f'scale_{scale}'
+    db_url = db_url or f"sqlite:///{(root/'bench.db').as_posix()}"
+    marker = root/'.generated'
+
+    if regenerate or not marker.exists():
+        print(f"Generating synthetic inputs at {scale}x in {root} ...")
+        start = time.perf_counter()
+        counts = generate_dataset(root, scale=scale, db_url=db_url)
+        marker.write_text(json.dumps(counts))
+        print(f"Generated in {time.perf_counter() - start:.1f}s: {counts}")
+
+    env = dict(os.environ, R2R_STG_DIR=str(root), R2R_DATABASE_URL=db_url)
+    os.environ.update(R2R_STG_DIR=str(root), R2R_DATABASE_URL=db_url)
+    is_postgres = db_url.startswith('postgresql')
+
+    results, skipped = [], set()
+    nodes, graph = benchmark_nodes(names)
+    for node in nodes:
+        if node.name in POSTGRES_ONLY and not is_postgres:
+            skipped.add(node.name)
+            results.append({'scale': scale, 'pipeline': node.name, 'status': 'skipped (needs postgres)'})
+            continue
+        # Pipelines reading the output of a skipped one would only fail on the missing table or file
+        skipped_upstream = sorted(graph[node.name] & skipped)
+        if skipped_upstream:
+            skipped.add(node.name)
+            results.append({'scale': scale, 'pipeline': node.name,
+                            'status': f"skipped (needs {', '.join(skipped_upstream)})"})
+            continue
+
+        print(f"[{scale}x] {node.name} ...", flush=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            result_file = os.path.join(tmp, 'result.json')
+            log_path = Path(log_dir or root)/f'{node.name}.log'
+            with open(log_path, 'w') as log:
+                process = subprocess.run([sys.executable, '-m', 'benchmarks.run_benchmarks',
+                                          '--worker', node.target, '--result-file', result_file],
+                                         env=env, stdout=log, stderr=subprocess.STDOUT)
+
+            if os.path.exists(result_file):
+                with open(result_file) as f:
+                    result = json.load(f)
+            else:
+                result = {'status': f'crashed (exit {process.returncode}, see {log_path})'}
+
+        results.append({'scale': scale, 'pipeline': node.name, **result})
+
+    return results
+
+
+def print_report(results):
+    print(f"\n{'scale':>6}  {'pipeline':<20}{'wall (s)':>10}{'peak RSS (MB)':>15}{'rows out':>12}  status")
+    for r in results:
+        wall = f"{r['wall_s']:.2f}" if r.get('wall_s') is not None else '-'
+        rss = f"{r['peak_rss_mb']:.0f}" if r.get('peak_rss_mb') is not None else '-'
+        rows = r.get('rows_out') if r.get('rows_out') is not None else '-'
+        print(f"{str(r['scale']) + 'x':>6}  {r['pipeline']:<20}{wall:>10}{rss:>15}{rows:>12}  {r['status']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--pipelines', nargs='*', help='Pipeline names from runner.PIPELINE_NODES (default: all)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--db-url', help='Stand-in database URL (default: one SQLite file per scale)')
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild the synthetic inputs even if present')
+    parser.add_argument('--output', help='JSON file for the results (default: <data-dir>/benchmark_results.json)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.result_file)
+        return
+
+    results = []
+    for scale in args.scales:
+        results.extend(run_scale(scale, args.data_dir, args.db_url, args.pipelines, args.regenerate))
+
+    print_report(results)
+
+    output = args.output or os.path.join(args.data_dir, 'benchmark_results.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import create_engine
+
+# Row counts at scale 1; every volume grows linearly with the scale factor.
+# Excel-backed inputs stay under the 1,048,576 row sheet limit up to 100x.
+BASE_VOLUMES = {
+    'programmes': 60,
+    'sf_opp_enr': 20000,
+    'mohe_te': 5000,
+    'mohe_pricing': 2000,
+    'closing': 1000,
+    'snd': 50,
+    'cpp_segments': 2,
+}
+
+CAMPUSES = ['TU', 'TC']
+CYCLES = ['C1', 'C2', 'C3']
+INTAKE_YEARS = list(range(2021, 2026))
+LEVELS = ['DEG', 'DIP', 'FOUNDATION', 'MASTER', 'PHD']
+VERTICALS = ['BUSINESS', 'ENGINEERING', 'IT', 'MEDICINE', 'HOSPITALITY', 'LAW']
+SPECIALIZATIONS = [f'SPECIALIZATION {i}' for i in range(40)]
+
+# Cycle windows as (start month offset from the intake year, start month, end month offset, end month)
+CYCLE_WINDOWS = {'C1': (-1, 9, 0, 1), 'C2': (0, 2, 0, 5), 'C3': (0, 6, 0, 8)}
+
+
+def share_paths(root):
+    # Same layout as config.constants, rooted at a local folder instead of the Qlik share
+    raw = Path(root)/'dna_sandbox'/'raw_data'
+    return {
+        'mapping': raw/'mapping_files',
+        'closing': raw/'cycle_closing',
+        'finance': raw/'finance_fee',
+        'annual_target': raw/'annual_target',
+        'cpp': raw/'cycle_preplanning',
+        'cpp_enreg': raw/'cycle_preplanning'/'cpp_enreg',
+        'cpp_nr': raw/'cycle_preplanning'/'cpp_nr',
+        'mohe': raw/'mohe_database',
+        'pricing': raw/'pricing_dataset',
+        'tm1': raw/'tm1_annual_data',
+    }
+
+
+def write_raw_sheet(writer, sheet_name, header, rows, title_rows=0):
+    # Workbook exports with report titles above the header row, read back with header=title_rows
+    frame = pd.DataFrame([[f'Report title {i + 1}'] + [None] * (len(header) - 1) for i in range(title_rows)]
+                         + [header] + [list(row) for row in rows])
+    frame.to_excel(writer, sheet_name=sheet_name, header=False, index=False)
+
+
+def make_calendar():
+    rows = []
+    for year in range(2019, 2028):
+        for cycle, (start_offset, start_month, end_offset, end_month) in CYCLE_WINDOWS.items():
+            start = pd.Timestamp(year + start_offset, start_month, 1)
+            end = pd.Timestamp(year + end_offset, end_month, 1) + pd.offsets.MonthEnd(0)
+            rows.append({'IntakeYear': year, 'Cycle': cycle, 'StartDate': start, 'EndDate': end})
+    return pd.DataFrame(rows)
+
+
+def make_programmes(rng, n):
+    codes = np.array([f'P{i:04d}' for i in range(n)])
+    names = np.array([f'Programme {i:04d}' for i in range(n)])
+    return pd.DataFrame({
+        'prog_code': codes,
+        'prog_name': names,
+        'campus': rng.choice(CAMPUSES, n),
+        'level': rng.choice(LEVELS, n),
+        'vertical': rng.choice(VERTICALS, n),
+        'specialization': [';'.join(rng.choice(SPECIALIZATIONS, rng.integers(1, 4), replace=False)) for _ in range(n)],
+    })
+
+
+def make_sf_opp_enr(rng, n, programmes, calendar):
+    # Weekly opportunity snapshots, with a share of rows on the cycle closing date
+    cal = calendar[calendar['IntakeYear'].isin(INTAKE_YEARS)].reset_index(drop=True)
+    cycle_pos = rng.integers(0, len(cal), n)
+    start = cal['StartDate'].to_numpy()[cycle_pos]
+    end = cal['EndDate'].to_numpy()[cycle_pos]
+    span_days = (end - start).astype('timedelta64[D]').astype(int)
+    reporting_date = start + (rng.random(n) * span_days).astype('timedelta64[D]')
+    reporting_date = np.where(rng.random(n) < 0.3, end, reporting_date)
+
+    prog_pos = rng.integers(0, len(programmes), n)
+    month_by_cycle = {'C1': [1, 2], 'C2': [3, 4, 5, 6], 'C3': [7, 8, 9, 10, 11, 12]}
+    cycle = cal['Cycle'].to_numpy()[cycle_pos]
+    intake_year = cal['IntakeYear'].to_numpy()[cycle_pos]
+    intake_month = np.array([rng.choice(month_by_cycle[c]) for c in cycle])
+
+    n_accounts = max(n // 4, 1)
+    acc_no = rng.integers(0, n_accounts, n)
+    has_prev = rng.random(n) < 0.2
+    registered = pd.Series(reporting_date) + pd.to_timedelta(rng.integers(-60, 60, n), unit='D')
+
+    def dmy(values):
+        return pd.Series(pd.to_datetime(values)).dt.strftime('%d/%m/%Y').to_numpy()
+
+    df = pd.DataFrame({
+        'reporting_date': dmy(reporting_date),
+        'programme_code': programmes['prog_code'].to_numpy()[prog_pos],
+        'opp_stage': rng.choice(['Pre-Enrolled', 'Enrolled', 'Pre-registered', 'Registered'], n),
+        'withdrawn_pre_commencement': rng.choice(['false', 'true'], n, p=[0.95, 0.05]),
+        'admission_status': rng.choice(['Offered', 'Accepted', 'Rejected (Assessment)'], n, p=[0.5, 0.48, 0.02]),
+        'acc_id': [f'001A{i:011d}XYZ' for i in acc_no],
+        'opp_id': [f'006A{i:011d}XYZ' for i in range(n)],
+        'prog_intake_month': intake_month,
+        'prog_intake_year': intake_year,
+        'programme1': programmes['prog_name'].to_numpy()[prog_pos],
+        'intake_year': intake_year,
+        'intake_month': intake_month,
+        'cycle': cycle,
+        'programme_status': rng.choice(['Registered', 'Enrolled', 'Cancelled', 'Withdrawn (Post-commencement)', None],
+                                       n, p=[0.6, 0.25, 0.05, 0.05, 0.05]),
+        'programme_name': programmes['prog_name'].to_numpy()[prog_pos],
+        'prev_intake_year': np.where(has_prev, intake_year - rng.integers(0, 2, n), np.nan),
+        'prev_intake_month': np.where(has_prev, rng.integers(1, 13, n), np.nan),
+        'prev_prog_status': np.where(has_prev, rng.choice(['Transfer Out', 'Transferred (Institution)', 'Registered'], n), None),
+        'stage_prev_rec': np.where(has_prev, rng.choice(['Registered', 'Enrolled'], n), None),
+        'programmename_prev_rec': np.where(has_prev, rng.choice(['Intensive English', 'Foundation in Biotechnology', 'Programme 0001'], n), None),
+        'ipt_note': np.where(has_prev, rng.choice(['IPT without task', 'IPT from previous year', ''], n), None),
+        'intakeclosingdate': dmy(end),
+        'registered_date': dmy(registered),
+        'bucket_domestic_int': rng.choice(['Domestic', 'International', 'ISR'], n, p=[0.7, 0.2, 0.1]),
+        'owner_role': rng.choice(['Domestic Sales', 'ISR Team', 'Progression Team'], n),
+        'market_segment': rng.choice(['Domestic', 'Progression', 'International'], n),
+        'micpa_caanzcount': rng.integers(0, 3, n),
+        'micpa_caanzmodule': None,
+        'bursary_deduction': rng.choice(['Merit Scholarship', 'Sibling Bursary', None], n),
+        'bursarydeduction_2': None,
+        'scholarship_deduction': rng.choice(['Merit Scholarship', None], n),
+        'enrolledbyagent': rng.choice(['true', 'false'], n, p=[0.2, 0.8]),
+        'agent': rng.choice(['Agent A', 'Agent B', None], n),
+        'commissionamountforecast': rng.random(n).round(2) * 5000,
+        'state': rng.choice(['Selangor', 'Kuala Lumpur', 'Penang', 'Johor'], n),
+    })
+
+    # A few opportunities without a programme intake year, as production has
+    df.loc[rng.random(n) < 0.005, 'prog_intake_year'] = np.nan
+    return df
+
+
+def make_finance_fees(rng, programmes):
+    rows = []
+    for prog in programmes.itertuples():
+        for year in range(2020, 2026):
+            for month in (1, 4, 8):
+                intake = year * 100 + month
+                for semester in (1, 2, 3):
+                    start = pd.Timestamp(year, month, 1) + pd.DateOffset(months=4 * (semester - 1))
+                    rows.append({
+                        'course_desc_tm1': prog.prog_name + (' (INACTIVE)' if rng.random() < 0.05 else ''),
+                        'course_desc_jarvis': prog.prog_name.upper(),
+                        'intake': intake, 'semester': semester, 'year': year, 'campus': prog.campus,
+                        'start_date': start if rng.random() < 0.8 else pd.NaT,
+                        'end_date': start + pd.DateOffset(months=4) if rng.random() < 0.8 else pd.NaT,
+                        'attrition': round(rng.random() * 0.1, 3), 'cms_progcode': prog.prog_code,
+                        'int_enrollment_fee': 1500.0, 'int_student_charges': 2500.0, 'int_annual_fee': 800.0,
+                        'int_total_fee': round(rng.uniform(30000, 90000), 2),
+                        'loc_enrollment_fee': 1000.0, 'loc_resource_fee': 600.0,
+                        'loc_tuition_fee': round(rng.uniform(8000, 20000), 2),
+                        'tmsciencefee': 400.0,
+                    })
+    return pd.DataFrame(rows)
+
+
+def write_prog_master(paths, rng, programmes):
+    # Also read at import time by prep_mohe, so it must exist before r2r_pipelines is imported
+    with pd.ExcelWriter(paths['mapping']/'prog_master_file.xlsx') as writer:
+        pd.DataFrame({
+            'prog_name_main': programmes['prog_name'],
+            'level': programmes['level'],
+            'vertical': programmes['vertical'],
+            'specialization': programmes['specialization'],
+            'group': rng.choice(['GROUP A', 'GROUP B'], len(programmes)),
+            'ipts': 'TAYLORS',
+        }).to_excel(writer, sheet_name='prog_master', index=False)
+        programmes[['prog_code', 'prog_name', 'campus']].to_excel(writer, sheet_name='prog_master_code', index=False)
+
+
+def write_mapping_files(paths, rng, programmes, calendar, sf_opp_enr):
+    mapping = paths['mapping']
+    calendar.to_excel(mapping/'ImportDateStartNEndDate.xlsx', index=False)
+    write_prog_master(paths, rng, programmes)
+
+    n_adj = max(len(programmes) // 10, 1)
+    with pd.ExcelWriter(mapping/'adj_map.xlsx') as writer:
+        pd.DataFrame({
+            'IntakeYear': rng.choice(INTAKE_YEARS, n_adj).astype(str),
+            'ProgrammeCode': programmes['prog_code'].sample(n_adj, random_state=1).to_numpy(),
+            'Revised Programme Code': programmes['prog_code'].sample(n_adj, random_state=2).to_numpy(),
+        }).to_excel(writer, sheet_name='prog_code_correction', index=False)
+        special_sem = [(f'{year}{month:02d}', f'{year}{month + 1:02d}') for year in INTAKE_YEARS for month in (2, 6)][:n_adj]
+        pd.DataFrame({
+            'Intake Month Jarvis': [jarvis for jarvis, _ in special_sem],
+            'ProgrammeCode': programmes['prog_code'].head(len(special_sem)).to_numpy(),
+            'IntakeMonth TM1': [tm1 for _, tm1 in special_sem],
+        }).to_excel(writer, sheet_name='special_sem', index=False)
+
+    # Account extract keyed by the 15 character SF id, a third of them withdrawn in CMS
+    acc_ids = pd.Series(sf_opp_enr['acc_id'].unique())
+    student_keys = np.arange(100000, 100000 + len(acc_ids))
+    pd.DataFrame({
+        'Id': acc_ids.str[:15] + 'AAA',
+        'Student_Keys__c': student_keys,
+        'LastActivityDate': pd.Timestamp('2025-01-01') - pd.to_timedelta(rng.integers(0, 700, len(acc_ids)), unit='D'),
+    }).to_csv(mapping/'PG_Account_RawData_20250504.csv', index=False)
+
+    withdrawn = rng.choice(student_keys, len(student_keys) // 3, replace=False)
+    pd.DataFrame({
+        'Student #': withdrawn,
+        'Withdrawn Date': pd.Timestamp('2025-01-01') - pd.to_timedelta(rng.integers(0, 700, len(withdrawn)), unit='D'),
+        'Course Code': rng.choice(programmes['prog_code'], len(withdrawn)),
+    }).to_excel(mapping/'Closing_Withdrawal Date.xlsx', index=False)
+
+    pd.DataFrame([{'segment': segment, 'campus': campus, 'intake_cycle': cycle, 'enreg': enreg,
+                   'gr_isr_factor': round(rng.uniform(1.5, 3), 2), 'nr_isr_factor': round(rng.uniform(1.2, 2.5), 2)}
+                  for segment in ['Domestic', 'International'] for campus in CAMPUSES
+                  for cycle in CYCLES for enreg in ['Enrollment', 'Registration']]
+                 ).to_excel(mapping/'isr_fees_premium.xlsx', index=False)
+
+
+def cycle_weeks(calendar, year, cycle):
+    row = calendar[(calendar['IntakeYear'] == year) & (calendar['Cycle'] == cycle)].iloc[0]
+    return pd.date_range(row['StartDate'], row['EndDate'], freq='W-FRI')
+
+
+def write_cpp_files(paths, rng, calendar, n_segments):
+    teams = [f'Team {i + 1}' for i in range(n_segments)]
+
+    # Historical workbook (2021 and 2022) in the original long layout
+    enreg_rows, nr_rows = [], []
+    for year in (2021, 2022):
+        for cycle in CYCLES:
+            cycle_end = calendar[(calendar['IntakeYear'] == year) & (calendar['Cycle'] == cycle)]['EndDate'].iloc[0]
+            for week in cycle_weeks(calendar, year, cycle):
+                for campus in CAMPUSES:
+                    for cpp_type in ('Budget', 'Stretch'):
+                        for segment in ('Domestic', 'International', 'Progression'):
+                            enreg_rows.append([week, year, cycle, campus, f'{campus} - {segment}', cpp_type]
+                                              + list(rng.integers(0, 500, 4)))
+                        nr_rows.append([week, year, cycle, campus, cpp_type] + list(rng.uniform(0, 1e6, 6).round(2))
+                                       + [int(rng.integers(0, 500)), cycle_end])
+
+    nr_header = ['Reporting Date', 'Intake Year', 'Cycle', 'Campus', 'Type', 'CTD NR Target', 'CTD GR Target',
+                 'CTD S&D Target Scholarships', 'CTD S&D Target Bursaries', 'CHDR Target', 'CTD Agent Comm Target',
+                 'CTD Student Number Target', 'Cycle End']
+    with pd.ExcelWriter(paths['cpp']/'cpp_data_original.xlsx') as writer:
+        pd.DataFrame(enreg_rows, columns=['Reporting Date', 'Intake Year', 'Cycle', 'Campus', 'Team', 'Type',
+                                          'LY Enrollment', 'LY Registration', 'Enrollment', 'Registration']
+                     ).to_excel(writer, sheet_name='enreg', index=False)
+        pd.DataFrame(nr_rows, columns=nr_header).to_excel(writer, sheet_name='nr_enrollment', index=False)
+        pd.DataFrame(nr_rows, columns=nr_header).to_excel(writer, sheet_name='nr_registration', index=False)
+
+    # One workbook per intake year, cycle and CPP version from 2023 onwards
+    for year in (2023, 2024, 2025):
+        for cycle in CYCLES:
+            weeks = cycle_weeks(calendar, year, cycle)
+            for version in ('Budget', 'Stretch'):
+                file_name = f'{year} {cycle} {version}_final.xlsx'
+
+                with pd.ExcelWriter(paths['cpp_enreg']/file_name) as writer:
+                    for sheet in (f'CTD E Actual {year - 1}', f'CTD R Actual {year - 1}',
+                                  f'CTD E Targets {year}', f'CTD R Targets {year}'):
+                        rows = [[week, campus, f'{segment} - {team}', int(rng.integers(0, 500))]
+                                for week in weeks for campus in CAMPUSES
+                                for segment in ('ISR', 'Domestic') for team in teams]
+                        pd.DataFrame(rows, columns=['Reporting Date', 'Campus', 'Segment', 'Value']
+                                     ).to_excel(writer, sheet_name=sheet, index=False)
+
+                with pd.ExcelWriter(paths['cpp_nr']/file_name) as writer:
+                    for suffix in ('E', 'R'):
+                        rows = [[week, campus] + list(rng.uniform(0, 1e6, 6).round(2))
+                                for week in weeks for campus in CAMPUSES for _ in teams]
+                        pd.DataFrame(rows, columns=['Reporting Date', 'Campus', 'NR', 'GR', 'Scholarships', 'Bursaries',
+                                                    'CHDR', 'Agent Comm']
+                                     ).to_excel(writer, sheet_name=f'{year} {cycle} CTD NR target by week_{suffix}', index=False)
+
+
+def write_annual_targets(paths, rng, programmes):
+    for year in INTAKE_YEARS:
+        months = [year * 100 + month for month in range(1, 13)]
+        header = ['Prog_Code', 'Prog_Name', None] + months[:2] + ['Advanced March'] + months[2:] \
+            + ['C1 Total', 'C2 Total', 'C3 Total', 'Grand Total', None]
+        rows = [[prog.prog_code, prog.prog_name, segment] + list(rng.integers(0, 50, 17)) + [target_type]
+                for prog in programmes.itertuples()
+                for segment in ('Domestic', 'International')
+                for target_type in ('Base', 'Worst', 'Budget')]
+
+        with pd.ExcelWriter(paths['annual_target']/f'annual_target_{year}.xlsx') as writer:
+            write_raw_sheet(writer, 'TUTC target', header, rows, title_rows=1)
+
+
+def write_closing_files(paths, rng, n):
+    for year in INTAKE_YEARS:
+        for cycle in CYCLES:
+            pd.DataFrame({
+                'AccountID': [f'001A{i:011d}' for i in rng.integers(0, n * 4, n)],
+                'OpportunityID': [f'006A{i:011d}' for i in rng.integers(0, n * 4, n)],
+                'OpportunityName': [f'Opportunity {i}' for i in range(n)],
+            }).to_excel(paths['closing']/f'closing_{year}_{cycle.lower()}.xlsx', index=False)
+
+
+def write_tm1_files(paths, rng, programmes):
+    # TM1 cube exports: one column per (campus, type, field, period), one row per programme
+    prog_names = ['All Programs and Products'] + programmes['prog_name'].tolist() + ['Common Programme']
+
+    def write_tm1(file_name, sheets, periods, type_name='Actual'):
+        with pd.ExcelWriter(paths['tm1']/file_name) as writer:
+            for sheet_name, fields in sheets.items():
+                records = [(campus, type_name, field, period) for campus in CAMPUSES for field in fields for period in periods]
+                frame = pd.DataFrame(rng.uniform(0, 1e6, (len(prog_names), len(records))).round(2))
+                frame = pd.concat([pd.DataFrame([list(r) for r in zip(*records)]), frame], ignore_index=True)
+                frame.insert(0, 'label', ['Campus', 'Type', 'Field', 'Period'] + prog_names)
+                frame.to_excel(writer, sheet_name=sheet_name, header=False, index=False)
+
+    fiscal_years = [f'FY {year}' for year in range(2019, 2026)] + ['Budget 2026']
+    write_tm1('TM1_Total_Student_Population.xlsx',
+              {'Total_Student_Population': ['TSP - TOTAL STUDENT POPULATION (@ ME)']},
+              [f'{month}-{year % 100}' for year in range(2019, 2026) for month in ('Jun', 'Dec')])
+    write_tm1('TM1_EFTS.xlsx', {'EFTS': ['EF - EFTS']}, fiscal_years)
+    write_tm1('TM1_Revenue.xlsx', {'Gross_Revenue': ['GR - GROSS REVENUE'], 'Net_Revenue': ['NR - NET REVENUE'],
+                                   'PBT': ['PBT - PROFIT BEFORE TAX']}, fiscal_years)
+    write_tm1('TM1_Exclusion.xlsx', {'Exclusion': ['AR - ACADEMIC RELATED REVENUE', 'NAR - NON-ACADEMIC RELATED REVENUE']},
+              fiscal_years, type_name='Exclusion')
+
+
+def write_finance_files(paths, rng, programmes, finance_fees):
+    finance = paths['finance']
+    intakes = finance_fees[['course_desc_tm1', 'intake']].drop_duplicates()
+    semesters = ['Semester 1', 'Semester 2', 'Semester 3', 'Total']
+
+    with pd.ExcelWriter(finance/'TU+TC Total Tuition Fees by Segment.xlsx') as writer:
+        for sheet in ('TU', 'TC'):
+            rows = [[prog, intake, semester, round(rng.uniform(8000, 20000), 2), round(rng.uniform(30000, 90000), 2)]
+                    for prog, intake in intakes.itertuples(index=False) for semester in semesters]
+            write_raw_sheet(writer, sheet, [None, None, None, 'Total Tuition Fees (Local)',
+                                            'Total Tuition Fee per Student (International)'], rows, title_rows=5)
+
+    with pd.ExcelWriter(finance/'TUSB and TMSB - TM1 Acad Calendar.xlsx') as writer:
+        for sheet in ('TUSB', 'TMSB'):
+            rows = []
+            for prog, intake in intakes.itertuples(index=False):
+                start = pd.Timestamp(intake // 100, intake % 100, 1)
+                for i, semester in enumerate(semesters):
+                    rows.append([prog, intake, semester, (start + pd.DateOffset(months=4 * i)).strftime('%b-%y'),
+                                 (start + pd.DateOffset(months=4 * i + 3)).strftime('%b-%y')])
+            write_raw_sheet(writer, sheet, [None, None, None, 'Start Month', 'End Month'], rows, title_rows=5)
+
+    pd.DataFrame([{
+        '4DigitsCode': rng.choice(['CALH', 'SAMH', 'FNDH']), 'ProgrammeCode': 'CAL',
+        'ProgrammeName': prog, 'Intake': intake, 'StudentType': student_type,
+        '%CAL4Subjects': round(rng.random(), 3), '%1ScienceSubject': round(rng.random(), 3),
+        '%2ScienceSubject': round(rng.random(), 3),
+    } for prog, intake in intakes.itertuples(index=False) for student_type in ('New - Local', 'New - International')]
+    ).to_csv(finance/'BI_Extract_TMStudentPercent_TC.csv', index=False)
+
+    finance_fees.to_excel(finance/'E_FinanceFee_manual.xlsx', sheet_name='C_FinanceFee', index=False)
+
+
+def write_snd_file(paths, rng, n):
+    bursaries = [f'Bursary {i}' for i in range(n)]
+    with pd.ExcelWriter(paths['finance']/'S&D.xlsx') as writer:
+        pd.DataFrame({
+            '#': range(1, n + 1),
+            'Bursary Deduction': bursaries,
+            'Bursary Group': rng.choice(['Merit', 'Need', 'Sibling'], n),
+            'Guideline': 'Guideline',
+            'Intake Year': rng.choice(INTAKE_YEARS, n),
+            'Type of S&D': rng.choice(['Scholarship', 'Bursary'], n),
+            'Full Scholarship': rng.choice(['Y', 'N'], n),
+            'Remarks/Changes': None,
+            'Institutions': rng.choice(CAMPUSES, n),
+            'C1': rng.choice([0.1, 0.25, 0.5, 2000.0], n),
+            'C2': rng.choice([0.1, 0.25, 0.5, 2000.0], n),
+            'C3': rng.choice([0.1, 0.25, 0.5, 2000.0], n),
+            'Original C3 (Before Amortized)': rng.choice([0.1, 0.25, 0.5, 2000.0], n),
+        }).to_excel(writer, sheet_name='MarComm', index=False)
+        pd.DataFrame({
+            'Schemes/Types': bursaries,
+            'Bursary Group': 'CHDR',
+            'Intake Year': rng.choice(INTAKE_YEARS, n),
+            'Tuition Fee Waiver (%)': rng.choice([0.25, 0.5, 1.0], n),
+            'Original C3 (Before Amortized)': rng.choice([0.25, 0.5, 1.0], n),
+            'Total Waiver (Exclude Tuition Fee)': rng.choice([0.0, 1000.0], n),
+            'Master / PhD': rng.choice(['Master', 'PhD'], n),
+        }).to_excel(writer, sheet_name='CHDR', index=False)
+
+
+def write_mohe_files(paths, rng, n_te, n_pricing):
+    pd.DataFrame({
+        'Group': rng.choice(['GROUP A', 'GROUP B', None], n_te, p=[0.45, 0.45, 0.1]),
+        'IPTS': rng.choice(['TAYLORS', 'SUNWAY', 'MONASH', 'UCSI'], n_te),
+        'Year': rng.choice(range(2018, 2024), n_te),
+        'Level 2': rng.choice(LEVELS, n_te),
+        'Vertical': rng.choice(VERTICALS, n_te),
+        'Specialization': rng.choice(SPECIALIZATIONS, n_te),
+        'TE': np.where(rng.random(n_te) < 0.05, '-', rng.integers(0, 2000, n_te).astype(str)),
+    }).to_excel(paths['mohe']/'Redmarch - IPTS Enrolment Database 2023 v13 CLIENT (RAW DATA).xlsx',
+                sheet_name='TE', index=False)
+
+    with pd.ExcelWriter(paths['pricing']/'Redmarch - IPTS Course Fee Database 2024 v151 (updated).xlsx') as writer:
+        for year in ('2023', '2024'):
+            pd.DataFrame({
+                'Group': rng.choice(['GROUP A', 'GROUP B'], n_pricing),
+                'Institution': rng.choice(['TAYLORS', 'SUNWAY', 'MONASH', 'UCSI'], n_pricing),
+                'State': rng.choice(['Selangor', 'Kuala Lumpur', 'Penang'], n_pricing),
+                'Region 1': rng.choice(['Central', 'North'], n_pricing),
+                'Level 1': rng.choice(LEVELS, n_pricing),
+                'Vertical': rng.choice(VERTICALS + [None], n_pricing),
+                'Specialization': rng.choice(SPECIALIZATIONS, n_pricing),
+                'Course Name (Reformatted)': [f'Course {i}' for i in range(n_pricing)],
+                'Mode': rng.choice(['Full Time', 'Part Time'], n_pricing),
+                'Status': 'Active',
+                '# Intakes': rng.integers(1, 4, n_pricing),
+                'Total Fee': np.where(rng.random(n_pricing) < 0.05, 'TBC', rng.integers(20000, 200000, n_pricing).astype(str)),
+            }).to_excel(writer, sheet_name=year, index=False)
+        pd.DataFrame({'Notes': ['Source: Redmarch']}).to_excel(writer, sheet_name='Notes', index=False)
+
+
+def load_source_tables(db_url, sf_opp_enr, finance_fees):
+    # Tables the pipelines query from the source database
+    engine = create_engine(db_url)
+    sf_opp_enr.to_sql('sf_opp_enr', engine, if_exists='replace', index=False, chunksize=50000)
+    finance_fees.to_sql('r2r_finance_fees', engine, if_exists='replace', index=False, chunksize=50000)
+    engine.dispose()
+
+
+def generate_dataset(root, scale=1, db_url=None, seed=0):
+    """
+    Writes a synthetic copy of the Qlik share inputs under root, with the production file names and schemas.
+
+    Parameters:
+    root (str): Folder used as R2R_STG_DIR by the pipelines.
+    scale (int): Volume multiplier applied to BASE_VOLUMES.
+    db_url (str): SQLAlchemy URL of the stand-in source database; sf_opp_enr and r2r_finance_fees are loaded there.
+    seed (int): Random seed, so every run at the same scale sees the same data.
+
+    Returns:
+    dict: Row counts of the generated source tables.
+    """
+    rng = np.random.default_rng(seed)
+    volumes = {name: count * scale for name, count in BASE_VOLUMES.items()}
+    paths = share_paths(root)
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+
+    calendar = make_calendar()
+    programmes = make_programmes(rng, volumes['programmes'])
+    sf_opp_enr = make_sf_opp_enr(rng, volumes['sf_opp_enr'], programmes, calendar)
+    finance_fees = make_finance_fees(rng, programmes)
+
+    write_mapping_files(paths, rng, programmes, calendar, sf_opp_enr)
+    write_cpp_files(paths, rng, calendar, volumes['cpp_segments'])
+    write_annual_targets(paths, rng, programmes)
+    write_closing_files(paths, rng, volumes['closing'])
+    write_tm1_files(paths, rng, programmes)
+    write_finance_files(paths, rng, programmes, finance_fees)
+    write_snd_file(paths, rng, volumes['snd'])
+    write_mohe_files(paths, rng, volumes['mohe_te'], volumes['mohe_pricing'])
+
+    if db_url:
+        load_source_tables(db_url, sf_opp_enr, finance_fees)
+
+    return {'sf_opp_enr': len(sf_opp_enr), 'r2r_finance_fees': len(finance_fees)}
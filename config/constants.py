@@ -1,12 +1,29 @@
 import os
 
-STG_DIR = "//10.99.75.198/Qlik"
+# R2R_STG_DIR points every pipeline at another share root, e.g. a local synthetic copy for benchmarks
+STG_DIR = os.getenv("R2R_STG_DIR", "//10.99.75.198/Qlik")
 PROD_DIR = "//10.99.64.144/Qlik"
 
+# Read-through mirror: share files are copied to local disk once per version (size + mtime) and read from there
+SHARE_ROOTS = [STG_DIR, PROD_DIR]
+MIRROR_ENABLED = os.getenv("R2R_MIRROR", "true").lower() in ("1", "true", "yes")
+MIRROR_PATH = os.getenv("R2R_MIRROR_PATH", os.path.join(os.path.expanduser("~"), ".r2r_share_mirror"))
+MIRROR_WORKERS = int(os.getenv("R2R_MIRROR_WORKERS", "8"))
+
+# Excel reader for every pipeline: "openpyxl" (pandas default), "calamine" or "openpyxl_stream"
+EXCEL_ENGINE = os.getenv("R2R_EXCEL_ENGINE", "openpyxl")
+
+# Prepared lookups (parsed and keyed once per source version) live on local disk next to the mirror
+LOOKUP_CACHE_PATH = os.getenv("R2R_LOOKUP_CACHE_PATH", os.path.join(MIRROR_PATH, "lookups"))
+
 DNA_SANDBOX_PATH = os.path.join(STG_DIR, "dna_sandbox")
 RAW_DATA_PATH = os.path.join(DNA_SANDBOX_PATH, "raw_data")
 CLEAN_DATA_PATH = os.path.join(DNA_SANDBOX_PATH, "clean_data")
 
+# Parquet handoffs between pipelines; Excel copies are only written for human consumers
+INTERMEDIATE_PATH = os.path.join(CLEAN_DATA_PATH, "intermediate")
+EXPORT_EXCEL = os.getenv("R2R_EXPORT_EXCEL", "true").lower() in ("1", "true", "yes")
+
 # Mapping raw data paths
 MAPPING_PATH = os.path.join(RAW_DATA_PATH, "mapping_files")
 
@@ -28,8 +45,39 @@ CPP_NR_PATH = os.path.join(CPP_DATA_PATH, "cpp_nr")
 RM_MOHE_PATH = os.path.join(RAW_DATA_PATH, "mohe_database")
 PRICING_MOHE_PATH = os.path.join(RAW_DATA_PATH, "pricing_dataset")
 
+# Rows per chunk when streaming the Redmarch TE sheet; 0 reads it in one piece.
+# MOHE_OUTPUT is where the streamed enrollment table goes: "parquet" (intermediate) or "postgres"
+MOHE_CHUNK_ROWS = int(os.getenv("R2R_MOHE_CHUNK_ROWS", "0"))
+MOHE_OUTPUT = os.getenv("R2R_MOHE_OUTPUT", "parquet")
+
 # TM1 raw data paths
 TM1_ANNUAL_PATH = os.path.join(RAW_DATA_PATH, "tm1_annual_data")
 
+# Stage checkpoints of the long pipelines, kept on local disk until the run succeeds (resume with run --resume)
+CHECKPOINT_PATH = os.getenv("R2R_CHECKPOINT_PATH", os.path.join(MIRROR_PATH, "checkpoints"))
+CHECKPOINT_ENABLED = os.getenv("R2R_CHECKPOINT", "true").lower() in ("1", "true", "yes")
+
+# Input manifests of the pipelines that are skipped while their sources are unchanged (run --force to rerun)
+MANIFEST_PATH = os.getenv("R2R_MANIFEST_PATH", os.path.join(MIRROR_PATH, "manifests"))
+
+# Postgres connection pool settings, shared by every engine in the process
+PG_POOL_SIZE = int(os.getenv("R2R_PG_POOL_SIZE", "5"))
+PG_MAX_OVERFLOW = int(os.getenv("R2R_PG_MAX_OVERFLOW", "5"))
+PG_POOL_RECYCLE = int(os.getenv("R2R_PG_POOL_RECYCLE", "1800"))
+PG_POOL_PRE_PING = os.getenv("R2R_PG_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("R2R_PG_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no timeout
+
+# ctd_enreg export: "replace" rewrites the whole table, "partitioned" reloads only changed partitions,
+# partitioned by prog_intake_year or by month of reporting_date
+CTD_ENREG_EXPORT_MODE = os.getenv("R2R_CTD_ENREG_EXPORT", "replace")
+CTD_ENREG_PARTITION_BY = os.getenv("R2R_CTD_ENREG_PARTITION_BY", "prog_intake_year")
+
+# ctd_enreg rows read per chunk by the net revenue mart; memory stays bounded by one chunk plus its aggregates
+NET_REVENUE_CHUNK_ROWS = int(os.getenv("R2R_NET_REVENUE_CHUNK_ROWS", "200000"))
+
+# R2R_DATABASE_URL replaces every database connection with one stand-in (local Postgres or SQLite)
+DATABASE_URL_OVERRIDE = os.getenv("R2R_DATABASE_URL")
+
 # File Extensions
 EXCEL_FILE_EXTENSION = ".xlsx"
+PARQUET_FILE_EXTENSION = ".parquet"
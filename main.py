@@ -1,2 +1,7 @@
-# if __name__ == "__main__":
-#     process_excel_reports()
\ No newline at end of file
+import sys
+
+from r2r_pipelines.cli import main
+
+# Same as python -m r2r_pipelines, e.g. python main.py run ctd_enreg cpp_segment --workers 4
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,7 +28,18 @@ from .prep_cpp_nr import (
 from .prep_snd import (
     preprocess_snd,
     extract_transform_snd,
-    extract_transform_chdr 
+    extract_transform_chdr,
+    build_snd_index,
+    resolve_snd
+)
+
+from .prep_cycle_week import (
+    build_cycle_weeks,
+    build_cycle_week_index,
+    tag_cycle_week,
+    lookup_cycle_end_date,
+    load_cycle_week_index,
+    preprocess_cycle_week
 )
 
 from .prep_ctd_enreg import (
@@ -79,4 +90,9 @@ from .prep_mohe_enrollment import (
 from .prep_mohe_pricing import (
     extract_mohe_pricing,
     preprocess_mohe_pricing
-)
\ No newline at end of file
+)
+
+from .runner import (
+    PIPELINE_NODES,
+    run_pipelines
+)
@@ -0,0 +1,7 @@
+import sys
+
+from r2r_pipelines.cli import main
+
+# Worker processes re-import the main module on Windows, so the run must sit behind the main guard
+if __name__ == "__main__":
+    sys.exit(main())
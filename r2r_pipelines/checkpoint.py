@@ -0,0 +1,208 @@
+"""
+Stage checkpoints for long multi-stage pipelines.
+
+A pipeline decorated with @checkpointed_run runs its expensive steps through checkpoint_stage(). Each step's
+DataFrame is written to local Parquet under <R2R_CHECKPOINT_PATH>/<pipeline>/<run id>/, keyed by the step, its
+arguments (upstream steps by their own key) and the fingerprints of the share files it read. The run records
+the row count and latest timestamp of the SQL tables the pipeline reads.
+
+With R2R_RESUME=1 (run --resume) a pipeline reopens its last unfinished run and reads back every step whose
+key and source fingerprints still match, instead of running it. A run whose SQL tables changed since is not
+resumed. A successful run deletes its checkpoints.
+"""
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from config.constants import CHECKPOINT_PATH, CHECKPOINT_ENABLED, PARQUET_FILE_EXTENSION
+from r2r_pipelines.fingerprints import file_fingerprint, fingerprint_key, sql_fingerprint
+from r2r_pipelines.run_log import collect_sources
+
+RESUME_ENV = "R2R_RESUME"
+MANIFEST_FILE = "manifest.json"
+
+_local = threading.local()
+
+
+def resume_enabled():
+    # Read at call time, so the CLI can switch it in the worker processes
+    return os.getenv(RESUME_ENV, "").lower() in ("1", "true", "yes")
+
+
+def checkpoints_enabled():
+    return os.getenv("R2R_CHECKPOINT", str(CHECKPOINT_ENABLED)).lower() in ("1", "true", "yes")
+
+
+def _source_fingerprints(sources):
+    fingerprints = {}
+    for path in sources:
+        try:
+            fingerprints[path] = fingerprint_key(file_fingerprint(path))
+        except OSError:
+            fingerprints[path] = None
+    return fingerprints
+
+
+def _write_manifest(run):
+    manifest_file = run['path']/MANIFEST_FILE
+    tmp_file = manifest_file.with_name(f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    tmp_file.write_text(json.dumps({key: run[key] for key in ('run_id', 'pipeline', 'started_at', 'sql', 'stages')}, indent=1))
+    os.replace(tmp_file, manifest_file)
+
+
+def _read_manifest(run_path):
+    try:
+        return json.loads((run_path/MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def open_checkpoint_run(pipeline, folder_path=CHECKPOINT_PATH, resume=False, sql=None):
+    """
+    Starts a new checkpoint run for the pipeline, or with resume reopens its latest unfinished one.
+
+    Parameters:
+    sql (dict): sql_fingerprint() per SQL table the pipeline reads; a run recorded with others is not resumed.
+
+    Returns:
+    dict: run_id, pipeline, path, started_at, the SQL fingerprints, the stages checkpointed so far and the keys
+    of their outputs.
+    """
+    sql = sql or {}
+    pipeline_path = Path(folder_path)/pipeline
+    if resume and pipeline_path.exists():
+        manifests = [manifest for manifest in map(_read_manifest, pipeline_path.iterdir()) if manifest]
+        if manifests:
+            manifest = max(manifests, key=lambda m: m['started_at'])
+            changed = [table for table in sql if manifest.get('sql', {}).get(table) != sql[table]]
+            if changed:
+                print(f"{pipeline}: {', '.join(changed)} changed since run {manifest['run_id']}; starting a new run")
+            else:
+                print(f"{pipeline}: resuming run {manifest['run_id']} ({len(manifest['stages'])} checkpointed stages)")
+                return dict(manifest, path=pipeline_path/manifest['run_id'], outputs={})
+
+    run_id = uuid.uuid4().hex
+    run = {'run_id': run_id, 'pipeline': pipeline, 'path': pipeline_path/run_id,
+           'started_at': datetime.now(timezone.utc).isoformat(), 'sql': sql, 'stages': {}, 'outputs': {}}
+    os.makedirs(run['path'], exist_ok=True)
+    _write_manifest(run)
+    return run
+
+
+def remove_checkpoints(pipeline, folder_path=CHECKPOINT_PATH):
+    # Every run of the pipeline: the successful one and the unfinished ones it supersedes
+    shutil.rmtree(Path(folder_path)/pipeline, ignore_errors=True)
+
+
+def _argument_key(run, value):
+    # Outputs of earlier stages stand for their stage key; other frames are hashed by content
+    output = run['outputs'].get(id(value))
+    if output is not None and output[0]() is value:
+        return output[1]
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return str(pd.util.hash_pandas_object(value).sum())
+    return repr(value)
+
+
+def stage_key(run, stage, args, kwargs):
+    parts = [stage] + [_argument_key(run, arg) for arg in args] + \
+            [f"{name}={_argument_key(run, value)}" for name, value in sorted(kwargs.items())]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()[:16]
+
+
+def _valid_checkpoint(run, key):
+    entry = run['stages'].get(key)
+    if entry is None or not (run['path']/entry['file']).exists():
+        return None
+    if _source_fingerprints(entry['sources']) != entry['sources']:
+        print(f"{run['pipeline']}: a source of {entry['stage']} changed since its checkpoint; running it again")
+        return None
+    return entry
+
+
+def checkpoint_stage(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) as a checkpointed stage of the active checkpoint run.
+
+    On resume the stage is read back from its checkpoint when the key and source fingerprints match.
+    Outside a checkpointed run, or for results that are not DataFrames, it simply calls func.
+    """
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return func(*args, **kwargs)
+
+    stage = func.__name__
+    key = stage_key(run, stage, args, kwargs)
+    entry = _valid_checkpoint(run, key)
+    if entry is not None:
+        print(f"{run['pipeline']}: reusing checkpoint of {stage} ({entry['rows']} rows)")
+        result = pd.read_parquet(run['path']/entry['file'], engine='pyarrow')
+        run['outputs'][id(result)] = (weakref.ref(result), key)
+        return result
+
+    with collect_sources() as sources:
+        result = func(*args, **kwargs)
+    if not isinstance(result, pd.DataFrame):
+        return result
+
+    # Index kept as pandas metadata, so a reused stage hands on exactly the same frame
+    file_name = key + PARQUET_FILE_EXTENSION
+    tmp_file = run['path']/f"{file_name}.{os.getpid()}.tmp"
+    try:
+        result.to_parquet(tmp_file, engine='pyarrow')
+    except Exception as e:
+        # Columns Arrow cannot store as they are (e.g. numbers mixed with text) are not checkpointed
+        tmp_file.unlink(missing_ok=True)
+        print(f"{run['pipeline']}: could not checkpoint {stage}: {e}")
+        return result
+    os.replace(tmp_file, run['path']/file_name)
+
+    run['stages'][key] = {'stage': stage, 'file': file_name, 'rows': len(result),
+                          'sources': _source_fingerprints(sources)}
+    run['outputs'][id(result)] = (weakref.ref(result), key)
+    _write_manifest(run)
+    return result
+
+
+def checkpointed_run(pipeline, sql_sources=()):
+    """
+    Decorator that opens a checkpoint run around a pipeline, resuming the last unfinished one with R2R_RESUME.
+
+    Checkpoints are deleted when the pipeline succeeds and kept for --resume when it fails.
+
+    Parameters:
+    pipeline (str): Name of the checkpoint folder, the runner's pipeline name.
+    sql_sources (list): (engine factory, table, timestamp column) per SQL table it reads.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not checkpoints_enabled():
+                return func(*args, **kwargs)
+
+            sql = {table: sql_fingerprint(connect(), table, timestamp_column)
+                   for connect, table, timestamp_column in sql_sources}
+            run = open_checkpoint_run(pipeline, resume=resume_enabled(), sql=sql)
+            _local.run = run
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                print(f"{pipeline}: checkpoints kept in {run['path']}; run again with --resume to continue")
+                raise
+            finally:
+                _local.run = None
+
+            remove_checkpoints(pipeline)
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,73 @@
+"""
+Command-line entry point for the pipelines.
+
+    python -m r2r_pipelines list
+    python -m r2r_pipelines run                                   # every pipeline except on-demand ones
+    python -m r2r_pipelines run ctd_enreg cpp_segment --workers 4 --profile
+    python -m r2r_pipelines run cpp_segment --with-upstream --no-cache --no-incremental
+    python -m r2r_pipelines run ctd_enreg --resume                # continue a failed run from its checkpoints
+    python -m r2r_pipelines run snd cpp_nr --force                # rerun even if their sources are unchanged
+
+Independent pipelines run in parallel worker processes. The exit code is 0 only when every selected
+pipeline succeeded, so a scheduler can start one process and alert on its return code.
+"""
+import argparse
+
+from r2r_pipelines import runner
+
+
+def list_pipelines(nodes):
+    graph = runner.build_dependency_graph(nodes)
+    print(f"{'pipeline':<25}{'entry point':<70}depends on")
+    for node in nodes:
+        print(f"{node.name:<25}{node.target:<70}{', '.join(sorted(graph[node.name])) or '-'}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m r2r_pipelines', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='Show the pipelines and their dependencies')
+
+    run = commands.add_parser('run', help='Run pipelines in dependency order')
+    run.add_argument('pipelines', nargs='*',
+                     help='Pipeline names (default: all registered pipelines except on-demand ones, e.g. daily_ctd_enreg)')
+    run.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    run.add_argument('--with-upstream', action='store_true',
+                     help='Also run the pipelines producing the inputs of the selected ones')
+    run.add_argument('--incremental', action=argparse.BooleanOptionalAction, default=None,
+                     help='Load only new rows where a pipeline keeps a watermark (default: on)')
+    run.add_argument('--cache', action=argparse.BooleanOptionalAction, default=None,
+                     help='Read share files through the local mirror (default: R2R_MIRROR, on)')
+    run.add_argument('--resume', action='store_true',
+                     help='Reuse the stage checkpoints of the last failed run of each pipeline')
+    run.add_argument('--force', action='store_true',
+                     help='Run pipelines even when their source fingerprints match the last run')
+    run.add_argument('--profile', action='store_true', help='Emit per-stage profiling records')
+    run.add_argument('--profile-path', help='Write the profiling records to this file instead of stderr')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    nodes = runner.discover_nodes()
+
+    if args.command == 'list':
+        list_pipelines(nodes)
+        return 0
+
+    runner.set_run_options(incremental=args.incremental, cache=args.cache,
+                           profile=args.profile or bool(args.profile_path) or None,
+                           profile_path=args.profile_path, resume=args.resume or None,
+                           force=args.force or None)
+
+    # Without names run the registered pipelines only; discovered extras and on-demand ones must be asked for
+    names = args.pipelines or [node.name for node in runner.PIPELINE_NODES if node.name not in runner.ON_DEMAND_NODES]
+    try:
+        results = runner.run_pipelines(names, workers=args.workers, with_upstream=args.with_upstream, nodes=nodes)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    return 0 if all(status == 'success' for status in results.values()) else 1
@@ -0,0 +1,77 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Text date layouts found in the sources, checked against a sample of each column's values
+TEXT_DATE_FORMATS = [
+    (re.compile(r'\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?'), 'ISO8601'),
+    (re.compile(r'\d{1,2}/\d{1,2}/\d{4}'), '%d/%m/%Y'),
+    (re.compile(r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}'), '%d/%m/%Y %H:%M'),
+    (re.compile(r'\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2}'), '%d/%m/%Y %H:%M:%S'),
+]
+
+# Columns mixing layouts are parsed value by value, day first as in the sources
+DAYFIRST = 'dayfirst'
+DAY_FIRST_LAYOUT = re.compile(r'\d{1,2}/\d{1,2}/\d{4}')
+
+SAMPLE_SIZE = 1000
+
+
+def detect_date_format(series, sample_size=SAMPLE_SIZE):
+    """
+    Works out once per column how its dates are stored, from values spread over the whole column.
+
+    Returns:
+    str: 'datetime' for datetime64 columns, a to_datetime format when every sampled value has that layout,
+         DAYFIRST when the layouts are mixed or dd/mm/yyyy text does not fit one format,
+         or None when no value has a known layout (pandas then infers it).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+
+    values = series.dropna()
+    if values.empty or not isinstance(values.iloc[0], str):
+        return None
+
+    positions = np.unique(np.linspace(0, len(values) - 1, min(len(values), sample_size)).astype(int))
+    sample = values.iloc[positions].astype(str).str.strip()
+
+    for pattern, date_format in TEXT_DATE_FORMATS:
+        if sample.str.fullmatch(pattern).all():
+            return date_format
+    if sample.str.match(DAY_FIRST_LAYOUT).any():
+        return DAYFIRST
+    return None
+
+
+def to_date(series, date_format=None, truncate=True):
+    """
+    Parses one column to datetime64 in a single vectorized pass; unparseable values become NaT.
+
+    Parameters:
+    series (pd.Series): datetime64, ISO text or dd/mm/yyyy text (optionally with a time).
+    date_format (str): Known format; detected from the column when omitted.
+    truncate (bool): Drop the time of day.
+    """
+    detected = date_format is None
+    date_format = date_format or detect_date_format(series)
+    if date_format == 'datetime':
+        dates = series
+    elif date_format == DAYFIRST:
+        dates = pd.to_datetime(series, format='mixed', dayfirst=True, errors='coerce')
+    else:
+        dates = pd.to_datetime(series, format=date_format, errors='coerce')
+        # Values outside the sample that do not fit the detected format are parsed one by one, day first
+        missed = dates.isna() & series.notna()
+        if detected and date_format and missed.any():
+            dates = dates.copy()
+            dates[missed] = pd.to_datetime(series[missed], format='mixed', dayfirst=True, errors='coerce')
+
+    return dates.dt.normalize() if truncate else dates
+
+
+def normalize_dates(df, columns, date_format=None, truncate=True):
+    # Converts the columns in place and returns the DataFrame, for use in .pipe chains
+    for col in columns:
+        df[col] = to_date(df[col], date_format, truncate)
+    return df
@@ -0,0 +1,95 @@
+import atexit
+import os
+import threading
+from urllib.parse import quote
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+from config.constants import (PG_POOL_SIZE, PG_MAX_OVERFLOW, PG_POOL_RECYCLE,
+                              PG_POOL_PRE_PING, PG_STATEMENT_TIMEOUT_MS, DATABASE_URL_OVERRIDE)
+
+# One engine (and connection pool) per (database, role) for the whole process
+_engines = {}
+_lock = threading.Lock()
+_env_loaded = False
+
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv(override=True)
+        _env_loaded = True
+
+
+def _build_engine(user_name, pass_word, host, port, database):
+    if DATABASE_URL_OVERRIDE:
+        return create_engine(DATABASE_URL_OVERRIDE)
+
+    _load_env()
+
+    username = os.getenv(user_name)
+    password = os.getenv(pass_word)
+    host = os.getenv(host)
+    port = os.getenv(port)
+    database = os.getenv(database)
+
+    # Ensure all credentials are available
+    if not all([username, password, host, port, database]):
+        raise ValueError("Missing one or more PostgreSQL environment variables!")
+
+    # Encode password to handle special characters
+    encoded_password = quote(password, safe="")
+    DATABASE_URL = f"postgresql+psycopg2://{username}:{encoded_password}@{host}:{port}/{database}"
+
+    connect_args = {}
+    if PG_STATEMENT_TIMEOUT_MS > 0:
+        connect_args['options'] = f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}"
+
+    return create_engine(DATABASE_URL,
+                         pool_size=PG_POOL_SIZE,
+                         max_overflow=PG_MAX_OVERFLOW,
+                         pool_recycle=PG_POOL_RECYCLE,
+                         pool_pre_ping=PG_POOL_PRE_PING,
+                         connect_args=connect_args)
+
+
+def get_engine(database="PG_DATABASE",
+               user_name="PG_USERNAME",
+               pass_word="PG_PASSWORD",
+               host="PG_HOST",
+               port="PG_PORT"):
+    """
+    Returns the shared SQLAlchemy engine for a database and role, creating it on first use.
+
+    Parameters are the names of the environment variables holding each connection setting;
+    the (database, user_name) pair identifies the engine.
+    """
+    key = (database, user_name)
+    engine = _engines.get(key)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = _engines[key] = _build_engine(user_name, pass_word, host, port, database)
+    return engine
+
+
+def dispose_engines():
+    # Close every pooled connection; called at interpreter exit
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _reset_after_fork():
+    # Pooled sockets belong to the parent process; a forked worker must open its own
+    global _lock
+    _lock = threading.Lock()
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+atexit.register(dispose_engines)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
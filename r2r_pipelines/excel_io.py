@@ -0,0 +1,169 @@
+import os
+import pandas as pd
+from pandas.io.parsers import TextParser
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+from config.constants import EXCEL_ENGINE
+
+try:
+    import python_calamine
+except ImportError:  # 'calamine' falls back to openpyxl when python-calamine is not installed
+    python_calamine = None
+
+# 'calamine': Rust reader, fastest on large sheets
+# 'openpyxl': pandas' own openpyxl reader, the behaviour every pipeline was written against
+# 'openpyxl_stream': read-only openpyxl rows, cut to the header + nrows rows and the usecols columns while reading
+EXCEL_ENGINES = ('calamine', 'openpyxl', 'openpyxl_stream')
+
+_warned_fallback = False
+
+
+def resolve_engine(engine=None):
+    # Explicit argument, then R2R_EXCEL_ENGINE (read at call time so the CLI and benchmarks can switch it)
+    global _warned_fallback
+    engine = engine or os.getenv("R2R_EXCEL_ENGINE", EXCEL_ENGINE)
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'. Available: {', '.join(EXCEL_ENGINES)}")
+
+    if engine == 'calamine' and python_calamine is None:
+        if not _warned_fallback:
+            print("python-calamine is not installed; reading Excel files with openpyxl")
+            _warned_fallback = True
+        return 'openpyxl'
+    return engine
+
+
+def read_excel(io, sheet_name=0, header=0, usecols=None, nrows=None, engine=None, **kwargs):
+    """
+    Reads one sheet (or a list of sheets) of a workbook with the configured engine.
+
+    Takes the pandas.read_excel arguments the pipelines use; header, usecols and nrows are
+    handed to the engine so it can stop reading early.
+
+    Returns:
+    pd.DataFrame, or a dict of DataFrames when sheet_name is a list or None.
+    """
+    engine = resolve_engine(engine)
+    if engine != 'openpyxl_stream':
+        return pd.read_excel(io, sheet_name=sheet_name, header=header, usecols=usecols, nrows=nrows,
+                             engine=engine, **kwargs)
+
+    if sheet_name is None or isinstance(sheet_name, list):
+        names = sheet_names(io, engine) if sheet_name is None else sheet_name
+        return {name: _read_sheet_stream(io, name, header, usecols, nrows, **kwargs) for name in names}
+    return _read_sheet_stream(io, sheet_name, header, usecols, nrows, **kwargs)
+
+
+def sheet_names(io, engine=None):
+    engine = resolve_engine(engine)
+    with pd.ExcelFile(io, engine='openpyxl' if engine == 'openpyxl_stream' else engine) as workbook:
+        return workbook.sheet_names
+
+
+def _convert_cell(cell):
+    # Same cell conversion as pandas' openpyxl reader, so both engines give identical frames
+    if cell.value is None:
+        return ''
+    if cell.data_type == TYPE_ERROR:
+        return float('nan')
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def _trim_rows(rows):
+    # Drop trailing empty cells and rows, then pad every row to the same width, as pandas does
+    for row in rows:
+        while row and row[-1] == '':
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+
+    width = max((len(row) for row in rows), default=0)
+    return [row + [''] * (width - len(row)) for row in rows]
+
+
+def _column_positions(worksheet, header, usecols):
+    # 0-based positions of the requested columns, found from the header row; None reads every column
+    if usecols is None or callable(usecols) or isinstance(usecols, str):
+        return None
+    if all(isinstance(col, int) for col in usecols):
+        return sorted(usecols)
+    if header is None:
+        return None
+
+    header_row = next(worksheet.iter_rows(min_row=header + 1, max_row=header + 1), ())
+    # Empty header cells are named as pandas names them
+    names = [_convert_cell(cell) for cell in header_row]
+    names = [f"Unnamed: {pos}" if name == '' else name for pos, name in enumerate(names)]
+    missing = [col for col in usecols if col not in names]
+    if missing:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+    return sorted(names.index(col) for col in usecols)
+
+
+def _read_sheet_stream(io, sheet_name, header=0, usecols=None, nrows=None, **kwargs):
+    workbook = load_workbook(io, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        positions = _column_positions(worksheet, header, usecols)
+
+        max_row = None if nrows is None else (0 if header is None else header + 1) + nrows
+        bounds = {} if positions is None else {'min_col': positions[0] + 1, 'max_col': positions[-1] + 1}
+        rows = []
+        for row in worksheet.iter_rows(max_row=max_row, **bounds):
+            values = [_convert_cell(cell) for cell in row]
+            if positions is not None:
+                values = [values[pos - positions[0]] if pos - positions[0] < len(values) else ''
+                          for pos in positions]
+            rows.append(values)
+    finally:
+        workbook.close()
+
+    # Columns are already projected, so the parser only sees the requested ones
+    if positions is not None:
+        usecols = None
+    return TextParser(_trim_rows(rows), header=header, usecols=usecols, nrows=nrows,
+                      skip_blank_lines=False, **kwargs).read(nrows)
+
+
+def iter_excel_chunks(io, sheet_name=0, chunksize=50000, header=0, **kwargs):
+    """
+    Streams a sheet as DataFrames of at most chunksize rows, so memory does not grow with the sheet.
+
+    Always reads with read-only openpyxl. Cells are converted as in read_excel, and every chunk gets the
+    header row's column names. Blank rows at the end of the sheet are dropped, as read_excel drops them.
+    """
+    workbook = load_workbook(io, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        rows = worksheet.iter_rows(min_row=header + 1)
+        names = _trim_rows([[_convert_cell(cell) for cell in next(rows, ())]])
+        names = names[0] if names else []
+        width = len(names)
+
+        chunk, blank_rows = [], []
+        for row in rows:
+            values = [_convert_cell(cell) for cell in row[:width]]
+            values += [''] * (width - len(values))
+            # Blank rows are only kept once a later row has data
+            if not any(value != '' for value in values):
+                blank_rows.append(values)
+                continue
+            chunk += blank_rows + [values]
+            blank_rows = []
+
+            if len(chunk) >= chunksize:
+                yield _parse_chunk(names, chunk[:chunksize], **kwargs)
+                chunk = chunk[chunksize:]
+
+        if chunk:
+            yield _parse_chunk(names, chunk, **kwargs)
+    finally:
+        workbook.close()
+
+
+def _parse_chunk(names, rows, **kwargs):
+    return TextParser([list(names)] + rows, header=0, skip_blank_lines=False, **kwargs).read()
@@ -1,29 +1,207 @@
-import os
-from urllib.parse import quote
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
+import hashlib
+import re
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, inspect
+
+from r2r_pipelines.engine_registry import get_engine
+from r2r_pipelines.instrumentation import stage
+
+# Stored as the comment of each partition, so a refresh can tell which partitions changed
+PARTITION_HASH_PREFIX = 'r2r_content:'
+PARTITION_INTERVALS = {'month': 'M', 'year': 'Y'}
  
 def marcommdb_connection():
-    # Load environment variables
-    load_dotenv(override=True) 
- 
-    # Get credentials from environment variables
-    username = os.getenv("PG_USERNAME")
-    password = os.getenv("PG_PASSWORD")
-    host = os.getenv("PG_HOST")
-    port = os.getenv("PG_PORT")
-    database = os.getenv("PG_DATABASE_EXPORT")
- 
-    # Ensure all credentials are available
-    if not all([username, password, host, port, database]):
-        raise ValueError("Missing one or more PostgreSQL environment variables!")
- 
-    # Encode password to handle special characters
-    encoded_password = quote(password, safe="") if password else ""
- 
-    # Construct PostgreSQL connection string
-    DATABASE_URL = f"postgresql+psycopg2://{username}:{encoded_password}@{host}:{port}/{database}"
- 
-    # Create and return SQLAlchemy engine
-    return create_engine(DATABASE_URL)
- 
\ No newline at end of file
+    # Shared pooled engine for the export database, created on first use
+    return get_engine(database="PG_DATABASE_EXPORT")
+
+
+def export_table(df, table_name, schema='public', if_exists='replace', **kwargs):
+    # Write a DataFrame to the export database as its own instrumented stage
+    with stage(f"export_db.{schema}.{table_name}", rows_in=len(df)) as record:
+        df.to_sql(table_name, marcommdb_connection(), schema=schema, if_exists=if_exists, index=False, **kwargs)
+        record['rows_out'] = len(df)
+
+
+def export_table_chunks(chunks, table_name, schema='public', **kwargs):
+    # Streams DataFrame chunks into one table in a single transaction: replaced by the first, appended after
+    rows = 0
+    with stage(f"export_db.{schema}.{table_name}") as record:
+        with marcommdb_connection().begin() as connection:
+            for i, chunk in enumerate(chunks):
+                chunk.to_sql(table_name, connection, schema=schema, if_exists='append' if i else 'replace',
+                             index=False, **kwargs)
+                rows += len(chunk)
+        record['rows_out'] = rows
+    return rows
+
+
+def partition_content_hash(df):
+    # Independent of row order; column names and dtypes are part of the content
+    row_hashes = np.sort(pd.util.hash_pandas_object(df, index=False).to_numpy())
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(repr(list(zip(df.columns, map(str, df.dtypes)))).encode())
+    return digest.hexdigest()
+
+
+def _partition_key(value):
+    # Integer keys held as floats (nullable integer columns, see schemas.NULLS_AS_FLOAT) become ints: 2024.0 -> 2024
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return int(value)
+    return value
+
+
+def _sql_literal(value):
+    value = _partition_key(value)
+    if isinstance(value, pd.Timestamp):
+        return f"'{value:%Y-%m-%d}'"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _partition_label(key):
+    # Whole numbers name their partition as they are (p2024); any other key gets a short hash of its raw value,
+    # so distinct keys ('A-B', 'A B', 'a-b', 'default') never share a partition name
+    raw = str(_partition_key(key))
+    if raw.isdigit():
+        return raw
+    label = re.sub(r'\W+', '_', raw).lower()[:30]
+    return f"{label}_{hashlib.sha1(raw.encode()).hexdigest()[:8]}"
+
+
+def _partition_specs(df, table_name, partition_column, interval):
+    # (partition name, bound clause, check condition, rows) per partition; rows without a key go to DEFAULT
+    if interval:
+        keys = df[partition_column].dt.to_period(PARTITION_INTERVALS[interval]).dt.start_time
+    else:
+        keys = df[partition_column]
+
+    specs = []
+    for key, rows in df.groupby(keys, dropna=False, observed=True, sort=True):
+        if pd.isna(key):
+            specs.append((f"{table_name}_pdefault", "default", None, rows))
+            continue
+
+        if interval:
+            upper = key + pd.DateOffset(months=1 if interval == 'month' else 12)
+            label = key.strftime('%Y%m' if interval == 'month' else '%Y')
+            bound = f"for values from ({_sql_literal(key)}) to ({_sql_literal(upper)})"
+            check = f"{partition_column} >= {_sql_literal(key)} and {partition_column} < {_sql_literal(upper)}"
+        else:
+            label = _partition_label(key)
+            bound = f"for values in ({_sql_literal(key)})"
+            check = f"{partition_column} = {_sql_literal(key)}"
+
+        specs.append((f"{table_name}_p{label}", bound, check, rows))
+    return specs
+
+
+def _ensure_partitioned_parent(connection, df, table_name, schema, partition_column, interval, indexes):
+    # Reuses the parent when it is already partitioned with the same columns and types; otherwise creates it afresh
+    relkind = connection.execute(text("""
+        select c.relkind from pg_class c join pg_namespace n on n.oid = c.relnamespace
+        where n.nspname = :schema and c.relname = :table"""), {'schema': schema, 'table': table_name}).scalar()
+
+    # Column types come from the same pandas -> SQL mapping as export_table
+    template = f"{table_name}__template"
+    df.head(0).to_sql(template, connection, schema=schema, if_exists='replace', index=False)
+
+    if relkind == 'p':
+        def column_types(table):
+            return [(col['name'], str(col['type'])) for col in inspect(connection).get_columns(table, schema=schema)]
+
+        if column_types(table_name) == column_types(template):
+            connection.execute(text(f"drop table {schema}.{template}"))
+            return
+
+    connection.execute(text(f"drop table if exists {schema}.{table_name}"))
+    connection.execute(text(f"create table {schema}.{table_name} (like {schema}.{template}) "
+                            f"partition by {'range' if interval else 'list'} ({partition_column})"))
+    connection.execute(text(f"drop table {schema}.{template}"))
+
+    for columns in indexes:
+        connection.execute(text(f"create index if not exists ix_{table_name}_{'_'.join(columns)} "
+                                f"on {schema}.{table_name} ({', '.join(columns)})"))
+
+
+def _partition_hashes(connection, table_name, schema):
+    rows = connection.execute(text("""
+        select c.relname, obj_description(c.oid, 'pg_class')
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        join pg_class p on p.oid = i.inhparent
+        join pg_namespace n on n.oid = p.relnamespace
+        where n.nspname = :schema and p.relname = :table"""), {'schema': schema, 'table': table_name})
+    return {name: (comment or '').removeprefix(PARTITION_HASH_PREFIX) for name, comment in rows}
+
+
+def export_partitioned_table(df, table_name, partition_column, schema='public', interval=None, indexes=()):
+    """
+    Writes a DataFrame to a Postgres partitioned table, reloading only the partitions whose rows changed.
+
+    Each changed partition is loaded into a staging table with its bounds check and indexes, then swapped in
+    with detach/attach in one short transaction, so readers see either the old or the new partition.
+
+    Parameters:
+    df (pd.DataFrame): Full table content.
+    table_name (str): Parent table, e.g. 'ctd_enreg'.
+    partition_column (str): List-partition key, or the date column of a range partition.
+    interval (str): None for one partition per value, 'month' or 'year' for date ranges.
+    indexes (list): Column tuples indexed on every partition.
+
+    Returns:
+    dict: 'refreshed', 'unchanged' or 'dropped' per partition.
+    """
+    engine = marcommdb_connection()
+    parent = f"{schema}.{table_name}"
+    status = {}
+
+    with stage(f"export_db.{parent}", rows_in=len(df)) as record:
+        with engine.begin() as connection:
+            _ensure_partitioned_parent(connection, df, table_name, schema, partition_column, interval, indexes)
+            existing = _partition_hashes(connection, table_name, schema)
+
+        specs = _partition_specs(df, table_name, partition_column, interval)
+        for name, bound, check, rows in specs:
+            content_hash = partition_content_hash(rows)
+            if existing.get(name) == content_hash:
+                status[name] = 'unchanged'
+                continue
+
+            staging = f"{name}_{content_hash[:8]}"
+            with engine.begin() as connection:
+                connection.execute(text(f"drop table if exists {schema}.{staging}"))
+                connection.execute(text(f"create table {schema}.{staging} (like {parent} including defaults)"))
+                rows.to_sql(staging, connection, schema=schema, if_exists='append', index=False)
+                if check:
+                    # Lets ATTACH PARTITION skip its validation scan
+                    connection.execute(text(f"alter table {schema}.{staging} add constraint {staging}_bounds "
+                                            f"check ({partition_column} is not null and {check})"))
+                for i, columns in enumerate(indexes):
+                    connection.execute(text(f"create index {staging}_ix{i} on {schema}.{staging} ({', '.join(columns)})"))
+                connection.execute(text(f"analyze {schema}.{staging}"))
+
+            with engine.begin() as connection:
+                if name in existing:
+                    connection.execute(text(f"alter table {parent} detach partition {schema}.{name}"))
+                    connection.execute(text(f"drop table {schema}.{name}"))
+                connection.execute(text(f"alter table {schema}.{staging} rename to {name}"))
+                connection.execute(text(f"alter table {parent} attach partition {schema}.{name} {bound}"))
+                connection.execute(text(f"comment on table {schema}.{name} is '{PARTITION_HASH_PREFIX}{content_hash}'"))
+            status[name] = 'refreshed'
+
+        # Partitions whose key no longer appears in the data
+        with engine.begin() as connection:
+            for name in set(existing) - {spec[0] for spec in specs}:
+                connection.execute(text(f"alter table {parent} detach partition {schema}.{name}"))
+                connection.execute(text(f"drop table {schema}.{name}"))
+                status[name] = 'dropped'
+
+        record['rows_out'] = sum(len(rows) for name, _, _, rows in specs if status[name] == 'refreshed')
+
+    counts = pd.Series(status, dtype=object).value_counts().to_dict()
+    print(f"{parent}: {counts}")
+
+    return status
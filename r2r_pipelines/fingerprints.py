@@ -0,0 +1,62 @@
+import hashlib
+import inspect
+import os
+from pathlib import Path
+
+from sqlalchemy import text
+
+from config import constants
+
+
+def file_fingerprint(path, with_hash=False, chunk_size=1024 * 1024):
+    """
+    Identifies one version of a file by size and modification time (and optionally its SHA-1).
+
+    Returns:
+    dict: path, size, mtime_ns and sha1 (None unless with_hash).
+    """
+    stat = os.stat(path)
+    sha1 = None
+    if with_hash:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        sha1 = digest.hexdigest()
+
+    return {'path': str(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1}
+
+
+def fingerprint_key(fingerprint):
+    # Compact string form used in logs and cache keys
+    key = f"{fingerprint['size']}-{fingerprint['mtime_ns']}"
+    return f"{key}-{fingerprint['sha1']}" if fingerprint.get('sha1') else key
+
+
+def sql_fingerprint(engine, table, timestamp_column):
+    """
+    Identifies one state of a SQL table by its row count and latest timestamp.
+
+    Returns:
+    dict: table, rows and max_ts (as text, None for an empty table).
+    """
+    with engine.connect() as connection:
+        rows, max_ts = connection.execute(text(f"select count(*), max({timestamp_column}) from {table}")).one()
+    return {'table': table, 'rows': int(rows), 'max_ts': None if max_ts is None else str(max_ts)}
+
+
+def code_fingerprint(func):
+    """
+    Identifies one version of the code behind func: every module of its package, of this package and of config.
+
+    Shared code (schemas, excel_io, dates, ...) shapes every output, so the whole packages are hashed.
+
+    Returns:
+    str: SHA-1 over the module names and contents.
+    """
+    package_dirs = {Path(inspect.getsourcefile(func)).parent, Path(__file__).parent, Path(constants.__file__).parent}
+    digest = hashlib.sha1()
+    for path in sorted(path for folder in package_dirs for path in folder.glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(file_fingerprint(path, with_hash=True)['sha1'].encode())
+    return digest.hexdigest()
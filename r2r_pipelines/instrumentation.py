@@ -0,0 +1,202 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # RSS is reported only when psutil is installed
+    psutil = None
+
+# R2R_PROFILE=1 switches the JSON-lines stage records on; R2R_PROFILE_PATH sends them to a file instead of stderr
+PROFILE_ENV = "R2R_PROFILE"
+PROFILE_PATH_ENV = "R2R_PROFILE_PATH"
+
+# Stage stack and listeners are per thread, so pipelines running in parallel threads do not record each other
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def profiling_enabled():
+    return os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def _thread_listeners():
+    if not hasattr(_local, 'listeners'):
+        _local.listeners = []
+    return _local.listeners
+
+
+def add_listener(listener):
+    # listener(record) is called for every stage finished in this thread (or in workers nested under it),
+    # whether or not profiling output is enabled
+    _thread_listeners().append(listener)
+
+
+def remove_listener(listener):
+    listeners = _thread_listeners()
+    if listener in listeners:
+        listeners.remove(listener)
+
+
+def current_listeners():
+    # The listeners of this thread, to hand to worker threads with nested_under()
+    return list(_thread_listeners())
+
+
+def count_rows(obj):
+    # Rows in a DataFrame/Series, or summed over a tuple/list of them; None when there are none
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        counts = [count_rows(item) for item in obj]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+def _rss_mb():
+    return psutil.Process().memory_info().rss / 1024 ** 2 if psutil else None
+
+
+def _stage_stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def current_stage():
+    # The innermost open stage of this thread, to hand to worker threads
+    stack = _stage_stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def nested_under(record, listeners=()):
+    # Stages opened in a worker thread report the submitting thread's stage as their parent, to its listeners
+    stack, thread_listeners = _stage_stack(), _thread_listeners()
+    saved_listeners = list(thread_listeners)
+    thread_listeners[:] = listeners
+    if record is not None:
+        stack.append(record)
+    try:
+        yield
+    finally:
+        if record is not None:
+            stack.pop()
+        thread_listeners[:] = saved_listeners
+
+
+def emit_record(record):
+    if profiling_enabled():
+        line = json.dumps(record, default=str)
+        with _write_lock:
+            path = os.getenv(PROFILE_PATH_ENV)
+            if path:
+                with open(path, 'a') as f:
+                    f.write(line + "\n")
+            else:
+                print(line, file=sys.stderr, flush=True)
+
+    for listener in list(_thread_listeners()):
+        listener(record)
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Records wall time, CPU time, memory and row counts for a named block of work.
+
+    Set record['rows_out'] (and rows_in) on the yielded dict to report row counts.
+    Does nothing unless profiling is enabled or a listener is registered.
+    """
+    record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+    if not (profiling_enabled() or _thread_listeners()):
+        yield record
+        return
+
+    track_memory = profiling_enabled()
+    stack = _stage_stack()
+    parent = stack[-1] if stack else None
+
+    if track_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if parent is not None:
+            # Keep the parent's peak before resetting it for this stage
+            parent['_peak'] = max(parent.get('_peak', 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        record['_mem_start'] = tracemalloc.get_traced_memory()[0]
+
+    record['parent'] = parent['stage'] if parent else None
+    record['_rss_start'] = _rss_mb() if track_memory else None
+    stack.append(record)
+
+    started_at = datetime.now(timezone.utc)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    status = 'ok'
+    try:
+        yield record
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        wall_s, cpu_s = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        stack.pop()
+
+        py_peak_mb = rss_mb = rss_delta_mb = None
+        if track_memory:
+            peak = max(record.get('_peak', 0), tracemalloc.get_traced_memory()[1])
+            py_peak_mb = (peak - record['_mem_start']) / 1024 ** 2
+            if parent is not None:
+                parent['_peak'] = max(parent.get('_peak', 0), peak)
+            rss_mb = _rss_mb()
+            if rss_mb is not None:
+                rss_delta_mb = rss_mb - record['_rss_start']
+
+        emit_record({
+            'stage': name,
+            'parent': record['parent'],
+            'status': status,
+            'pid': os.getpid(),
+            'started_at': started_at.isoformat(),
+            'ended_at': datetime.now(timezone.utc).isoformat(),
+            'wall_s': round(wall_s, 4),
+            'cpu_s': round(cpu_s, 4),
+            'py_peak_mb': None if py_peak_mb is None else round(py_peak_mb, 2),
+            'rss_mb': None if rss_mb is None else round(rss_mb, 2),
+            'rss_delta_mb': None if rss_delta_mb is None else round(rss_delta_mb, 2),
+            'rows_in': record['rows_in'],
+            'rows_out': record['rows_out'],
+        })
+
+
+def instrument_stage(func=None, *, name=None):
+    """
+    Decorator form of stage(): rows_in counts DataFrame arguments, rows_out the returned DataFrame(s).
+
+    Usage: @instrument_stage or @instrument_stage(name='custom_name')
+    """
+    if func is None:
+        return functools.partial(instrument_stage, name=name)
+
+    stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not (profiling_enabled() or _thread_listeners()):
+            return func(*args, **kwargs)
+
+        with stage(stage_name, rows_in=count_rows(list(args) + list(kwargs.values()))) as record:
+            result = func(*args, **kwargs)
+            record['rows_out'] = count_rows(result)
+        return result
+
+    return wrapper
@@ -0,0 +1,113 @@
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from config.constants import (INTERMEDIATE_PATH, CLEAN_DATA_PATH, EXPORT_EXCEL, LOOKUP_CACHE_PATH,
+                              EXCEL_FILE_EXTENSION, PARQUET_FILE_EXTENSION)
+from r2r_pipelines.fingerprints import file_fingerprint, fingerprint_key, code_fingerprint
+from r2r_pipelines.run_log import track_source
+from r2r_pipelines.share_mirror import share_file
+
+
+def coerce_mixed_columns(df):
+    # Arrow needs one type per column; object columns mixing numbers and text are stored as text
+    mixed_cols = [col for col in df.columns[df.dtypes == object]
+                  if pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer')]
+    if not mixed_cols:
+        return df
+
+    df = df.copy()
+    df[mixed_cols] = df[mixed_cols].apply(lambda x: x.where(x.isna(), x.astype(str)))
+    return df
+
+
+def write_intermediate(df, name, folder_path=INTERMEDIATE_PATH, excel=None, excel_path=CLEAN_DATA_PATH):
+    """
+    Writes a pipeline output as Parquet for other pipelines, plus an optional Excel copy for people.
+
+    Parameters:
+    df (pd.DataFrame): Output to hand off.
+    name (str): Dataset name, e.g. 'cleaned_cpp_enreg'.
+    excel (bool): Also write <excel_path>/<name>.xlsx; defaults to EXPORT_EXCEL.
+
+    Returns:
+    Path: Location of the Parquet file.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    parquet_file = Path(folder_path)/(name + PARQUET_FILE_EXTENSION)
+    coerce_mixed_columns(df).to_parquet(parquet_file, engine='pyarrow', index=False)
+
+    if EXPORT_EXCEL if excel is None else excel:
+        df.to_excel(Path(excel_path)/(name + EXCEL_FILE_EXTENSION), index=False)
+
+    return parquet_file
+
+
+def write_intermediate_chunks(chunks, name, folder_path=INTERMEDIATE_PATH):
+    """
+    Streams DataFrame chunks into one Parquet file, one row group per chunk, without holding them all.
+
+    The first chunk fixes the Arrow schema; later chunks are cast to it.
+
+    Returns:
+    tuple: Location of the Parquet file and the number of rows written.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    parquet_file = Path(folder_path)/(name + PARQUET_FILE_EXTENSION)
+    tmp_file = parquet_file.with_name(f"{parquet_file.name}.{os.getpid()}.tmp")
+
+    writer, rows = None, 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(tmp_file, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        os.replace(tmp_file, parquet_file)
+    return parquet_file, rows
+
+
+def read_intermediate(name, columns=None, folder_path=INTERMEDIATE_PATH):
+    # Only the requested columns are decoded from the file
+    return pd.read_parquet(share_file(Path(folder_path)/(name + PARQUET_FILE_EXTENSION)), engine='pyarrow', columns=columns)
+
+
+def cached_parquet(name, sources, build, folder_path=LOOKUP_CACHE_PATH):
+    """
+    Returns a table derived from source files, rebuilding it only when one of the sources or the code changed.
+
+    Parameters:
+    name (str): Cache file name, e.g. 'acc_withdrawal_lookup'.
+    sources (list): Paths the table is built from; their size + mtime form the cache key, with the code of build.
+    build (callable): Builds the DataFrame from the sources on a cache miss.
+
+    Returns:
+    pd.DataFrame: The cached or freshly built table.
+    """
+    cache_file = Path(folder_path)/(name + PARQUET_FILE_EXTENSION)
+    key_file = cache_file.with_suffix('.key')
+    key = json.dumps([fingerprint_key(file_fingerprint(path)) for path in sources] + [code_fingerprint(build)])
+
+    if cache_file.exists() and key_file.exists() and key_file.read_text() == key:
+        for path in sources:
+            track_source(path)
+        return pd.read_parquet(cache_file, engine='pyarrow')
+
+    df = coerce_mixed_columns(build())
+    os.makedirs(folder_path, exist_ok=True)
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    df.to_parquet(tmp_file, engine='pyarrow', index=False)
+    os.replace(tmp_file, cache_file)
+    key_file.write_text(key)
+
+    return df
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from r2r_pipelines import export_db
+from r2r_pipelines.prep_ctd_enreg import base_ctd_filters
+from r2r_pipelines.prep_fin_fee import extract_programme_bridge
+from r2r_pipelines.intermediate import read_intermediate
+from r2r_pipelines.dates import normalize_dates
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+
+from config.constants import INTERMEDIATE_PATH
+
+# Grain of the fact table: one row per key, target version and CTD reporting date
+TARGET_KEYS = ['intake_year', 'intake_cycle', 'campus', 'market_segment', 'ctd_tgt_stage']
+
+# CPP targets are weekly; a snapshot takes the latest target week at most this far before it
+TARGET_WEEK_TOLERANCE = pd.Timedelta(days=6)
+
+# Every counted opportunity is an enrollment; only registered ones count towards the registration target
+REGISTRATION_STAGES = ['Registered']
+
+# Only the columns the CTD filters and the aggregation need
+query_ctd_actuals = """
+    select
+        reporting_date,
+        programme_code,
+        opp_stage,
+        withdrawn_pre_commencement,
+        admission_status,
+        programme_status,
+        prog_intake_year,
+        prog_cycle,
+        intake_year,
+        "cycle",
+        prev_intake_year,
+        prev_cycle,
+        prev_prog_status,
+        prev_stage,
+        prev_prog_name,
+        market_segment,
+        enreg_count
+    from public.ctd_enreg
+    """
+
+
+@instrument_stage
+def extract_ctd_actuals():
+    with export_db.marcommdb_connection().connect() as connection:
+        df = pd.read_sql_query(query_ctd_actuals, connection)
+
+    return normalize_dates(df, ['reporting_date'])
+
+
+def aggregate_ctd_actuals(df, programme_campus):
+    """
+    Counts CTD enrollments and registrations per reporting date and target key.
+
+    Parameters:
+    df (pd.DataFrame): ctd_enreg rows.
+    programme_campus (pd.DataFrame): programme_code -> campus.
+
+    Returns:
+    pd.DataFrame: reporting_date, TARGET_KEYS and ctd_actual.
+    """
+    df = base_ctd_filters(df).rename(columns={'cycle': 'intake_cycle'})
+    df['programme_code'] = df['programme_code'].astype(str).str.strip()
+    # CPP files fold Progression into Domestic
+    df['market_segment'] = df['market_segment'].replace({'Progression': 'Domestic'})
+    df = df.merge(programme_campus, on='programme_code', how='left')
+
+    unmapped = df['campus'].isna()
+    if unmapped.any():
+        print(f"{unmapped.sum()} CTD rows have a programme code without a campus and are left out")
+        df = df[~unmapped]
+
+    group_cols = ['reporting_date', 'intake_year', 'intake_cycle', 'campus', 'market_segment']
+    enrollment = df.groupby(group_cols, as_index=False)['enreg_count'].sum()
+    registration = df[df['opp_stage'].isin(REGISTRATION_STAGES)]\
+        .groupby(group_cols, as_index=False)['enreg_count'].sum()
+
+    actuals = pd.concat([enrollment.assign(ctd_tgt_stage='Enrollment'),
+                         registration.assign(ctd_tgt_stage='Registration')], ignore_index=True)
+    actuals = actuals.rename(columns={'enreg_count': 'ctd_actual'})
+    actuals['intake_year'] = actuals['intake_year'].astype('int64')
+    return actuals
+
+
+@instrument_stage
+def extract_cpp_targets(folder_path=INTERMEDIATE_PATH, name="cleaned_cpp_enreg"):
+    targets = read_intermediate(name, folder_path=folder_path,
+                                columns=['reporting_date', 'intake_year', 'intake_cycle', 'campus', 'market_segment',
+                                         'cpp_version', 'ctd_tgt_stage', 'ctd_tgt', 'cycle_week_no'])
+    targets = normalize_dates(targets, ['reporting_date'])
+    targets['intake_year'] = targets['intake_year'].astype('int64')
+
+    # Sum the segments of a campus into its market segments
+    return targets.rename(columns={'cpp_version': 'tgt_version'})\
+        .groupby(['reporting_date'] + TARGET_KEYS + ['tgt_version'], as_index=False)\
+        .agg(ctd_tgt=('ctd_tgt', 'sum'), cycle_week_no=('cycle_week_no', 'first'))
+
+
+def align_actuals_to_targets(actuals, targets):
+    """
+    Pairs every CTD snapshot with the latest CPP target week on or before its reporting date.
+
+    merge_asof walks both frames once, sorted on reporting_date, instead of the range join the dashboards ran.
+    Every target key gets a row per snapshot date within its target weeks, with ctd_actual 0 where it has no
+    actuals. Snapshots with no target week within TARGET_WEEK_TOLERANCE keep empty target columns.
+    """
+    grain_cols = ['reporting_date'] + TARGET_KEYS + ['tgt_version']
+
+    # One copy of the actuals per target version of their intake
+    versions = targets[['intake_year', 'intake_cycle', 'tgt_version']].drop_duplicates()
+    actuals = actuals.merge(versions, on=['intake_year', 'intake_cycle'], how='inner')
+
+    # Snapshot dates from each target key's first target week up to its last one
+    target_span = targets.groupby(TARGET_KEYS + ['tgt_version'], as_index=False)['reporting_date']\
+        .agg(first_week='min', last_week='max')
+    snapshot_dates = np.sort(actuals['reporting_date'].unique())
+    start = np.searchsorted(snapshot_dates, target_span['first_week'].to_numpy(), side='left')
+    stop = np.searchsorted(snapshot_dates, (target_span['last_week'] + TARGET_WEEK_TOLERANCE).to_numpy(),
+                           side='right')
+    counts = np.maximum(stop - start, 0)
+    # Each key repeated once per snapshot date in its own span, without a cross join over all dates
+    grain = target_span.loc[target_span.index.repeat(counts)].reset_index(drop=True)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    grain['reporting_date'] = snapshot_dates[np.repeat(start, counts) + offsets]
+
+    actuals = actuals.merge(grain[grain_cols], on=grain_cols, how='outer')
+    actuals['ctd_actual'] = actuals['ctd_actual'].fillna(0).astype('int64')
+
+    targets = targets.rename(columns={'reporting_date': 'tgt_reporting_date'})
+    targets['reporting_date'] = targets['tgt_reporting_date']
+
+    aligned = pd.merge_asof(actuals.sort_values('reporting_date'), targets.sort_values('reporting_date'),
+                            on='reporting_date', by=TARGET_KEYS + ['tgt_version'],
+                            direction='backward', tolerance=TARGET_WEEK_TOLERANCE)
+
+    aligned['ctd_variance'] = aligned['ctd_actual'] - aligned['ctd_tgt']
+    aligned['ctd_attainment'] = aligned['ctd_actual'] / aligned['ctd_tgt'].where(aligned['ctd_tgt'] != 0)
+
+    return aligned[['reporting_date', 'tgt_reporting_date', 'cycle_week_no'] + TARGET_KEYS +
+                   ['tgt_version', 'ctd_actual', 'ctd_tgt', 'ctd_variance', 'ctd_attainment']]\
+        .sort_values(grain_cols)\
+        .reset_index(drop=True)
+
+
+@logged_run('ctd_actual_vs_target')
+@instrument_stage
+def preprocess_actual_vs_target():
+    actuals = aggregate_ctd_actuals(extract_ctd_actuals(), extract_programme_bridge()[['programme_code', 'campus']])
+    fact_df = align_actuals_to_targets(actuals, extract_cpp_targets())
+
+    export_db.export_table(fact_df, 'ctd_actual_vs_target')
+
+    return fact_df
@@ -6,15 +6,26 @@ warnings.filterwarnings("ignore")
 
 from r2r_pipelines import export_db
 from config.constants import ANNUAL_TARGET_PATH
-from r2r_pipelines.prep_pg_enreg import assign_intake_cycle
+from r2r_pipelines.utils import assign_intake_cycle
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.source_manifest import skip_unchanged
+from r2r_pipelines.share_mirror import share_file, prefetch
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.schemas import enforce_schema
+from r2r_pipelines.projection import usecols
+
+# Programme, segment, the intake months and the target type; the columns after them are not read
+TARGET_SHEET_COLUMNS = range(21)
 
 
 def process_annual_target_data(file_name, intake_year, annual_target_path=ANNUAL_TARGET_PATH):
-    targets = pd.read_excel(annual_target_path + '/' + file_name, sheet_name='TUTC target', header=1)
+    targets = read_excel(share_file(annual_target_path + '/' + file_name), sheet_name='TUTC target', header=1,
+                         usecols=usecols(TARGET_SHEET_COLUMNS))
     targets.rename(columns={'Prog_Code':'prog_code', 'Prog_Name': 'prog_name', 'Unnamed: 2':'market_segment', 'Unnamed: 20':'target_type'}, inplace=True)
     targets = targets.iloc[:, :21]
     targets = targets[targets['prog_name'].notnull()].reset_index(drop=True)
-    targets['prog_code'] = targets['prog_code'].astype(str)
+    targets = enforce_schema(targets, 'annual_target_sheet')
 
     # Convert to long format
     targets = targets.melt(id_vars=['prog_code', 'prog_name', 'market_segment', 'target_type'], var_name='intake_month', value_name='enreg_target')
@@ -30,7 +41,7 @@ def process_annual_target_data(file_name, intake_year, annual_target_path=ANNUAL
     targets = targets[~targets['intake_month'].astype(str).str.contains('Total')].reset_index(drop=True)
 
     # Replace "Advanced March" with the correct intake month
-    targets['intake_month'] = targets['intake_month'].astype(str).str.replace('Advanced March', intake_year + '03').str.strip()
+    targets['intake_month'] = targets['intake_month'].astype(str).str.replace('Advanced March', f'{intake_year}03').str.strip()
 
     # Create a new column for intake cycle
     targets['month'] = pd.to_numeric(targets['intake_month'], errors='coerce') % 100
@@ -40,7 +51,7 @@ def process_annual_target_data(file_name, intake_year, annual_target_path=ANNUAL
     return targets
 
 def adjust_2021_targets(ann_tgt_df):
-    adj_21 = ann_tgt_df[ann_tgt_df['intake_year'] == '2021'
+    adj_21 = ann_tgt_df[ann_tgt_df['intake_year'] == 2021
                         ].pivot_table(index=['prog_code', 'prog_name', 'market_segment', 'intake_year', 'intake_cycle', 'intake_month'], 
                                         columns='target_type', values='enreg_target', aggfunc='sum').reset_index()
                     
@@ -49,30 +60,32 @@ def adjust_2021_targets(ann_tgt_df):
     adj_21 = adj_21.melt(id_vars=['prog_code', 'prog_name', 'market_segment', 'intake_year', 'intake_cycle', 'intake_month'],
                 var_name='target_type', value_name='enreg_target')
 
-    adj_21 = adj_21[(adj_21['target_type'] == 'Budget') & (adj_21['intake_year'] == '2021')].reset_index(drop=True)
+    adj_21 = adj_21[(adj_21['target_type'] == 'Budget') & (adj_21['intake_year'] == 2021)].reset_index(drop=True)
 
-    return pd.concat([ann_tgt_df, adj_21[(adj_21['target_type'] == 'Budget') & (adj_21['intake_year'] == '2021')]], ignore_index=True)
+    return pd.concat([ann_tgt_df, adj_21[(adj_21['target_type'] == 'Budget') & (adj_21['intake_year'] == 2021)]], ignore_index=True)
 
+@logged_run('annual_targets')
+@skip_unchanged('annual_targets', folders=[ANNUAL_TARGET_PATH])
+@instrument_stage
 def preprocess_annual_targets(annual_target_path=ANNUAL_TARGET_PATH):
     ann_tgt_df = pd.DataFrame()
 
     # create a list of all files in the test folder
     files = os.listdir(annual_target_path)
+    prefetch(annual_target_path)
 
     for file_name in files:
         if file_name.endswith('.xlsx'):
             print('Processing file:', file_name)
-            intake_year = file_name.split('.')[0].split('_')[2]
+            # Typed once here, so every merge and comparison on intake_year is int against int
+            intake_year = int(file_name.split('.')[0].split('_')[2])
             targets = process_annual_target_data(file_name, intake_year)
             
             ann_tgt_df = pd.concat([ann_tgt_df, targets], ignore_index=True)
 
     adj_ann_tgt = adjust_2021_targets(ann_tgt_df)
 
-    adj_ann_tgt['intake_year'] = adj_ann_tgt['intake_year'].astype(int)
-
-    engine = export_db.marcommdb_connection()
-    adj_ann_tgt.to_sql('annual_targets', engine, schema='public', if_exists='replace', index=False)
+    export_db.export_table(adj_ann_tgt, 'annual_targets')
     
     return adj_ann_tgt
 
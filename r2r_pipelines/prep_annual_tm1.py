@@ -4,6 +4,11 @@ import os
 import warnings
 from pathlib import Path
 from config.constants import TM1_ANNUAL_PATH, CLEAN_DATA_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.source_manifest import skip_unchanged
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
 
 # Ignore warnings
 warnings.filterwarnings("ignore")
@@ -11,9 +16,10 @@ warnings.filterwarnings("ignore")
 # Set the pandas option to opt-in to the future behavior
 pd.set_option('future.no_silent_downcasting', True)
 
+@instrument_stage
 def extract_transform_population(file_path = TM1_ANNUAL_PATH, file_name = "TM1_Total_Student_Population.xlsx"):
     print("Processing Total Student Population file...")
-    df = pd.read_excel(Path(file_path)/file_name, sheet_name="Total_Student_Population", header=None)
+    df = read_excel(share_file(Path(file_path)/file_name), sheet_name="Total_Student_Population", header=None)
     
     # Transform the data to a long format, and make the first row as the header
     df = df.T
@@ -44,9 +50,10 @@ def extract_transform_population(file_path = TM1_ANNUAL_PATH, file_name = "TM1_T
     return df[['campus', 'year', 'field_name_tm1', 'prog_name_tm1', 'value']].reset_index(drop=True)
 
 
+@instrument_stage
 def extract_transform_exclusion(file_path = TM1_ANNUAL_PATH, file_name = "TM1_Exclusion.xlsx"):
     print("Processing Exclusion file...")
-    main_df = pd.read_excel(Path(file_path)/file_name, sheet_name="Exclusion", header=None)
+    main_df = read_excel(share_file(Path(file_path)/file_name), sheet_name="Exclusion", header=None)
     
     # Transform the data to a long format, and make the first row as the header
     df = main_df.T
@@ -77,6 +84,7 @@ def extract_transform_exclusion(file_path = TM1_ANNUAL_PATH, file_name = "TM1_Ex
     return df[['campus', 'year', 'field_name_tm1', 'prog_name_tm1', 'value']].reset_index(drop=True)
 
 
+@instrument_stage
 def transform_fin_efts(main_df):
     # Transform the data to a long format, and make the first row as the header
     df = main_df.T
@@ -105,20 +113,22 @@ def transform_fin_efts(main_df):
     return df[['campus', 'year', 'field_name_tm1', 'prog_name_tm1', 'value']].reset_index(drop=True)
 
 
+@instrument_stage
 def extract_transform_efts(file_path = TM1_ANNUAL_PATH, file_name = "TM1_EFTS.xlsx"):
     print("Processing EFTS File...")
-    efts_df = pd.read_excel(Path(file_path)/file_name, sheet_name="EFTS", header=None)
+    efts_df = read_excel(share_file(Path(file_path)/file_name), sheet_name="EFTS", header=None)
 
     return transform_fin_efts(efts_df)
 
 
+@instrument_stage
 def extract_transform_financial(file_path = TM1_ANNUAL_PATH, file_name = "TM1_Revenue.xlsx"):
     # Process annual financial data
     sheet_names = ['Gross_Revenue', 'Net_Revenue', 'PBT']
 
     for sheet_name in sheet_names:
         print(f"Processing {sheet_name} File...")
-        financial_df = pd.read_excel(Path(file_path)/file_name, sheet_name=sheet_name, header=None)
+        financial_df = read_excel(share_file(Path(file_path)/file_name), sheet_name=sheet_name, header=None)
         
         # save the cleaned data to the sheet_name dataframe
         globals()[sheet_name.lower() + "_df"] = transform_fin_efts(financial_df)
@@ -168,6 +178,9 @@ def deduct_non_academic_revenue(main_df, ex_df, ex_prog, metric):
     main_df.loc[(main_df['prog_name_tm1'].isin(ex_prog)) & (main_df['field_name_tm1'] == metric), 'value'] = hub_df['value'].values
     
     
+@logged_run('tm1_annual')
+@skip_unchanged('tm1_annual')
+@instrument_stage
 def preprocess_annual_data():
     try:
         population_df = extract_transform_population()
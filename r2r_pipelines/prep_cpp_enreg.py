@@ -2,11 +2,25 @@ import pandas as pd
 import warnings
 import os
 from r2r_pipelines import export_db
+from r2r_pipelines.prep_cycle_week import load_cycle_week_index, tag_cycle_week
+from r2r_pipelines.intermediate import write_intermediate
 
-from config.constants import CPP_DATA_PATH, CPP_ENREG_PATH, CLEAN_DATA_PATH
+from config.constants import CPP_DATA_PATH, CPP_ENREG_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.checkpoint import checkpointed_run, checkpoint_stage
+from r2r_pipelines.share_mirror import share_file, prefetch
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.projection import usecols, check_unused_columns, cpp_header
 
 warnings.filterwarnings("ignore")
 
+# Columns read from the CPP workbooks: the historical sheet by (renamed) header, the weekly sheets by position
+ENREG_HISTORICAL_COLUMNS = ['reporting_date', 'intake_year', 'cycle', 'campus', 'team', 'type',
+                            'ly_enrollment', 'ly_registration', 'enrollment', 'registration']
+ENREG_SHEET_COLUMNS = range(4)
+
+
 # Functions to process historical CPP data (Prior to 2023)
 def filter_cpp_enreg(df):
     filter_rules = [
@@ -24,7 +38,10 @@ def filter_cpp_enreg(df):
 
 def process_enreg_historical():
     print("Start Processing: Historical CPP Enreg Data")
-    enreg_df = pd.read_excel(CPP_DATA_PATH + "/cpp_data_original.xlsx", sheet_name="enreg")
+    enreg_df = read_excel(share_file(CPP_DATA_PATH + "/cpp_data_original.xlsx"), sheet_name="enreg",
+                          usecols=usecols(ENREG_HISTORICAL_COLUMNS, normalize=cpp_header))
+    enreg_df = check_unused_columns(enreg_df, ENREG_HISTORICAL_COLUMNS, "cpp_data_original.xlsx [enreg]",
+                                    normalize=cpp_header)
 
     # rename columns, convert to lower case and add underscore for spaces
     enreg_df.columns = enreg_df.columns.str.lower().str.replace(" ", "_")
@@ -75,12 +92,16 @@ def process_enreg_data(df, intake_year, intake_cycle, cpp_version, sheet):
     
     return df
 
+def read_cpp_sheet(file_path, sheet_name):
+    df = read_excel(share_file(file_path), sheet_name=sheet_name, usecols=usecols(ENREG_SHEET_COLUMNS))
+    return check_unused_columns(df, ENREG_SHEET_COLUMNS, f"{os.path.basename(file_path)} [{sheet_name}]")
+
 def process_actual_and_target_data(file_path, intake_year, intake_cycle, cpp_version):
     # Process Actual Last Year Enreg Data
-    enr_df = pd.read_excel(file_path, sheet_name="CTD E Actual " + str(intake_year - 1))
+    enr_df = read_cpp_sheet(file_path, "CTD E Actual " + str(intake_year - 1))
     enr_df = process_enreg_data(enr_df, intake_year, intake_cycle, cpp_version, "ly_enrollment")
 
-    reg_df = pd.read_excel(file_path, sheet_name="CTD R Actual " + str(intake_year - 1))
+    reg_df = read_cpp_sheet(file_path, "CTD R Actual " + str(intake_year - 1))
     reg_df = process_enreg_data(reg_df, intake_year, intake_cycle, cpp_version, "ly_registration")
 
     ly_df = pd.merge(enr_df, reg_df, 
@@ -88,10 +109,10 @@ def process_actual_and_target_data(file_path, intake_year, intake_cycle, cpp_ver
                     how='right')
 
     # Process CTD targets data
-    enr_df = pd.read_excel(file_path, sheet_name="CTD E Targets " + str(intake_year))
+    enr_df = read_cpp_sheet(file_path, "CTD E Targets " + str(intake_year))
     enr_df = process_enreg_data(enr_df, intake_year, intake_cycle, cpp_version, "tgt_enrollment")
 
-    reg_df = pd.read_excel(file_path, sheet_name="CTD R Targets " + str(intake_year))
+    reg_df = read_cpp_sheet(file_path, "CTD R Targets " + str(intake_year))
     reg_df = process_enreg_data(reg_df, intake_year, intake_cycle, cpp_version, "tgt_registration")
 
     tgt_df = pd.merge(enr_df, reg_df, 
@@ -118,6 +139,7 @@ def process_actual_and_target_data(file_path, intake_year, intake_cycle, cpp_ver
 def process_enreg_cpp_files():
     # create a list of all files in the cpp enreg raw data folder
     files = os.listdir(CPP_ENREG_PATH)
+    prefetch(CPP_ENREG_PATH)
     
     enreg_cpp = pd.DataFrame()
     
@@ -128,7 +150,8 @@ def process_enreg_cpp_files():
             intake_year, intake_cycle, cpp_version = process_file_name(file_name)
             file_path =  CPP_ENREG_PATH + "/" + file_name
             
-            full_df = process_actual_and_target_data(file_path, intake_year, intake_cycle, cpp_version)
+            # One checkpoint per workbook, so a resumed run only reads the workbooks not done yet
+            full_df = checkpoint_stage(process_actual_and_target_data, file_path, intake_year, intake_cycle, cpp_version)
             enreg_cpp = pd.concat([enreg_cpp, full_df])
             
     print('Completed Processing CPP EnReg Files')
@@ -167,8 +190,11 @@ def melt_and_merge_final_df(final_df):
     return merged_df
 
 # main() function
+@logged_run('cpp_enreg')
+@checkpointed_run('cpp_enreg')
+@instrument_stage
 def preprocess_cpp_enreg_data():
-    historical_enreg_df = process_enreg_historical()
+    historical_enreg_df = checkpoint_stage(process_enreg_historical)
     enreg_cpp = process_enreg_cpp_files()
     
     full_enreg_cpp = pd.concat([historical_enreg_df, enreg_cpp]).reset_index(drop=True)
@@ -186,9 +212,12 @@ def preprocess_cpp_enreg_data():
                              "tgt_enrollment": "ctd_tgt_enrollment", 
                              "tgt_registration": "ctd_tgt_registration"}, inplace=True)
     
-    full_enreg_cpp.to_excel(CLEAN_DATA_PATH + "/cleaned_cpp_enreg.xlsx", index=False)
+    # Tag each target week with its week within the cycle
+    full_enreg_cpp['cycle_week_no'] = tag_cycle_week(full_enreg_cpp, load_cycle_week_index(), date_column='reporting_date',
+                                                     keys=['intake_year', 'intake_cycle'])['cycle_week_no']
+
+    write_intermediate(full_enreg_cpp, 'cleaned_cpp_enreg')
 
-    engine = export_db.marcommdb_connection()
-    full_enreg_cpp.to_sql('cpp_enreg', engine, schema='public', if_exists='replace', index=False)
+    export_db.export_table(full_enreg_cpp, 'cpp_enreg')
 
     return full_enreg_cpp
\ No newline at end of file
@@ -3,11 +3,25 @@ import warnings
 import os
 import numpy as np
 from r2r_pipelines import export_db
+from r2r_pipelines.intermediate import write_intermediate
 
-from config.constants import CPP_DATA_PATH, CPP_NR_PATH, CLEAN_DATA_PATH
+from config.constants import CPP_DATA_PATH, CPP_NR_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.source_manifest import skip_unchanged
+from r2r_pipelines.share_mirror import share_file, prefetch
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.projection import usecols, check_unused_columns, cpp_header
 
 warnings.filterwarnings("ignore")
 
+# Columns read from the CPP workbooks: the historical sheets by (renamed) header, the weekly sheets by position
+NR_HISTORICAL_COLUMNS = ['reporting_date', 'intake_year', 'cycle', 'campus', 'type',
+                         'ctd_nr_target', 'ctd_gr_target', 'ctd_s&d_target_scholarships', 'ctd_s&d_target_bursaries',
+                         'chdr_target', 'ctd_agent_comm_target']
+NR_SHEET_COLUMNS = range(8)
+
+
 # Functions to process historical NR CPP data (prior to 2023)
 # CPP version filter
 def filter_cpp_enreg(df):
@@ -26,13 +40,14 @@ def filter_cpp_enreg(df):
 
 # Process historical NR data
 def process_nr_historical(sheet):
-    df = pd.read_excel(CPP_DATA_PATH + "/cpp_data_original.xlsx", sheet_name=sheet)
+    df = read_excel(share_file(CPP_DATA_PATH + "/cpp_data_original.xlsx"), sheet_name=sheet,
+                    usecols=usecols(NR_HISTORICAL_COLUMNS, normalize=cpp_header))
 
     # rename columns, convert to lower case and add underscore for spaces
     df.columns = df.columns.str.lower().str.replace(" ", "_")
 
-    # Remove irrelevant columns
-    df.drop(columns=["ctd_student_number_target", 'cycle_end'], inplace=True)
+    # Keep only the declared columns (the rest are only parsed when projection is off)
+    df = check_unused_columns(df, NR_HISTORICAL_COLUMNS, f"cpp_data_original.xlsx [{sheet}]")[NR_HISTORICAL_COLUMNS]
 
     # Rename columns for consistency
     df.rename(columns={"cycle": "intake_cycle",
@@ -83,12 +98,12 @@ def process_nr_data(df, intake_year, intake_cycle, cpp_version, sheet):
 def consolidate_nr_data(file_path, intake_year, intake_cycle, cpp_version):
     # Process Enrollment dataset
     enr_sheet = f"{intake_year} {intake_cycle} CTD NR target by week_E"
-    enr_df = pd.read_excel(file_path, sheet_name=enr_sheet)
+    enr_df = read_excel(share_file(file_path), sheet_name=enr_sheet, usecols=usecols(NR_SHEET_COLUMNS))
     enr_df = process_nr_data(enr_df, intake_year, intake_cycle, cpp_version, "enrollment")
 
     # Process Registration dataset
     reg_sheet = f"{intake_year} {intake_cycle} CTD NR target by week_R"
-    reg_df = pd.read_excel(file_path, sheet_name=reg_sheet)
+    reg_df = read_excel(share_file(file_path), sheet_name=reg_sheet, usecols=usecols(NR_SHEET_COLUMNS))
     reg_df = process_nr_data(reg_df, intake_year, intake_cycle, cpp_version, "registration")
 
     df = pd.concat([enr_df, reg_df], ignore_index=True)
@@ -97,6 +112,7 @@ def consolidate_nr_data(file_path, intake_year, intake_cycle, cpp_version):
 
 def process_nr_cpp_files():
     files = os.listdir(CPP_NR_PATH)
+    prefetch(CPP_NR_PATH)
 
     nr_cpp = pd.DataFrame()
 
@@ -113,6 +129,9 @@ def process_nr_cpp_files():
     return nr_cpp
 
 # Process historical NR data
+@logged_run('cpp_nr')
+@skip_unchanged('cpp_nr', folders=[CPP_NR_PATH])
+@instrument_stage
 def preprocess_cpp_nr_data():
     historical_nr = consolidate_nr_historical()
     nr_cpp = process_nr_cpp_files()
@@ -131,4 +150,6 @@ def preprocess_cpp_nr_data():
                                 'cpp_version': 'tgt_version', 
                                 'stage_target': 'ctd_tgt_stage'}, inplace=True)
     
-    full_nr_cpp.to_excel(CLEAN_DATA_PATH + "/cleaned_cpp_nr.xlsx", index=False)
+    write_intermediate(full_nr_cpp, 'cleaned_cpp_nr')
+
+    return full_nr_cpp
@@ -1,14 +1,21 @@
 import numpy as np
-import pandas as pd
 from r2r_pipelines import export_db
+from r2r_pipelines.prep_cycle_week import load_cycle_week_index, tag_cycle_week
+from r2r_pipelines.intermediate import read_intermediate, write_intermediate
 import os
 
-from config.constants import CLEAN_DATA_PATH, MAPPING_PATH
+from config.constants import INTERMEDIATE_PATH, MAPPING_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
 
-def process_enreg_data(folder_path = CLEAN_DATA_PATH, file_name = "/cleaned_cpp_enreg.xlsx"):
-    enreg_df = pd.read_excel(folder_path + file_name)
+def process_enreg_data(folder_path = INTERMEDIATE_PATH, name = "cleaned_cpp_enreg"):
+    enreg_df = read_intermediate(name, folder_path=folder_path,
+                                 columns=['reporting_date', 'campus', 'intake_cycle', 'intake_year',
+                                          'market_segment', 'cpp_version', 'ctd_tgt_stage', 'ctd_tgt'])
     enreg_df = enreg_df[enreg_df['intake_year'] >= 2024].reset_index(drop=True)
-    enreg_df.rename(columns={'ctd_tgt': 'ctd_student'}, inplace=True)
+    enreg_df.rename(columns={'ctd_tgt': 'ctd_student', 'cpp_version': 'tgt_version'}, inplace=True)
     
     enreg_df = enreg_df\
         .groupby(['reporting_date', 'campus', 'intake_cycle', 'intake_year', 'market_segment', 'tgt_version', 'ctd_tgt_stage'])\
@@ -24,8 +31,10 @@ def process_enreg_data(folder_path = CLEAN_DATA_PATH, file_name = "/cleaned_cpp_
 
     return enreg_df
 
-def process_nr_data(folder_path = CLEAN_DATA_PATH, file_name = "/cleaned_cpp_nr.xlsx"):
-    nr_df = pd.read_excel(folder_path + file_name)
+def process_nr_data(folder_path = INTERMEDIATE_PATH, name = "cleaned_cpp_nr"):
+    nr_df = read_intermediate(name, folder_path=folder_path,
+                              columns=['reporting_date', 'intake_cycle', 'intake_year', 'campus',
+                                       'tgt_version', 'ctd_tgt_stage', 'ctd_tgt_gr', 'ctd_tgt_nr'])
     nr_df = nr_df[nr_df['intake_year'] >= 2024].reset_index(drop=True)
 
     # Final clean-up
@@ -38,7 +47,7 @@ def compile_cpp_data():
     cpp_enreg = process_enreg_data()
     cpp_nr = process_nr_data()
 
-    isr_factor = pd.read_excel(MAPPING_PATH + "/isr_fees_premium.xlsx")
+    isr_factor = read_excel(share_file(MAPPING_PATH + "/isr_fees_premium.xlsx"))
 
     isr_factor = isr_factor[isr_factor['segment'] == 'International']\
         .groupby(['campus', 'intake_cycle', 'enreg'])\
@@ -106,6 +115,8 @@ def consolidate_cpp(process_nr):
 
     return cleaned_nr
 
+@logged_run('cpp_segment')
+@instrument_stage
 def preprocess_cpp_by_segment():
     cpp_data = compile_cpp_data()
     cleaned_cpp_segment = consolidate_cpp(cpp_data)
@@ -124,10 +135,13 @@ def preprocess_cpp_by_segment():
                                         'prev_week_ctd_nr': 'lw_ctd_tgt_nr',
                                         'prev_week_ctd_student': 'lw_ctd_tgt_registration'}, inplace=True)
 
-    cleaned_cpp_segment.to_excel(CLEAN_DATA_PATH + '/cleaned_cpp_segment.xlsx', index=False)
+    # Tag each target week with its week within the cycle
+    cleaned_cpp_segment['cycle_week_no'] = tag_cycle_week(cleaned_cpp_segment, load_cycle_week_index(), date_column='reporting_date',
+                                                          keys=['intake_year', 'intake_cycle'])['cycle_week_no']
 
-    engine = export_db.marcommdb_connection()
-    cleaned_cpp_segment.to_sql('cpp_segment', engine, schema='public', if_exists='replace', index=False)
+    write_intermediate(cleaned_cpp_segment, 'cleaned_cpp_segment')
+
+    export_db.export_table(cleaned_cpp_segment, 'cpp_segment')
 
     return cleaned_cpp_segment
     
@@ -7,10 +7,25 @@ from dotenv import load_dotenv
 from pathlib import Path
 from r2r_pipelines import export_db
 import warnings
-from config.constants import MAPPING_PATH
+from config.constants import MAPPING_PATH, CTD_ENREG_EXPORT_MODE, CTD_ENREG_PARTITION_BY
 from r2r_pipelines import assign_intake_cycle, create_pg_connection
+from r2r_pipelines.prep_cycle_week import load_cycle_week_index, lookup_cycle_end_date, tag_cycle_week
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.checkpoint import checkpointed_run, checkpoint_stage
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.schemas import enforce_schema
+from r2r_pipelines.intermediate import cached_parquet
+from r2r_pipelines.dates import normalize_dates, to_date
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 warnings.filterwarnings('ignore')
 
+# Dashboards filter ctd_enreg by intake year, cycle and reporting date
+CTD_ENREG_INDEXES = [('intake_year', 'cycle'), ('cycle', 'reporting_date'), ('reporting_date',)]
+
 query_sf_opp_enr ="""
     select 
         reporting_date,
@@ -64,6 +79,39 @@ def assign_segment_final(row):
         return 'Domestic'
     
     
+# IPT Same Year Logic: previous intake months that still count as the same year, by the cycle closing month
+def ipt_same_year_month(row):
+    return row['prev_intake_month'] in (set() if row['cycle_end_date'].month < 5
+                                        else {1, 2} if row['cycle_end_date'].month < 9
+                                        else {1, 2, 3, 4, 5, 6})
+
+
+# Withdrawal_PreComm_Flag Logic (Matched)
+def calculate_withdrawal_precomm(row):
+    if pd.isna(row['programme_status']):  # Ignore if programme_status is None or NaN
+        return 0
+
+    if 'Withdrawn' in row['programme_status']:
+        if pd.isna(row['withdrawn_date']) or (
+            row['withdrawn_date'] > row['intakeclosingdate'] and row['withdrawn_date'] > row['registered_date']
+        ):
+            return 0
+        else:
+            return 1
+    return 0
+
+# IPT Previous Year Logic (Matched)
+def calculate_ipt_prev_year(row):
+    if (row['prev_intake_year'] < row['prog_intake_year']
+        ) and row['prev_prog_status'] == 'Transfer Out' and (
+        isinstance(row['ipt_note'], str) and 'previous year' in row['ipt_note'].lower()):
+        return 1
+    elif row['ipt_note'] == 'IPT without task' and row['prev_prog_status'] == 'Transfer Out':
+        return 0
+    else:
+        return np.nan
+
+
 def base_enreg_filters(df):   
     return df[
         (df['withdrawn_pre_commencement'] == 'false') &
@@ -114,7 +162,7 @@ def base_ctd_filters(df):
 
 def adjusted_programme_code(df, file_path = MAPPING_PATH, file_name = 'adj_map.xlsx'):
     # Merge the adjusted programme code to the main dataframe
-    prog_code_adj = pd.read_excel(Path(file_path)/file_name, sheet_name='prog_code_correction', dtype=str)
+    prog_code_adj = read_excel(share_file(Path(file_path)/file_name), sheet_name='prog_code_correction', dtype=str)
     prog_code_adj = prog_code_adj.astype({
         'IntakeYear': 'int'
     })
@@ -135,7 +183,7 @@ def adjusted_programme_code(df, file_path = MAPPING_PATH, file_name = 'adj_map.x
 
 
 def adjusted_intake_month(adj_df, file_path = MAPPING_PATH, file_name = 'adj_map.xlsx'):
-    special_sem_adj = pd.read_excel(Path(file_path)/file_name, sheet_name='special_sem', dtype=str)
+    special_sem_adj = read_excel(share_file(Path(file_path)/file_name), sheet_name='special_sem', dtype=str)
     merge_cols = ['Intake Month Jarvis', 'ProgrammeCode', 'IntakeMonth TM1']
 
     v_df = adj_df.merge(special_sem_adj[merge_cols], 
@@ -150,15 +198,18 @@ def adjusted_intake_month(adj_df, file_path = MAPPING_PATH, file_name = 'adj_map
     return v_df.drop(columns = merge_cols)
 
 
+@instrument_stage
 def extract_enreg_data():
     engine = create_pg_connection()
 
     with engine.connect() as connection:
         df = pd.read_sql_query(query_sf_opp_enr, connection)
-    
-    return base_enreg_filters(df)
 
+    # Compact dtypes before any merge or filter touches the frame
+    return base_enreg_filters(enforce_schema(df, 'sf_opp_enr', report=True))
 
+
+@instrument_stage
 def transform_enreg_data(df):
     df['prog_cycle'] = assign_intake_cycle(df, column_name='prog_intake_month')
     df['prev_cycle'] = assign_intake_cycle(df, column_name='prev_intake_month')
@@ -171,16 +222,19 @@ def transform_enreg_data(df):
     # adjust for special semester
     df = adjusted_intake_month(df)
     
-    # Join with cycle calendar information
-    cycle_calendar = extract_transform_cycle_calendar()
-    df = df.merge(cycle_calendar[['prog_intake_year', 'cycle', 'cycle_end_date']], 
-            on=['prog_intake_year', 'cycle'], how='left')
+    # Look up cycle calendar information from the shared cycle-week index
+    cycle_week_index = load_cycle_week_index()
+    df['cycle_end_date'] = lookup_cycle_end_date(df, cycle_week_index, keys=['prog_intake_year', 'cycle'])
 
     # Final columns formatting
     df[['opp_id', 'acc_id']] = df[['opp_id', 'acc_id']].apply(lambda x: x.str[:15])
 
-    date_columns = ['reporting_date', 'intakeclosingdate', 'registered_date','cycle_end_date']
-    df[date_columns] = df[date_columns].apply(pd.to_datetime,format='%d/%m/%Y',errors='coerce')
+    # One parse per column, truncated to the date; later steps rely on these being dates
+    df = normalize_dates(df, ['reporting_date', 'intakeclosingdate', 'registered_date', 'cycle_end_date'])
+
+    # Tag each snapshot with its week within the cycle
+    df['cycle_week_no'] = tag_cycle_week(df, cycle_week_index, date_column='reporting_date',
+                                         keys=['prog_intake_year', 'cycle'])['cycle_week_no']
 
     df['prev_intake_year'] = df['prev_intake_year'].fillna(0).astype(int)
     df = df.loc[df['withdrawn_pre_commencement'] == 'false'].copy()
@@ -190,15 +244,29 @@ def transform_enreg_data(df):
     
     return df
 
-def extract_transform_acc_withdrawal(file_path = MAPPING_PATH, withdrawal_date = 'Closing_Withdrawal Date.xlsx', pg_acc_data = 'PG_Account_RawData_20250504.csv'):
+ACC_DATA_COLUMNS = ['Id', 'Student_Keys__c', 'LastActivityDate']
+
+
+def read_acc_data(path):
+    # Multithreaded Arrow parser, decoding only the three columns used, all as text
+    table = pacsv.read_csv(path,
+                           read_options=pacsv.ReadOptions(use_threads=True),
+                           convert_options=pacsv.ConvertOptions(include_columns=ACC_DATA_COLUMNS,
+                                                                column_types={col: pa.string() for col in ACC_DATA_COLUMNS},
+                                                                strings_can_be_null=True))
+
+    # Account Id keyed on its first 15 characters; rows without an Id can never match an acc_id
+    table = table.filter(pc.is_valid(table['Id']))
+    table = table.set_column(0, 'Id', pc.utf8_slice_codeunits(table['Id'], 0, 15))
+    return table.to_pandas()
+
+
+def build_acc_withdrawal(withdrawal_path, acc_path):
     # CMS withdrawal data
-    withdrawn = pd.read_excel(Path(file_path)/withdrawal_date, usecols=['Student #', 'Withdrawn Date', 'Course Code'])
+    withdrawn = read_excel(share_file(withdrawal_path), usecols=['Student #', 'Withdrawn Date', 'Course Code'])
 
     # PG Account Data
-    acc_data = pd.read_csv(Path(file_path)/pg_acc_data, usecols=['Id', 'Student_Keys__c', 'LastActivityDate'])
-
-    # in Id column in acc_data, take the first 15 characters
-    acc_data['Id'] = acc_data['Id'].astype(str).str.slice(0, 15)
+    acc_data = read_acc_data(share_file(acc_path))
 
     # convert Student_Keys__c to int, if null then fill with 0, if error then fill with 0
     acc_data['student_keys'] = pd.to_numeric(acc_data['Student_Keys__c'], errors='coerce').astype('Int64')
@@ -211,38 +279,53 @@ def extract_transform_acc_withdrawal(file_path = MAPPING_PATH, withdrawal_date =
         right_on='student_id',
         how='left'
     )
-        
+
     return acc_withdrawal[['Id', 'student_keys', 'last_activity_date', 'student_id', 'withdrawn_date', 'course_code']]
 
+
+@instrument_stage
+def extract_transform_acc_withdrawal(file_path = MAPPING_PATH, withdrawal_date = 'Closing_Withdrawal Date.xlsx', pg_acc_data = 'PG_Account_RawData_20250504.csv'):
+    # Parsed once per version of the two source files, then read back from the local Parquet lookup
+    sources = [Path(file_path)/withdrawal_date, Path(file_path)/pg_acc_data]
+    return cached_parquet('acc_withdrawal_lookup', sources, lambda: build_acc_withdrawal(*sources))
+
+@instrument_stage
 def merge_acc_withdrawal(df):
     # Merge closing dataset with the account_withdrawal info
     acc_withdrawal = extract_transform_acc_withdrawal()
     
     # Filter for closing windows
     cls = df[df['reporting_date'] == df['cycle_end_date']]
-    
-    cls_withdrawal = cls.merge(acc_withdrawal[['Id', 'student_id', 'last_activity_date', 'withdrawn_date']], 
-                               left_on='acc_id', right_on='Id', how='left')
 
-    # Revert to the original index
-    cls_withdrawal.set_index(cls.index, inplace=True)
+    lookup = acc_withdrawal[['Id', 'student_id', 'last_activity_date', 'withdrawn_date']].set_index('Id')
+    if lookup.index.is_unique:
+        # Keyed probe: one row per closing-window record, in its original index
+        cls_withdrawal = lookup.reindex(cls['acc_id'].to_numpy()).set_index(cls.index)
+    else:
+        cls_withdrawal = cls.merge(lookup.reset_index(), left_on='acc_id', right_on='Id', how='left')
+
+        # Revert to the original index
+        cls_withdrawal.set_index(cls.index, inplace=True)
 
     merged_df = df.merge(cls_withdrawal[['last_activity_date', 'withdrawn_date']], 
                          left_index=True, right_index=True, how='left')
     
     return merged_df
 
+@instrument_stage
 def extract_transform_cycle_calendar(file_path = MAPPING_PATH, file_name = "ImportDateStartNEndDate.xlsx"):
     # Academic Calendar -- To get the cycle end date and create the closing dataframe
-    cycle_calendar = pd.read_excel(Path(file_path) / file_name, usecols=['IntakeYear', 'Cycle', 'EndDate']
+    cycle_calendar = read_excel(share_file(Path(file_path) / file_name), usecols=['IntakeYear', 'Cycle', 'EndDate']
                                    ).rename(columns={'IntakeYear': 'prog_intake_year', 
                                                      'Cycle': 'cycle',
                                                      'EndDate': 'cycle_end_date'})
 
-    cycle_calendar['cycle_end_date'] = pd.to_datetime(cycle_calendar['cycle_end_date'], errors='coerce')
+    cycle_calendar = enforce_schema(cycle_calendar, 'cycle_calendar')
+    cycle_calendar['cycle_end_date'] = to_date(cycle_calendar['cycle_end_date'])
     return cycle_calendar
 
 # CTD filters
+@instrument_stage
 def apply_enreg_filters(df):
     # Base filters        
     # CancelledRegistered Logic
@@ -259,10 +342,7 @@ def apply_enreg_filters(df):
     # IPT Same Year Logic
     df['ipt_same_year'] = np.where(
         (df['prev_intake_year'] == df['prog_intake_year']) &
-        (df.apply(lambda row: row['prev_intake_month'] in 
-            (set() if row['cycle_end_date'].month < 5 
-                else {1, 2} if row['cycle_end_date'].month < 9 
-                else {1, 2, 3, 4, 5, 6}), axis=1)) &
+        (df.apply(ipt_same_year_month, axis=1)) &
         (df['prev_prog_status'].isin(['Transfer Out', 'Transferred (Institution)', 'Registered'])),
         1, 0
     )
@@ -274,31 +354,6 @@ def apply_enreg_filters(df):
         1, 0
     )
     
-    # Withdrawal_PreComm_Flag Logic (Matched)
-    def calculate_withdrawal_precomm(row):
-        if pd.isna(row['programme_status']):  # Ignore if programme_status is None or NaN
-            return 0
-        
-        if 'Withdrawn' in row['programme_status']:
-            if pd.isna(row['withdrawn_date']) or (
-                row['withdrawn_date'] > row['intakeclosingdate'] and row['withdrawn_date'] > row['registered_date']
-            ):
-                return 0
-            else:
-                return 1
-        return 0
-
-    # IPT Previous Year Logic (Matched)
-    def calculate_ipt_prev_year(row):
-        if (row['prev_intake_year'] < row['prog_intake_year']
-            ) and row['prev_prog_status'] == 'Transfer Out' and (
-            isinstance(row['ipt_note'], str) and 'previous year' in row['ipt_note'].lower()):
-            return 1
-        elif row['ipt_note'] == 'IPT without task' and row['prev_prog_status'] == 'Transfer Out':
-            return 0
-        else:
-            return np.nan
-        
     # Withdrawal Pre-Comm + IPT Previous Year Logics
     df['withdrawal_pre_comm'] = df.apply(calculate_withdrawal_precomm, axis=1)
     df['ipt_prev_year'] = df.apply(calculate_ipt_prev_year, axis=1)
@@ -311,20 +366,24 @@ def apply_enreg_filters(df):
     
     return df
 
+@logged_run('ctd_enreg')
+@checkpointed_run('ctd_enreg', sql_sources=[(create_pg_connection, 'sf_opp_enr', 'reporting_date')])
+@instrument_stage
 def preprocess_ctd_enreg():
-    main_df = extract_enreg_data()
+    main_df = checkpoint_stage(extract_enreg_data)
     main_df.reset_index(drop=True, inplace=True)
 
-    
-    processed_df =  (main_df.copy().pipe(transform_enreg_data).pipe(merge_acc_withdrawal).pipe(apply_enreg_filters))
-
-    date_columns = ['reporting_date','registered_date','cycle_end_date']
+    # Each step is checkpointed, so a failed export resumes (--resume) without extracting again.
+    # Date columns are already truncated to dates by transform_enreg_data
+    processed_df = checkpoint_stage(transform_enreg_data, main_df)
+    processed_df = checkpoint_stage(merge_acc_withdrawal, processed_df)
+    processed_df = checkpoint_stage(apply_enreg_filters, processed_df)
 
-    for col in date_columns:
-        processed_df[col] = pd.to_datetime(processed_df[col], errors='coerce').dt.strftime('%d/%m/%Y')
-        processed_df[col] = pd.to_datetime(processed_df[col], errors='coerce')
-
-    engine = export_db.marcommdb_connection()
-    processed_df.to_sql('ctd_enreg', engine, schema='public', if_exists='replace', index=False)
+    if CTD_ENREG_EXPORT_MODE == 'partitioned':
+        export_db.export_partitioned_table(processed_df, 'ctd_enreg', partition_column=CTD_ENREG_PARTITION_BY,
+                                           interval='month' if CTD_ENREG_PARTITION_BY == 'reporting_date' else None,
+                                           indexes=CTD_ENREG_INDEXES)
+    else:
+        export_db.export_table(processed_df, 'ctd_enreg')
 
     return processed_df
\ No newline at end of file
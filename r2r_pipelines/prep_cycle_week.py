@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from functools import lru_cache
+from r2r_pipelines import export_db
+from r2r_pipelines.utils import extract_ict_calendar
+from config.constants import MAPPING_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+
+# Cycle weeks end on a Friday, same as pd.date_range(freq='W-FRI')
+WEEK_END_DAY = 4
+
+# Composite lookup key = cycle id shifted above the day number (days since epoch fit in 20 bits)
+CYCLE_KEY_SHIFT = 20
+
+
+def build_cycle_weeks(acad_calendar):
+    """
+    Generates every Friday between cycle_start_date and cycle_end_date for all cycles in one pass.
+
+    Parameters:
+    acad_calendar (pd.DataFrame): Output of extract_ict_calendar.
+
+    Returns:
+    pd.DataFrame: intakeyear, cycle, cycle_week_date, cycle_week_no plus the cycle start and end dates.
+    """
+    cal = acad_calendar.dropna(subset=['cycle_start_date', 'cycle_end_date']).reset_index(drop=True)
+    start = cal['cycle_start_date'].dt.normalize()
+    end = cal['cycle_end_date'].dt.normalize()
+
+    # First Friday on or after the start date and the number of Fridays up to the end date
+    first_friday = start + pd.to_timedelta((WEEK_END_DAY - start.dt.weekday) % 7, unit='D')
+    n_weeks = np.where(end >= first_friday, (end - first_friday).dt.days // 7 + 1, 0)
+
+    cycle_pos = np.repeat(np.arange(len(cal)), n_weeks)
+    week_offset = np.arange(n_weeks.sum()) - np.repeat(np.cumsum(n_weeks) - n_weeks, n_weeks)
+
+    return pd.DataFrame({
+        'intakeyear': cal['prog_intake_year'].to_numpy()[cycle_pos],
+        'cycle': cal['cycle'].to_numpy()[cycle_pos],
+        'cycle_week_date': first_friday.to_numpy()[cycle_pos] + pd.to_timedelta(week_offset * 7, unit='D').to_numpy(),
+        'cycle_week_no': week_offset + 1,
+        'cycle_start_date': start.to_numpy()[cycle_pos],
+        'cycle_end_date': end.to_numpy()[cycle_pos],
+    })
+
+
+def _to_days(dates):
+    return pd.to_datetime(dates, errors='coerce').to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def build_cycle_week_index(cycle_weeks, acad_calendar):
+    """
+    Builds sorted interval arrays over the cycle weeks so dates can be tagged with searchsorted.
+
+    Week 1 runs from the cycle start to the first Friday, every following week from the day after
+    the previous Friday to its own Friday. Days after the last Friday roll into the final (closing) week.
+    The cycle table comes from the calendar itself, so cycles without any week still have their end date.
+    """
+    weeks = cycle_weeks.sort_values(['intakeyear', 'cycle', 'cycle_week_no']).reset_index(drop=True)
+
+    week_end = _to_days(weeks['cycle_week_date'])
+    prev_week_end = np.roll(week_end, 1)
+    is_first_week = weeks['cycle_week_no'].to_numpy() == 1
+    week_start = np.where(is_first_week, _to_days(weeks['cycle_start_date']), prev_week_end + 1)
+
+    is_last_week = np.roll(is_first_week, -1) | (np.arange(len(weeks)) == len(weeks) - 1)
+    week_end = np.where(is_last_week, np.maximum(week_end, _to_days(weeks['cycle_end_date'])), week_end)
+
+    # First calendar row per cycle, as a left merge on the calendar would pick for a unique key
+    cycle_table = acad_calendar.drop_duplicates(subset=['prog_intake_year', 'cycle'])
+    cycles = pd.MultiIndex.from_frame(cycle_table[['prog_intake_year', 'cycle']], names=['intakeyear', 'cycle'])
+    cycle_id = cycles.get_indexer(pd.MultiIndex.from_frame(weeks[['intakeyear', 'cycle']])).astype(np.int64)
+
+    # Date-only lookup assumes cycles do not overlap; the latest-starting cycle wins if they do
+    by_start = np.argsort(week_start, kind='stable')
+    # Keyed lookup orders weeks by (cycle, start) so each cycle is a contiguous run
+    keyed_start = (cycle_id << CYCLE_KEY_SHIFT) + week_start
+    by_key = np.argsort(keyed_start, kind='stable')
+
+    return {
+        'cycles': cycles,
+        'cycle_end_by_cycle': cycle_table['cycle_end_date'].to_numpy(dtype='datetime64[ns]'),
+        'intake_year': weeks['intakeyear'].to_numpy(),
+        'cycle': weeks['cycle'].to_numpy(),
+        'cycle_week_no': weeks['cycle_week_no'].to_numpy(),
+        'cycle_end_date': weeks['cycle_end_date'].to_numpy(),
+        'week_start': week_start[by_start],
+        'week_end': week_end[by_start],
+        'by_start': by_start,
+        'keyed_start': keyed_start[by_key],
+        'keyed_end': ((cycle_id << CYCLE_KEY_SHIFT) + week_end)[by_key],
+        'by_key': by_key,
+    }
+
+
+def tag_cycle_week(df, cycle_week_index, date_column='reporting_date', keys=None):
+    """
+    Tags each row with the cycle week its date falls in, in O(n log k) without merging.
+
+    Parameters:
+    df (pd.DataFrame): Input DataFrame.
+    cycle_week_index (dict): Output of build_cycle_week_index.
+    date_column (str): Column name containing the dates to tag.
+    keys (list): Optional [intake year column, cycle column] to look the date up within a known cycle.
+
+    Returns:
+    pd.DataFrame: intake_year, cycle, cycle_week_no and cycle_end_date aligned to df.index.
+    """
+    idx = cycle_week_index
+    days = _to_days(df[date_column])
+    valid = ~pd.isna(df[date_column]).to_numpy()
+
+    if keys is None:
+        pos = np.searchsorted(idx['week_start'], days, side='right') - 1
+        found = valid & (pos >= 0) & (days <= idx['week_end'][np.clip(pos, 0, None)])
+        order = idx['by_start']
+    else:
+        cycle_id = idx['cycles'].get_indexer(pd.MultiIndex.from_frame(df[keys])).astype(np.int64)
+        probe = (cycle_id << CYCLE_KEY_SHIFT) + days
+        pos = np.searchsorted(idx['keyed_start'], probe, side='right') - 1
+        found = valid & (cycle_id >= 0) & (pos >= 0) & (probe <= idx['keyed_end'][np.clip(pos, 0, None)])
+        order = idx['by_key']
+
+    week = order[np.clip(pos, 0, None)]
+
+    tagged = pd.DataFrame({
+        'intake_year': pd.array(np.where(found, idx['intake_year'][week], None), dtype='Int64'),
+        'cycle': np.where(found, idx['cycle'][week], None),
+        'cycle_week_no': pd.array(np.where(found, idx['cycle_week_no'][week], None), dtype='Int64'),
+        'cycle_end_date': pd.to_datetime(np.where(found, idx['cycle_end_date'][week], np.datetime64('NaT'))),
+    }, index=df.index)
+
+    return tagged
+
+
+def lookup_cycle_end_date(df, cycle_week_index, keys=['prog_intake_year', 'cycle']):
+    # Hashed probe of the cycle table; same result as a left merge on the calendar
+    pos = cycle_week_index['cycles'].get_indexer(pd.MultiIndex.from_frame(df[keys]))
+    end_dates = cycle_week_index['cycle_end_by_cycle'][np.clip(pos, 0, None)]
+
+    return pd.Series(np.where(pos >= 0, end_dates, np.datetime64('NaT')), index=df.index, dtype='datetime64[ns]')
+
+
+@lru_cache(maxsize=None)
+def load_cycle_week_index(file_path=MAPPING_PATH, acad_calendar_file="ImportDateStartNEndDate.xlsx"):
+    # Built once per process and shared by the CTD enreg and CPP pipelines
+    acad_calendar = extract_ict_calendar(file_path, acad_calendar_file)
+    return build_cycle_week_index(build_cycle_weeks(acad_calendar), acad_calendar)
+
+
+@instrument_stage
+def preprocess_cycle_week():
+    cycle_week_df = build_cycle_weeks(extract_ict_calendar())
+    cycle_week_df = cycle_week_df[['intakeyear', 'cycle', 'cycle_week_date', 'cycle_week_no']]
+
+    export_db.export_table(cycle_week_df, 'academic_cycle_week', dtype={
+        'cycle_week_date': sqlalchemy.types.Date(),
+        'cycle': sqlalchemy.types.String(),
+        'cycle_week_no': sqlalchemy.types.Integer(),
+        'intakeyear': sqlalchemy.types.Integer()
+    })
+
+    return cycle_week_df
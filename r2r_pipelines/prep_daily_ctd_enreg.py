@@ -3,8 +3,11 @@ import pandas as pd
 from dotenv import load_dotenv
 from datetime import date
 from r2r_pipelines import export_db
+from r2r_pipelines.utils import flatten_sf_record
+from r2r_pipelines.run_log import logged_run
 import os
 
+@logged_run('daily_ctd_enreg')
 def fetch_and_store_sf_opportunities():
     # Load environment variables
     load_dotenv(override=True)
@@ -87,19 +90,6 @@ def fetch_and_store_sf_opportunities():
 >>>>>>> 84760f9 (n))
     """)
 
-    # Helper function to flatten nested Salesforce records
-    def flatten_sf_record(record, parent_key='', sep='_'):
-        items = []
-        for k, v in record.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if new_key in ['attributes_type', 'attributes_url']:
-                continue  # skip metadata
-            if isinstance(v, dict):
-                items.extend(flatten_sf_record(v, new_key, sep=sep).items())
-            else:
-                items.append((new_key, v))
-        return dict(items)
-
     # Flatten and load into DataFrame
     flattened_records = [flatten_sf_record(rec) for rec in query['records']]
     df = pd.DataFrame(flattened_records)
@@ -107,11 +97,10 @@ def fetch_and_store_sf_opportunities():
     # Add import date
     df['date_import'] = date.today()
 
-    # Get database engine
-    engine = export_db.marcommdb_connection()
-
     # Export to SQL
-    df.to_sql('fact_daily_enreg', engine, schema='staging', if_exists='append', index=False)
+    export_db.export_table(df, 'fact_daily_enreg', schema='staging', if_exists='append')
 
     print(f"Inserted {len(df)} records into 'daily_enreg' table.")
 
+    return df
+
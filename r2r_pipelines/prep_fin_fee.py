@@ -6,15 +6,34 @@ import warnings
 from pathlib import Path
 from config.constants import FINANCE_FEE_PATH
 from r2r_pipelines.utils import assign_intake_cycle, create_pg_connection
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.schemas import enforce_schema
+from r2r_pipelines.dates import normalize_dates
+from r2r_pipelines.parallel_load import load_sources
+from r2r_pipelines.projection import usecols, select_query, check_unused_columns
 
 warnings.filterwarnings("ignore")
 
+# Source columns each reader consumes; the blank headers of the first three columns read as 'Unnamed: n'
+FEES_BY_SEGMENT_COLUMNS = ['Unnamed: 0', 'Unnamed: 1', 'Unnamed: 2',
+                           'Total Tuition Fees (Local)', 'Total Tuition Fee per Student (International)']
+ACAD_CALENDAR_COLUMNS = ['Unnamed: 0', 'Unnamed: 1', 'Unnamed: 2', 'Start Month', 'End Month']
+FIN_FEE_COLUMNS = ['course_desc_tm1', 'course_desc_jarvis', 'intake', 'semester', 'year', 'campus',
+                   'start_date', 'end_date', 'attrition', 'cms_progcode',
+                   'int_enrollment_fee', 'int_student_charges', 'int_annual_fee', 'int_total_fee',
+                   'loc_enrollment_fee', 'loc_resource_fee', 'loc_tuition_fee', 'tmsciencefee']
+
 ## International total fees dataset
+@instrument_stage
 def transform_fees_by_segment(file_path = FINANCE_FEE_PATH, 
                             file_name = "TU+TC Total Tuition Fees by Segment.xlsx", 
                             sheet_name = 'TU'):
     # Read the excel file
-    df = pd.read_excel(Path(file_path)/file_name, sheet_name=sheet_name, header=5)
+    df = read_excel(share_file(Path(file_path)/file_name), sheet_name=sheet_name, header=5,
+                    usecols=usecols(FEES_BY_SEGMENT_COLUMNS))
+    df = check_unused_columns(df, FEES_BY_SEGMENT_COLUMNS, f"{file_name} [{sheet_name}]")
 
     # Renaming the first three columns and reformatting column names
     df.rename(columns={
@@ -36,6 +55,7 @@ def transform_fees_by_segment(file_path = FINANCE_FEE_PATH,
     
     return df
 
+@instrument_stage
 def extract_transform_fees_by_segment():
     df = pd.concat(
         [transform_fees_by_segment(sheet_name=sheet) for sheet in ['TU', 'TC']], ignore_index=True
@@ -47,13 +67,16 @@ def extract_transform_fees_by_segment():
                      'total_tuition_fees_local', 'total_tuition_fees_international']
     df = df[relevant_cols]
     
-    return df
+    return enforce_schema(df, 'fees_by_segment')
 
 ## Academic calendar dataset
+@instrument_stage
 def transform_acad_calendar(file_path = FINANCE_FEE_PATH,
                              file_name = "TUSB and TMSB - TM1 Acad Calendar.xlsx",
                              sheet_name = 'TUSB'):
-    df = pd.read_excel(Path(file_path)/file_name, sheet_name=sheet_name, header=5)
+    df = read_excel(share_file(Path(file_path)/file_name), sheet_name=sheet_name, header=5,
+                    usecols=usecols(ACAD_CALENDAR_COLUMNS))
+    df = check_unused_columns(df, ACAD_CALENDAR_COLUMNS, f"{file_name} [{sheet_name}]")
 
     # Renaming the first three columns and reformatting column names
     df.rename(columns={
@@ -75,23 +98,24 @@ def transform_acad_calendar(file_path = FINANCE_FEE_PATH,
 
     return df
 
+@instrument_stage
 def extract_transform_acad_calendar():
     df = pd.concat(
         [transform_acad_calendar(sheet_name=sheet) for sheet in ['TUSB', 'TMSB']], ignore_index=True
         ).reset_index(drop=True)
     
     # Convert start_month and end_month to datetime format
-    df['start_month'] = pd.to_datetime(df['start_month'], errors='coerce', format='%b-%y')
-    df['end_month'] = pd.to_datetime(df['end_month'], errors='coerce', format='%b-%y')
+    df = normalize_dates(df, ['start_month', 'end_month'], date_format='%b-%y')
         
     relevant_cols = ['prog_name', 'intake', 'intake_semester', 'start_month', 'end_month']
     df = df[relevant_cols]
         
-    return df
+    return enforce_schema(df, 'acad_calendar')
 
 ## CALSACE table
+@instrument_stage
 def extract_transform_calsace(file_path = FINANCE_FEE_PATH, file_name = "BI_Extract_TMStudentPercent_TC.csv"):
-    df = pd.read_csv(Path(file_path)/file_name)
+    df = pd.read_csv(share_file(Path(file_path)/file_name))
 
     # Rename columns
     rename_dict = {
@@ -130,21 +154,42 @@ def extract_transform_calsace(file_path = FINANCE_FEE_PATH, file_name = "BI_Extr
             'calsace_sci_fee_mult_intl': 'max'
         }).reset_index()
     
-    return df
+    return enforce_schema(df, 'calsace')
 
+@instrument_stage
 def extract_fin_fees_pgsql():
-    fin_fee_query = """SELECT * FROM r2r_finance_fees"""
+    fin_fee_query = select_query('r2r_finance_fees', FIN_FEE_COLUMNS)
     engine = create_pg_connection()
     
     with engine.connect() as connection:
         df = pd.read_sql_query(fin_fee_query, connection)
     print("Data loaded successfully from cms_sas database")
-    return df
+    check_unused_columns(df, FIN_FEE_COLUMNS, 'r2r_finance_fees')
+    return enforce_schema(df, 'r2r_finance_fees', report=True)
+
+@instrument_stage
+def extract_programme_bridge():
+    # ctd_enreg only carries programme codes; the finance fee table gives each code its TM1 name and campus
+    bridge_query = """
+        SELECT DISTINCT cms_progcode, course_desc_tm1, campus
+        FROM r2r_finance_fees
+        WHERE cms_progcode IS NOT NULL AND campus IS NOT NULL
+        """
+    with create_pg_connection().connect() as connection:
+        df = pd.read_sql_query(bridge_query, connection)
+
+    df = df.rename(columns={'cms_progcode': 'programme_code', 'course_desc_tm1': 'prog_name'})
+    df['programme_code'] = df['programme_code'].astype(str).str.strip()
+    # Same clean-up as extract_transform_fin_fees, so the names match the fee tables
+    df['prog_name'] = df['prog_name'].str.replace(r'\(INACTIVE\)|- INACTIVE', '', regex=True).str.strip()
+    return df.drop_duplicates(subset='programme_code').reset_index(drop=True)
 
+@instrument_stage
 def extract_fin_fees_manual(file_path = FINANCE_FEE_PATH, file_name = "E_FinanceFee_manual.xlsx"):
     # Read the excel file
-    return pd.read_excel(Path(file_path)/file_name, sheet_name="C_FinanceFee", header=0)
+    return read_excel(share_file(Path(file_path)/file_name), sheet_name="C_FinanceFee", header=0)
 
+@instrument_stage
 def extract_transform_fin_fees():
     fin_df = extract_fin_fees_pgsql()
     
@@ -180,14 +225,22 @@ def extract_transform_fin_fees():
     
     return fin_df
 
+@instrument_stage
 def preprocess_finance_fees():
     # load data
     print("Start preprocessing finance fee files...")
     print("Loading data...")
-    total_fees_df = extract_transform_fees_by_segment()
-    calsace_df = extract_transform_calsace()
-    acadcalendar_df = extract_transform_acad_calendar()
-    fin_df = extract_transform_fin_fees()
+    # Independent sources: the Postgres query overlaps with the Excel and CSV parsing
+    sources = load_sources({
+        'fees_by_segment': extract_transform_fees_by_segment,
+        'calsace': extract_transform_calsace,
+        'acad_calendar': extract_transform_acad_calendar,
+        'r2r_finance_fees': extract_transform_fin_fees,
+    })
+    total_fees_df = sources['fees_by_segment']
+    calsace_df = sources['calsace']
+    acadcalendar_df = sources['acad_calendar']
+    fin_df = sources['r2r_finance_fees']
     
     print("Merging 'international total fees' data...")
     # Merge fin_df and total_fees_df on prog_name, intake_month, and intake_semester
@@ -208,8 +261,7 @@ def preprocess_finance_fees():
     fin_merged['acad_end_date'] = fin_merged['end_date'].fillna(fin_merged['end_month'])
 
     # Convert acad_start_date and acad_end_date to datetime format
-    fin_merged['acad_start_date'] = pd.to_datetime(fin_merged['acad_start_date'], errors='coerce')
-    fin_merged['acad_end_date'] = pd.to_datetime(fin_merged['acad_end_date'], errors='coerce')
+    fin_merged = normalize_dates(fin_merged, ['acad_start_date', 'acad_end_date'])
 
     print("Merging 'CALSACE' data...")
     # Merge with calsace data
@@ -250,6 +302,11 @@ def preprocess_finance_fees():
     return fin_merged[fin_cols]
 
 
+def select_amortized_nom(row):
+    # Amortization formula is only applicable from 2023 onwards
+    return row['amortized_nom'] if row['intake_year'] >= 2023 else row['amortized_denom']
+
+
 def calculate_first_year_fee():
     fin_fee = preprocess_finance_fees()
     
@@ -257,9 +314,7 @@ def calculate_first_year_fee():
     fee_by_cycle = fin_fee[(fin_fee['acad_start_date'].dt.year == fin_fee['intake_year'])].reset_index(drop=True)
 
     # Amortization formula is only applicable from 2023 onwards
-    fee_by_cycle['amortized_nom'] = fee_by_cycle.apply(
-        lambda row: row['amortized_nom'] if row['intake_year'] >= 2023 else row['amortized_denom'], axis=1
-    )
+    fee_by_cycle['amortized_nom'] = fee_by_cycle.apply(select_amortized_nom, axis=1)
 
     # Calculate first_year_fee by grouping the data by prog_name, campus, intake_year, intake_cycle, and intake
     first_year_fee = fee_by_cycle.groupby(['prog_name', 'campus', 'intake_year', 'intake_cycle', 'intake']).apply(
@@ -301,6 +356,7 @@ def calculate_first_year_fee():
     return first_year_fee
 
 
+@instrument_stage
 def preprocess_first_year_fee():
     first_year_fee = calculate_first_year_fee()    
     
@@ -4,6 +4,13 @@ import os
 from r2r_pipelines.utils import extract_ict_calendar
 
 from config.constants import CYCLE_CLOSING_PATH, MAPPING_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.share_mirror import share_file, prefetch
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.dates import normalize_dates
+from r2r_pipelines.projection import usecols, check_unused_columns
+
+CLOSING_COLUMNS = ['AccountID', 'OpportunityID', 'OpportunityName']
 
 def get_closing_file_info(file_name):
     # split the file name by "_" and "."
@@ -14,19 +21,20 @@ def get_closing_file_info(file_name):
     
     return intake_year, intake_cycle
 
+@instrument_stage
 def preprocess_closing_data(file_path = CYCLE_CLOSING_PATH):   
     cls_df = pd.DataFrame()
-    relevant_cols = ['AccountID', 'OpportunityID', 'OpportunityName']
     
     # create a list of all files in the test folder
     files = os.listdir(CYCLE_CLOSING_PATH)
+    prefetch(file_path)
     
     # loop through all files in the cycle_closing folder
     for file_name in files:
         if file_name.endswith('.xlsx'):
             print('Processing file:', file_name)
-            cls = pd.read_excel(os.path.join(file_path, file_name))
-            cls = cls[relevant_cols].copy()
+            cls = read_excel(share_file(os.path.join(file_path, file_name)), usecols=usecols(CLOSING_COLUMNS))
+            cls = check_unused_columns(cls, CLOSING_COLUMNS, file_name)[CLOSING_COLUMNS].copy()
             cls.rename(columns={'AccountID': 'acc_id', 'OpportunityID': 'opp_id', 'OpportunityName': 'opp_name'}, inplace=True)
             cls['intake_year'], cls['intake_cycle'] = get_closing_file_info(file_name)
             cls_df = pd.concat([cls_df, cls], ignore_index=True)
@@ -36,5 +44,6 @@ def preprocess_closing_data(file_path = CYCLE_CLOSING_PATH):
     cls_df = cls_df.merge(acad_calendar[['prog_intake_year', 'cycle', 'cycle_start_date', 'cycle_end_date']],
                       left_on=['intake_year', 'intake_cycle'], right_on=['prog_intake_year', 'cycle'], how='left')
     cls_df.drop(columns=['prog_intake_year', 'cycle'], inplace=True)
+    cls_df = normalize_dates(cls_df, ['cycle_start_date', 'cycle_end_date'])
     
     return cls_df
\ No newline at end of file
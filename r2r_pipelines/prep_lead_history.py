@@ -0,0 +1,119 @@
+from simple_salesforce import Salesforce
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import text, inspect
+from r2r_pipelines import export_db
+from r2r_pipelines.utils import flatten_sf_record
+import os
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.runner import incremental_enabled
+
+# Salesforce returns CreatedDate as e.g. 2024-03-01T08:15:30.000+0000
+SF_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+query_lead_history = """
+    select
+        Id,
+        LeadId,
+        IsDeleted,
+        OldValue,
+        NewValue,
+        CreatedDate
+    from LeadHistory
+    where Field = 'Status'
+      and CreatedDate >= {watermark}
+    """
+
+
+def sf_connection():
+    load_dotenv(override=True)
+
+    return Salesforce(username=os.getenv("SF_USERNAME"),
+                      password=os.getenv("SF_PASSWORD"),
+                      security_token=os.getenv("SF_SECURITY_TOKEN"))
+
+
+def get_transition_watermark(engine, table='lead_status_transition', schema='public', start_date='2022-01-01T00:00:00Z'):
+    # The latest transition already loaded; fall back to the initial load date on the first run
+    if not inspect(engine).has_table(table, schema=schema):
+        return pd.Timestamp(start_date)
+
+    with engine.connect() as connection:
+        watermark = connection.execute(text(f"select max(ts) from {schema}.{table}")).scalar()
+
+    if watermark is None:
+        return pd.Timestamp(start_date)
+
+    # Whole seconds, as SOQL compares them: the delete must cover every row the query returns again
+    watermark = pd.Timestamp(watermark)
+    watermark = watermark.tz_localize('UTC') if watermark.tzinfo is None else watermark.tz_convert('UTC')
+    return watermark.floor('s')
+
+
+@instrument_stage
+def extract_lead_history(sf, watermark):
+    # SOQL datetime literals are unquoted ISO-8601 in UTC
+    soql_watermark = watermark.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+    query = sf.query_all(query_lead_history.format(watermark=soql_watermark))
+
+    flattened_records = [flatten_sf_record(rec) for rec in query['records']]
+    return pd.DataFrame(flattened_records,
+                        columns=['Id', 'LeadId', 'IsDeleted', 'OldValue', 'NewValue', 'CreatedDate'])
+
+
+@instrument_stage
+def transform_lead_history(df):
+    # Drop deleted history rows and duplicates coming from overlapping watermarks
+    df = df[df['IsDeleted'] != True].drop_duplicates(subset=['Id'])
+
+    transitions = df.rename(columns={'LeadId': 'lead_id',
+                                     'OldValue': 'from_status',
+                                     'NewValue': 'to_status',
+                                     'CreatedDate': 'ts'})
+
+    # Parse the whole column at once with a fixed format instead of a per-row strptime
+    transitions['ts'] = pd.to_datetime(transitions['ts'], format=SF_DATETIME_FORMAT, utc=True, errors='coerce')
+    transitions = transitions.dropna(subset=['lead_id', 'ts'])
+
+    return transitions[['lead_id', 'from_status', 'to_status', 'ts']]\
+        .sort_values(by=['lead_id', 'ts'])\
+        .reset_index(drop=True)
+
+
+def load_lead_transitions(transitions, engine, watermark, table='lead_status_transition', schema='public'):
+    # Rows from the (whole-second) watermark on are re-queried on every run, so replace them instead of appending twice
+    with engine.begin() as connection:
+        if inspect(connection).has_table(table, schema=schema):
+            connection.execute(text(f"delete from {schema}.{table} where ts >= :watermark"),
+                               {'watermark': watermark.floor('s').to_pydatetime()})
+
+        transitions.to_sql(table, connection, schema=schema, if_exists='append', index=False)
+
+        connection.execute(text(f"create index if not exists ix_{table}_lead_ts on {schema}.{table} (lead_id, ts)"))
+        connection.execute(text(f"create index if not exists ix_{table}_to_status_ts on {schema}.{table} (to_status, ts)"))
+
+
+@instrument_stage
+def preprocess_lead_status_transitions(full_refresh=None, start_date='2022-01-01T00:00:00Z'):
+    # Unless told otherwise, follow the run's incremental switch (R2R_INCREMENTAL)
+    if full_refresh is None:
+        full_refresh = not incremental_enabled()
+
+    engine = export_db.marcommdb_connection()
+
+    watermark = pd.Timestamp(start_date) if full_refresh else get_transition_watermark(engine, start_date=start_date)
+    print(f"Loading LeadHistory status changes from {watermark}")
+
+    if full_refresh:
+        with engine.begin() as connection:
+            connection.execute(text("drop table if exists public.lead_status_transition"))
+
+    transitions = (
+        extract_lead_history(sf_connection(), watermark)
+        .pipe(transform_lead_history)
+    )
+
+    load_lead_transitions(transitions, engine, watermark)
+    print(f"Inserted {len(transitions)} transitions into 'lead_status_transition' table.")
+
+    return transitions
@@ -1,23 +1,27 @@
 import numpy as np
-import pandas as pd
 import warnings
 import os
-from config.constants import RM_MOHE_PATH, MAPPING_PATH, CLEAN_DATA_PATH
+from config.constants import RM_MOHE_PATH, MAPPING_PATH, MOHE_CHUNK_ROWS
+from r2r_pipelines.intermediate import write_intermediate, write_intermediate_chunks
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.schemas import apply_output_schema
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel, iter_excel_chunks
 
 # ignore warnings
 warnings.filterwarnings('ignore')
 
-def read_and_clean_mohe_data():
+def mohe_workbook():
     files = os.listdir(RM_MOHE_PATH)
     
     # There should be only one active excel file in the folder
     for file_name in files:
         if file_name.endswith('.xlsx'):
-            mohe_df = pd.read_excel(RM_MOHE_PATH + '/' + file_name, sheet_name="TE")
-    
-    # read the full mohe dataset from redmarch
-    #mohe_df = pd.read_excel(raw_data_path + "Redmarch - IPTS Enrolment Database 2023 v12 CLIENT (Raw data).xlsx", sheet_name="TE")
-    
+            workbook = share_file(RM_MOHE_PATH + '/' + file_name)
+
+    return workbook
+
+def clean_mohe_data(mohe_df):
     # convert column names to lowercase and replace spaces with underscores in mohe_df
     mohe_df.columns = mohe_df.columns.str.lower().str.replace(" ", "_")
 
@@ -32,9 +36,14 @@ def read_and_clean_mohe_data():
     
     return mohe_df
 
+def read_and_clean_mohe_data():
+    # read the full mohe dataset from redmarch
+    #mohe_df = pd.read_excel(raw_data_path + "Redmarch - IPTS Enrolment Database 2023 v12 CLIENT (Raw data).xlsx", sheet_name="TE")
+    return clean_mohe_data(read_excel(mohe_workbook(), sheet_name="TE"))
+
 def read_and_clean_prog_master():
     # read programme master file mapping
-    prog_master = pd.read_excel(MAPPING_PATH + '/prog_master_file.xlsx', sheet_name="prog_master")
+    prog_master = read_excel(share_file(MAPPING_PATH + '/prog_master_file.xlsx'), sheet_name="prog_master")
 
     # remove empty rows from level column from prog_master table
     prog_master = prog_master.dropna(subset=["level"]).reset_index(drop=True)
@@ -55,12 +64,8 @@ def process_rules(prog_master):
     
     return rules_df
 
-# Processing Programme Master file to identify possible labels for each row in MOHE data
-prog_master = read_and_clean_prog_master()
-rules_df = process_rules(prog_master)
-
 # Create a list of all possible matches for each row
-def get_matching_labels(row):
+def get_matching_labels(row, rules_df):
     matches = rules_df[
         (rules_df["level"] == row["level"]) &
         (rules_df["vertical"] == row["vertical"]) &
@@ -77,18 +82,42 @@ def resolve_label(possible_labels):
     else:
         return "Unlabeled"  # No match
 
-# Process and save the MOHE data
-def preprocess_mohe_data():
-    mohe_df = read_and_clean_mohe_data()
-    mohe_df['possible_labels'] = mohe_df.apply(get_matching_labels, axis=1)
+def label_mohe_data(mohe_df, rules_df):
+    mohe_df['possible_labels'] = mohe_df.apply(get_matching_labels, axis=1, rules_df=rules_df)
     mohe_df['prog_label_count'] = mohe_df['possible_labels'].apply(len)
     mohe_df['prog_name_main'] = mohe_df['possible_labels'].apply(resolve_label)
     
     # drop 'possible_labels' column
     mohe_df.drop(columns=['possible_labels'], inplace=True)
     mohe_df['year'] = mohe_df['year'].astype(int)
-    
-    mohe_df.to_excel(CLEAN_DATA_PATH + "/cleaned_mohe_prog_labels.xlsx", index=False)
 
+    return mohe_df
+
+def stream_mohe_data(chunk_rows, rules_df):
+    # Cleaned and labelled chunks of the TE sheet, typed the same as the in-memory output
+    for chunk in iter_excel_chunks(mohe_workbook(), sheet_name="TE", chunksize=chunk_rows, dtype=object):
+        chunk = clean_mohe_data(chunk)
+        if not chunk.empty:
+            yield apply_output_schema(label_mohe_data(chunk, rules_df), 'cleaned_mohe_prog_labels')
+
+# Process and save the MOHE data
+@instrument_stage
+def preprocess_mohe_data(chunk_rows = MOHE_CHUNK_ROWS):
+    # Both modes write the cleaned_mohe_prog_labels handoff and return its row count;
+    # chunk_rows > 0 streams the sheet straight into the Parquet file (no Excel copy)
+
+    # Processing Programme Master file to identify possible labels for each row in MOHE data.
+    # Read here rather than at import, so importing the package does not need the share
+    rules_df = process_rules(read_and_clean_prog_master())
+
+    if chunk_rows:
+        parquet_file, rows = write_intermediate_chunks(stream_mohe_data(chunk_rows, rules_df),
+                                                       'cleaned_mohe_prog_labels')
+        print(f"Streamed {rows} MOHE rows to {parquet_file}")
+        return rows
+
+    mohe_df = label_mohe_data(read_and_clean_mohe_data(), rules_df)
+    
+    write_intermediate(apply_output_schema(mohe_df, 'cleaned_mohe_prog_labels'), 'cleaned_mohe_prog_labels')
 
-    return mohe_df
\ No newline at end of file
+    return len(mohe_df)
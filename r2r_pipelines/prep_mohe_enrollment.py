@@ -1,17 +1,19 @@
 import numpy as np
-import pandas as pd
 import warnings
 from pathlib import Path
-from config.constants import RM_MOHE_PATH, MAPPING_PATH
+from config.constants import RM_MOHE_PATH, MAPPING_PATH, MOHE_CHUNK_ROWS, MOHE_OUTPUT
+from r2r_pipelines import export_db
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.intermediate import write_intermediate_chunks
+from r2r_pipelines.schemas import apply_output_schema
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel, iter_excel_chunks
 
 # ignore warnings
 warnings.filterwarnings('ignore')
 
 
-def extract_mohe_enrollment(file_path = RM_MOHE_PATH, file_name ="Redmarch - IPTS Enrolment Database 2023 v13 CLIENT (RAW DATA).xlsx"):
-    # read the full mohe dataset from redmarch
-    mohe_df = pd.read_excel(Path(file_path)/file_name, sheet_name="TE")
-    
+def clean_mohe_enrollment(mohe_df):
     # convert column names to lowercase and replace spaces with underscores in mohe_df
     mohe_df.columns = (mohe_df.columns.str
                        .lower()
@@ -34,9 +36,15 @@ def extract_mohe_enrollment(file_path = RM_MOHE_PATH, file_name ="Redmarch - IPT
     
     return mohe_df
 
+@instrument_stage
+def extract_mohe_enrollment(file_path = RM_MOHE_PATH, file_name ="Redmarch - IPTS Enrolment Database 2023 v13 CLIENT (RAW DATA).xlsx"):
+    # read the full mohe dataset from redmarch
+    return clean_mohe_enrollment(read_excel(share_file(Path(file_path)/file_name), sheet_name="TE"))
+
+@instrument_stage
 def extract_prog_requirements(file_path = MAPPING_PATH, file_name = "prog_master_file.xlsx"):
     # read programme master file mapping
-    prog_master = pd.read_excel(Path(file_path)/file_name, sheet_name="prog_master")
+    prog_master = read_excel(share_file(Path(file_path)/file_name), sheet_name="prog_master")
 
     # remove empty rows from level column from prog_master table
     prog_master = prog_master.dropna(subset=["level"]).reset_index(drop=True)
@@ -58,27 +66,27 @@ def extract_prog_requirements(file_path = MAPPING_PATH, file_name = "prog_master
     
     return rules_df
 
-def assign_prog_labels(mohe_df, rules_df):
-    # Create a list of all possible matches for each row. Can be refined to include rules for programme names
-    def get_matching_labels(row):
-        matches = rules_df[
-            (rules_df["level"] == row["level"]) &
-            (rules_df["vertical"] == row["vertical"]) &
-            (rules_df["specialization"] == row["specialization"])
-        ]
-        return matches["prog_name_main"].tolist()
-
-    # Resolve conflicts where multiple labels exist (use this for the filter in the BI Tool)
-    def resolve_label(possible_labels):
-        if len(possible_labels) == 1:
-            return possible_labels[0]  # Single match
-        elif len(possible_labels) > 1:
-            return "|".join(possible_labels)  # Combine labels for conflicts
-        else:
-            return "Unlabeled"  # No match
+# Create a list of all possible matches for each row. Can be refined to include rules for programme names
+def get_matching_labels(row, rules_df):
+    matches = rules_df[
+        (rules_df["level"] == row["level"]) &
+        (rules_df["vertical"] == row["vertical"]) &
+        (rules_df["specialization"] == row["specialization"])
+    ]
+    return matches["prog_name_main"].tolist()
+
+# Resolve conflicts where multiple labels exist (use this for the filter in the BI Tool)
+def resolve_label(possible_labels):
+    if len(possible_labels) == 1:
+        return possible_labels[0]  # Single match
+    elif len(possible_labels) > 1:
+        return "|".join(possible_labels)  # Combine labels for conflicts
+    else:
+        return "Unlabeled"  # No match
 
+def assign_prog_labels(mohe_df, rules_df):
     # Process and save the MOHE data
-    mohe_df['possible_labels'] = mohe_df.apply(get_matching_labels, axis=1)
+    mohe_df['possible_labels'] = mohe_df.apply(get_matching_labels, axis=1, rules_df=rules_df)
     mohe_df['prog_label_count'] = mohe_df['possible_labels'].apply(len)
     mohe_df['prog_name_main'] = mohe_df['possible_labels'].apply(resolve_label)
 
@@ -88,10 +96,34 @@ def assign_prog_labels(mohe_df, rules_df):
     
     return mohe_df
 
-def preprocess_mohe_enrollment():
-    mohe_df = (
-        extract_mohe_enrollment()
-        .pipe(lambda df: assign_prog_labels(df, extract_prog_requirements()))
-    )
-    
-    return mohe_df
\ No newline at end of file
+def stream_mohe_enrollment(rules_df, chunk_rows, file_path = RM_MOHE_PATH,
+                           file_name ="Redmarch - IPTS Enrolment Database 2023 v13 CLIENT (RAW DATA).xlsx"):
+    # Cleaned and labelled chunks of the TE sheet, typed for writing; only one chunk is in memory at a time.
+    # Cells stay Python objects so a chunk with an all-empty text column still takes the .str cleaning
+    workbook = share_file(Path(file_path)/file_name)
+    for chunk in iter_excel_chunks(workbook, sheet_name="TE", chunksize=chunk_rows, dtype=object):
+        chunk = clean_mohe_enrollment(chunk)
+        if not chunk.empty:
+            yield apply_output_schema(assign_prog_labels(chunk, rules_df), 'mohe_enrollment')
+
+
+def write_mohe_enrollment(chunks, output):
+    # Returns the number of rows written to the Parquet handoff or the mohe_enrollment table
+    if output == 'postgres':
+        return export_db.export_table_chunks(chunks, 'mohe_enrollment')
+    return write_intermediate_chunks(chunks, 'mohe_enrollment')[1]
+
+
+@instrument_stage
+def preprocess_mohe_enrollment(chunk_rows = MOHE_CHUNK_ROWS, output = MOHE_OUTPUT):
+    # Both modes write mohe_enrollment to the output and return its row count;
+    # chunk_rows > 0 streams the sheet instead of holding it in memory
+    rules_df = extract_prog_requirements()
+    if chunk_rows:
+        chunks = stream_mohe_enrollment(rules_df, chunk_rows)
+    else:
+        chunks = [apply_output_schema(assign_prog_labels(extract_mohe_enrollment(), rules_df), 'mohe_enrollment')]
+
+    rows = write_mohe_enrollment(chunks, output)
+    print(f"Wrote {rows} MOHE enrollment rows to {output}")
+    return rows
@@ -3,21 +3,24 @@ import pandas as pd
 from pathlib import Path
 from config.constants import PRICING_MOHE_PATH
 from r2r_pipelines import extract_prog_requirements, assign_prog_labels
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.source_manifest import skip_unchanged
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel, sheet_names
 
 
+@instrument_stage
 def extract_mohe_pricing(file_path = PRICING_MOHE_PATH, file_name = "Redmarch - IPTS Course Fee Database 2024 v151 (updated).xlsx"):
     relevant_columns = ['Group', 'Institution', 'State', 'Region 1', 'Level 1', 'Vertical', 'Specialization',
                     'Course Name (Reformatted)', 'Mode', 'Status', '# Intakes', 'Total Fee']
     
-    latest_file = Path(file_path)/file_name
-    # Get all sheet names
-    sheet_names = pd.ExcelFile(latest_file).sheet_names
-
+    latest_file = share_file(Path(file_path)/file_name)
     # Filter sheet names that start with "20"
-    filtered_sheet_names = [sheet for sheet in sheet_names if sheet.startswith("20")]
+    filtered_sheet_names = [sheet for sheet in sheet_names(latest_file) if sheet.startswith("20")]
 
-    # Read each filtered sheet into a dataframe and store in a dictionary
-    dataframes = {sheet: pd.read_excel(latest_file, sheet_name=sheet, usecols=relevant_columns) for sheet in filtered_sheet_names}
+    # Read the filtered sheets in one pass over the workbook, as a dictionary of dataframes
+    dataframes = read_excel(latest_file, sheet_name=filtered_sheet_names, usecols=relevant_columns)
 
     # create a 'cal_year' column for each sheet, taking the year from the sheet name
     for sheet, df in dataframes.items():
@@ -55,6 +58,9 @@ def extract_mohe_pricing(file_path = PRICING_MOHE_PATH, file_name = "Redmarch -
     
     return compiled_df
 
+@logged_run('mohe_pricing')
+@skip_unchanged('mohe_pricing')
+@instrument_stage
 def preprocess_mohe_pricing():
     px_df = (
         extract_mohe_pricing()
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from r2r_pipelines import export_db
+from r2r_pipelines.prep_ctd_enreg import base_ctd_filters
+from r2r_pipelines.prep_fin_fee import preprocess_first_year_fee, extract_programme_bridge
+from r2r_pipelines.prep_snd import preprocess_snd, build_snd_index, resolve_snd
+from r2r_pipelines.prep_actual_vs_target import REGISTRATION_STAGES
+from r2r_pipelines.dates import normalize_dates
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+
+from config.constants import NET_REVENUE_CHUNK_ROWS
+
+# Same grain as the cpp_segment GR/NR targets
+REVENUE_KEYS = ['reporting_date', 'intake_year', 'intake_cycle', 'campus', 'market_segment', 'ctd_tgt_stage']
+REVENUE_COLUMNS = ['ctd_student', 'ctd_gr', 'ctd_snd', 'ctd_commission', 'ctd_nr']
+
+# First-year fees adjusted for amortization and attrition, as the CPP targets are
+FEE_VALUE_COLUMNS = ['tuition_fees_adj', 'non_tuition_fees_adj']
+
+query_ctd_revenue = """
+    select
+        reporting_date,
+        programme_code,
+        opp_stage,
+        withdrawn_pre_commencement,
+        admission_status,
+        programme_status,
+        prog_intake_year,
+        prog_intake_month,
+        prog_cycle,
+        intake_year,
+        "cycle",
+        prev_intake_year,
+        prev_cycle,
+        prev_prog_status,
+        prev_stage,
+        prev_prog_name,
+        market_segment,
+        bursary_deduction_1,
+        bursary_deduction_2,
+        scholarship_deduction,
+        commission_amount,
+        enreg_count
+    from public.ctd_enreg
+    """
+
+
+def build_fee_index(first_year_fee, bridge):
+    """
+    Keys the first-year fees by (programme_code, intake, market_segment) once for all chunks.
+
+    Parameters:
+    first_year_fee (pd.DataFrame): Output of preprocess_first_year_fee, keyed by TM1 programme name.
+    bridge (pd.DataFrame): programme_code -> prog_name, campus.
+
+    Returns:
+    tuple: (pd.MultiIndex, fee values array with FEE_VALUE_COLUMNS then is_amortized).
+    """
+    fees = first_year_fee.merge(bridge, on=['prog_name', 'campus'], how='inner')
+    fees['intake'] = fees['intake'].astype('int64')
+    fees = fees.drop_duplicates(subset=['programme_code', 'intake', 'market_segment']).reset_index(drop=True)
+
+    values = np.column_stack([fees[FEE_VALUE_COLUMNS].fillna(0).to_numpy(dtype=float),
+                              fees['is_amortized'].to_numpy(dtype=float)])
+    return pd.MultiIndex.from_frame(fees[['programme_code', 'intake', 'market_segment']]), values
+
+
+def compute_opportunity_revenue(df, fee_index, fee_values, bridge, snd_index):
+    """
+    Gross revenue, S&D, agent commission and net revenue of every counted opportunity in one chunk.
+
+    Fees and campuses are looked up by position against the prebuilt indexes, so the cost is linear
+    in the chunk. Opportunities without a fee row keep zero revenue.
+    """
+    df = base_ctd_filters(df).reset_index(drop=True)
+    df['programme_code'] = df['programme_code'].astype(str).str.strip()
+    intake = (pd.to_numeric(df['prog_intake_year'], errors='coerce') * 100
+              + pd.to_numeric(df['prog_intake_month'], errors='coerce')).fillna(-1).astype('int64').to_numpy()
+
+    # Position -1 (no match) picks the trailing empty row
+    campus = np.append(bridge['campus'].to_numpy(dtype=object), None)
+    df['campus'] = campus[pd.Index(bridge['programme_code']).get_indexer(df['programme_code'])]
+
+    position = fee_index.get_indexer(pd.MultiIndex.from_arrays([df['programme_code'], intake, df['market_segment']]))
+    fees = np.vstack([fee_values, np.zeros((1, fee_values.shape[1]))])[position]
+    tuition, non_tuition, is_amortized = fees[:, 0], fees[:, 1], fees[:, 2].astype(bool)
+
+    # Amortized intakes take the amortized S&D rate and waiver
+    snd = resolve_snd(df[['bursary_deduction_1', 'bursary_deduction_2', 'scholarship_deduction',
+                          'prog_intake_year', 'prog_cycle', 'campus']], snd_index)
+    snd_rate = np.where(is_amortized, snd['snd_rate_amortized'], snd['snd_rate'])
+    flat_waiver = np.where(is_amortized, snd['flat_waiver_amortized'], snd['flat_waiver'])
+
+    count = df['enreg_count'].to_numpy(dtype=float)
+    gross = (tuition + non_tuition) * count
+    df['ctd_student'] = count
+    df['ctd_gr'] = gross
+    df['ctd_snd'] = np.minimum(tuition * snd_rate + flat_waiver, tuition + non_tuition) * count
+    df['ctd_commission'] = pd.to_numeric(df['commission_amount'], errors='coerce').fillna(0).to_numpy() * count
+    df['ctd_nr'] = df['ctd_gr'] - df['ctd_snd'] - df['ctd_commission']
+    df['fee_matched'] = position >= 0
+    return df
+
+
+def aggregate_revenue(df):
+    # Every counted opportunity is an enrollment; registered ones also count towards registration
+    df = df.rename(columns={'cycle': 'intake_cycle'})
+    # CPP files fold Progression into Domestic
+    df['market_segment'] = df['market_segment'].replace({'Progression': 'Domestic'})
+
+    group_cols = [col for col in REVENUE_KEYS if col != 'ctd_tgt_stage']
+    # dropna=False keeps the commission of opportunities whose programme has no campus
+    enrollment = df.groupby(group_cols, as_index=False, dropna=False)[REVENUE_COLUMNS].sum()
+    registration = df[df['opp_stage'].isin(REGISTRATION_STAGES)]\
+        .groupby(group_cols, as_index=False, dropna=False)[REVENUE_COLUMNS].sum()
+
+    return pd.concat([enrollment.assign(ctd_tgt_stage='Enrollment'),
+                      registration.assign(ctd_tgt_stage='Registration')], ignore_index=True)
+
+
+def iter_ctd_revenue_chunks(chunk_rows=NET_REVENUE_CHUNK_ROWS):
+    # Server-side cursor, so only one chunk of ctd_enreg is held at a time
+    with export_db.marcommdb_connection().connect() as connection:
+        connection = connection.execution_options(stream_results=True)
+        for chunk in pd.read_sql_query(query_ctd_revenue, connection, chunksize=chunk_rows):
+            yield normalize_dates(chunk, ['reporting_date'])
+
+
+@logged_run('net_revenue')
+@instrument_stage
+def preprocess_net_revenue(chunk_rows=NET_REVENUE_CHUNK_ROWS):
+    bridge = extract_programme_bridge()[['programme_code', 'prog_name', 'campus']]
+    fee_index, fee_values = build_fee_index(preprocess_first_year_fee(), bridge)
+    snd_index = build_snd_index(preprocess_snd())
+
+    # Chunk aggregates add up, so the final groupby only sees the already-aggregated rows
+    partials, rows, unmatched = [], 0, 0
+    for chunk in iter_ctd_revenue_chunks(chunk_rows):
+        revenue = compute_opportunity_revenue(chunk, fee_index, fee_values, bridge, snd_index)
+        rows += len(revenue)
+        unmatched += int((~revenue['fee_matched'] & (revenue['ctd_student'] > 0)).sum())
+        partials.append(aggregate_revenue(revenue))
+
+    if unmatched:
+        print(f"{unmatched} of {rows} counted opportunities have no first-year fee; their GR is 0")
+
+    revenue_df = pd.concat(partials, ignore_index=True)\
+        .groupby(REVENUE_KEYS, as_index=False, dropna=False)[REVENUE_COLUMNS].sum()\
+        .sort_values(REVENUE_KEYS)\
+        .reset_index(drop=True)
+
+    export_db.export_table(revenue_df, 'net_revenue_actual')
+
+    return revenue_df
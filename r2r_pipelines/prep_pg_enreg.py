@@ -1,27 +1,15 @@
 import pandas as pd
 import numpy as np
-import os
-from urllib.parse import quote
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
+from r2r_pipelines.engine_registry import get_engine
+from r2r_pipelines.instrumentation import instrument_stage
 
 def create_pg_connection(user_name = "PG_USERNAME",
                              pass_word = "PG_PASSWORD",
                              host = "PG_HOST",
                              port = "PG_PORT",
                              database = "PG_DATABASE"):
-    load_dotenv()
-    password = os.getenv(pass_word)
-    encoded_password = quote(password)
-
-    username = os.getenv(user_name)
-    host = os.getenv(host)
-    port = os.getenv(port)
-    database = os.getenv(database)
-
-    DATABASE_URL = f"postgresql+psycopg2://{username}:{encoded_password}@{host}:{port}/{database}"
-    
-    return create_engine(DATABASE_URL)
+    # Shared pooled engine for the source database, created on first use
+    return get_engine(database=database, user_name=user_name, pass_word=pass_word, host=host, port=port)
 
 def assign_intake_cycle(df, column_name='prog_intake_month'):
     """
@@ -139,6 +127,7 @@ query_sf_opp_enr ="""
     where registered_date <= '2099-12-31'
     """
 
+@instrument_stage
 def preprocess_enreg_data():
     engine = create_pg_connection()
 
@@ -2,14 +2,30 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
+from collections import namedtuple
 from pathlib import Path
 from config.constants import FINANCE_FEE_PATH
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.run_log import logged_run
+from r2r_pipelines.source_manifest import skip_unchanged
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.schemas import enforce_schema
 
 warnings.filterwarnings("ignore")
 
+# Opportunity columns holding an S&D scheme name (see query_sf_opp_enr), by output suffix
+SND_SLOTS = {'bursary_1': 'bursary_deduction_1', 'bursary_2': 'bursary_deduction_2', 'scholarship': 'scholarship_deduction'}
+SND_VALUE_COLUMNS = ['snd_rate', 'flat_waiver', 'snd_rate_amortized', 'flat_waiver_amortized']
 
+# Schemes with an intake cycle are looked up by (scheme, year, cycle, campus); CHDR schemes apply to every
+# cycle and are looked up by (scheme, year, campus). values holds the cycle rows first, then the CHDR rows.
+SndIndex = namedtuple('SndIndex', ['cycle_index', 'any_cycle_index', 'values'])
+
+
+@instrument_stage
 def extract_transform_chdr(file_path=FINANCE_FEE_PATH, file_name='S&D.xlsx'):
-    chdr = pd.read_excel(Path(file_path)/file_name, sheet_name="CHDR")
+    chdr = read_excel(share_file(Path(file_path)/file_name), sheet_name="CHDR")
 
     chdr.columns = chdr.columns.str.lower().str.replace(r"[()/ ]", "_", regex=True)
 
@@ -19,6 +35,7 @@ def extract_transform_chdr(file_path=FINANCE_FEE_PATH, file_name='S&D.xlsx'):
         'original_c3__before_amortized_' : 'c3',
         'total_waiver__exclude_tuition_fee_': 'flat_waiver'
     }, inplace=True)
+    chdr = enforce_schema(chdr, 'chdr')
 
     # Create new columns
 
@@ -30,12 +47,12 @@ def extract_transform_chdr(file_path=FINANCE_FEE_PATH, file_name='S&D.xlsx'):
     return chdr
 
 
+@instrument_stage
 def extract_transform_snd(file_path = FINANCE_FEE_PATH, file_name = 'S&D.xlsx'):
-    snd = pd.read_excel(Path(file_path)/file_name, sheet_name="MarComm")
+    snd = read_excel(share_file(Path(file_path)/file_name), sheet_name="MarComm")
 
     # reformat column names
     snd.columns = snd.columns.str.lower().str.replace(r"[()/ ]", "_", regex=True)
-    snd['intake_year'] = snd['intake_year'].astype('Int64')  # Fill NaN values with 0 before converting to int
 
     # Renaming the first three columns and reformatting column names
     snd.rename(columns={
@@ -45,6 +62,7 @@ def extract_transform_snd(file_path = FINANCE_FEE_PATH, file_name = 'S&D.xlsx'):
         'type_of_s&d': 'snd_type',
         'institutions': 'campus'
     }, inplace=True, errors='ignore')
+    snd = enforce_schema(snd, 'snd')
 
     # Melt the dataframe based on the intake_cycle
     id_vars = ['snd_no', 'bursary_deduction', 'bursary_group', 'guideline',
@@ -71,6 +89,9 @@ def extract_transform_snd(file_path = FINANCE_FEE_PATH, file_name = 'S&D.xlsx'):
     
     return snd[rel_cols]
 
+@logged_run('snd')
+@skip_unchanged('snd')
+@instrument_stage
 def preprocess_snd():
     # Load and preprocess the S&D data
     snd = (
@@ -78,4 +99,99 @@ def preprocess_snd():
         .pipe(lambda df: pd.concat([df, extract_transform_chdr()], axis=0, ignore_index=True))
     )
     
-    return snd
\ No newline at end of file
+    return snd
+
+
+def _normalize_text(series, upper=False):
+    """
+    Trims and case-folds (or upper-cases) a key column, touching each distinct value only once.
+
+    Returns:
+    pd.Categorical: Rows keep their position; MultiIndex lookups then run on the integer codes.
+    """
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype='string').str.strip()
+    uniques = uniques.str.upper() if upper else uniques.str.casefold()
+    unique_codes, categories = pd.factorize(uniques)
+    # Code -1 (missing) picks the trailing -1
+    return pd.Categorical.from_codes(np.append(unique_codes, -1)[codes], categories=categories)
+
+
+def _intake_keys(intake_year, intake_cycle, campus):
+    # Scheme names are matched case-insensitively, cycles and campuses trimmed and upper-cased
+    year = pd.to_numeric(intake_year, errors='coerce').astype('Int64').array
+    return year, _normalize_text(intake_cycle, upper=True), _normalize_text(campus, upper=True)
+
+
+def build_snd_index(snd):
+    """
+    Indexes the preprocess_snd table once so any number of opportunities can be resolved against it.
+
+    Rows without a scheme name are left out; when a key appears twice the first row wins.
+
+    Returns:
+    SndIndex
+    """
+    snd = snd[snd['bursary_deduction'].notna()].reset_index(drop=True)
+    name = _normalize_text(snd['bursary_deduction'])
+    year, cycle, campus = _intake_keys(snd['intake_year'], snd['intake_cycle'], snd['campus'])
+    keys = pd.DataFrame({'name': name, 'year': year, 'cycle': cycle, 'campus': campus})
+
+    values = snd[SND_VALUE_COLUMNS].astype(float)
+    # CHDR rows carry no amortized variant; their plain rate and waiver apply as is
+    values['snd_rate_amortized'] = values['snd_rate_amortized'].fillna(values['snd_rate'])
+    values['flat_waiver_amortized'] = values['flat_waiver_amortized'].fillna(values['flat_waiver'])
+    values = values.fillna(0)
+
+    by_cycle = keys['cycle'].notna()
+    cycle_keys = keys[by_cycle].drop_duplicates(subset=['name', 'year', 'cycle', 'campus'])
+    any_cycle_keys = keys[~by_cycle].drop_duplicates(subset=['name', 'year', 'campus'])
+
+    return SndIndex(
+        cycle_index=pd.MultiIndex.from_frame(cycle_keys[['name', 'year', 'cycle', 'campus']]),
+        any_cycle_index=pd.MultiIndex.from_frame(any_cycle_keys[['name', 'year', 'campus']]),
+        values=np.vstack([values.loc[cycle_keys.index].to_numpy(), values.loc[any_cycle_keys.index].to_numpy()]),
+    )
+
+
+def resolve_snd(df, snd_index, intake_year='prog_intake_year', intake_cycle='prog_cycle', campus='campus'):
+    """
+    Looks up the S&D of both bursary slots and the scholarship of every opportunity.
+
+    Each slot is one vectorized get_indexer call against the prebuilt index, falling back to the CHDR
+    schemes when no cycle-specific scheme matches. Unmatched or empty slots resolve to no discount.
+
+    Parameters:
+    df (pd.DataFrame): Opportunities with the SND_SLOTS columns and the intake and campus keys.
+    snd_index (SndIndex): From build_snd_index.
+
+    Returns:
+    pd.DataFrame: df plus <value>_<slot> columns for every slot and the combined snd_rate (capped at 100%),
+                  flat_waiver and their amortized variants.
+    """
+    n_cycle_rows = len(snd_index.cycle_index)
+    # Position -1 (no match) picks this trailing row of zeros
+    values = np.vstack([snd_index.values, np.zeros((1, len(SND_VALUE_COLUMNS)))])
+
+    year, cycle, campus_key = _intake_keys(df[intake_year], df[intake_cycle], df[campus])
+    resolved = {}
+    totals = np.zeros((len(df), len(SND_VALUE_COLUMNS)))
+    for slot, column in SND_SLOTS.items():
+        name = _normalize_text(df[column])
+        position = snd_index.cycle_index.get_indexer(pd.MultiIndex.from_arrays([name, year, cycle, campus_key]))
+        any_cycle = snd_index.any_cycle_index.get_indexer(pd.MultiIndex.from_arrays([name, year, campus_key]))
+        position = np.where(position >= 0, position, np.where(any_cycle >= 0, any_cycle + n_cycle_rows, -1))
+
+        unmatched = int(((name.codes >= 0) & (position < 0)).sum())
+        if unmatched:
+            print(f"{unmatched} opportunities have a {column} without an S&D scheme; no discount applied")
+
+        slot_values = values[position]
+        totals += slot_values
+        for i, value_col in enumerate(SND_VALUE_COLUMNS):
+            resolved[f"{value_col}_{slot}"] = slot_values[:, i]
+
+    for i, value_col in enumerate(SND_VALUE_COLUMNS):
+        resolved[value_col] = np.minimum(totals[:, i], 1) if value_col.startswith('snd_rate') else totals[:, i]
+
+    return pd.concat([df, pd.DataFrame(resolved, index=df.index)], axis=1)
@@ -1,7 +1,11 @@
 import numpy as np
 import pandas as pd
 import os
-from config.constants import TM1_ANNUAL_PATH, CLEAN_DATA_PATH
+from config.constants import TM1_ANNUAL_PATH
+from r2r_pipelines.intermediate import write_intermediate
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
 
 # Set the pandas option to opt-in to the future behavior
 pd.set_option('future.no_silent_downcasting', True)
@@ -158,7 +162,7 @@ def deduct_non_academic_revenue(main_df, ex_df, ex_prog, metric):
 # Function to process the population data from TM1
 def process_population_data():
     # Process student population data
-    population_df = pd.read_excel(TM1_ANNUAL_PATH + "/TM1_Total_Student_Population.xlsx", 
+    population_df = read_excel(share_file(TM1_ANNUAL_PATH + "/TM1_Total_Student_Population.xlsx"), 
                                     sheet_name="Total_Student_Population", 
                                     header=None)
     print("Processing Student Population Data...")
@@ -168,7 +172,7 @@ def process_population_data():
 # Function to process the efts data from TM1
 def process_efts_data():
     # Process efts data
-    efts_df = pd.read_excel(TM1_ANNUAL_PATH + "/TM1_EFTS.xlsx", 
+    efts_df = read_excel(share_file(TM1_ANNUAL_PATH + "/TM1_EFTS.xlsx"), 
                             sheet_name="EFTS", 
                             header=None)
     print("Processing EFTS Data...")
@@ -182,7 +186,7 @@ def process_ann_fin_data():
 
     for sheet_name in sheet_names:
         print(f"Processing {sheet_name}...")
-        financial_df = pd.read_excel(TM1_ANNUAL_PATH + "/TM1_Revenue.xlsx", 
+        financial_df = read_excel(share_file(TM1_ANNUAL_PATH + "/TM1_Revenue.xlsx"), 
                                         sheet_name=sheet_name, 
                                         header=None)
         
@@ -198,13 +202,14 @@ def process_ann_fin_data():
 # Function to process the exclusion data from TM1
 def process_exclusion_data():
     # Process the TM1 Exclusion file
-    ex_df = pd.read_excel(TM1_ANNUAL_PATH + "/TM1_Exclusion.xlsx", 
+    ex_df = read_excel(share_file(TM1_ANNUAL_PATH + "/TM1_Exclusion.xlsx"), 
                         sheet_name="Exclusion", 
                         header=None)
 
     print("Processing Exclusion Data...")
     return clean_exclusion_data(ex_df)
 
+@instrument_stage
 def preprocess_tm1_annual_data():
     try:
         population_df = process_population_data()
@@ -224,8 +229,8 @@ def preprocess_tm1_annual_data():
         deduct_non_academic_revenue(main_df, ex_df, ex_prog, metric='NET REVENUE')
         deduct_non_academic_revenue(main_df, ex_df, ex_prog, metric='PROFIT BEFORE TAX')
 
-        # save the cleaned data to one excel file
-        main_df.to_excel(CLEAN_DATA_PATH + '/cleaned_TM1_consolidated_data.xlsx', index=False)
+        # save the cleaned data as the parquet handoff (and the excel copy if enabled)
+        write_intermediate(main_df, 'cleaned_TM1_consolidated_data')
         #ex_df.to_csv(TEMP_DATA_PATH + 'TM1_exclusion_cleaned.csv', index=False)
         
         print("All files have been processed and saved to the csv files, respectively.")
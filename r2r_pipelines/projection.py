@@ -0,0 +1,69 @@
+"""
+Column projection for the extractors.
+
+Each extractor declares the source columns it consumes. usecols() hands them to the Excel engine and
+select_query() to the SQL SELECT list, so nothing else is parsed or transferred.
+
+With R2R_PROJECTION=0 every column is read again, and check_unused_columns() reports the parsed columns a
+reader does not consume. Use it to check a declaration, or to find readers that parse more than they need.
+"""
+import os
+
+PROJECTION_ENV = "R2R_PROJECTION"
+
+
+def projection_enabled():
+    # Read at call time, so the CLI and benchmarks can switch it
+    return os.getenv(PROJECTION_ENV, "1").lower() in ("1", "true", "yes")
+
+
+def cpp_header(name):
+    # The CPP readers rename headers to lower case with underscores and declare their columns that way
+    return str(name).lower().replace(" ", "_")
+
+
+def usecols(columns, normalize=None):
+    """
+    The read_excel usecols argument for a declared column list.
+
+    Parameters:
+    columns (list): Header names, or 0-based positions for sheets read by position.
+    normalize (callable): Applied to each header before matching, for readers that rename headers
+                          (e.g. lower-case with underscores) and declare the renamed form.
+
+    Returns:
+    list, callable or None: None reads every column (projection switched off). Lists reach every engine
+                            and fail fast on a missing column; only normalized headers need a callable.
+    """
+    if not projection_enabled():
+        return None
+    if normalize is None:
+        return list(columns)
+
+    wanted = set(columns)
+    return lambda name: normalize(name) in wanted
+
+
+def select_query(table, columns, where=None):
+    # SELECT list of the declared columns; SELECT * when projection is switched off
+    select_list = ", ".join(columns) if projection_enabled() else "*"
+    query = f"SELECT {select_list} FROM {table}"
+    return f"{query} WHERE {where}" if where else query
+
+
+def check_unused_columns(df, columns, source, normalize=None):
+    """
+    Prints the parsed columns of df that the reader does not consume, and returns df unchanged.
+
+    With projection on there should be none; a report then means the engine could not project.
+    """
+    if all(isinstance(col, int) for col in columns):
+        positions = set(columns)
+        unused = [col for pos, col in enumerate(df.columns) if pos not in positions]
+    else:
+        wanted = set(columns)
+        unused = [col for col in df.columns if (normalize(col) if normalize else col) not in wanted]
+
+    if unused:
+        print(f"{source}: {len(unused)} parsed columns are not used: {unused}")
+    return df
@@ -0,0 +1,244 @@
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import text, inspect
+
+from r2r_pipelines import export_db
+from r2r_pipelines.fingerprints import file_fingerprint, fingerprint_key
+from r2r_pipelines.instrumentation import add_listener, remove_listener, count_rows
+
+RUN_LOG_TABLE = 'pipeline_run_log'
+RUN_LOG_SCHEMA = 'public'
+NO_READS = {'mirror_hits': 0, 'mirror_misses': 0, 'bytes_read': 0}
+
+# Source files and share reads of the pipeline runs active in each thread; worker threads join the runs of the
+# thread that submitted them with within_runs(), other threads (e.g. another pipeline) never see them
+_local = threading.local()
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _thread_runs():
+    if not hasattr(_local, 'runs'):
+        _local.runs = []
+    return _local.runs
+
+
+def current_runs():
+    # The runs of this thread, to hand to worker threads
+    return list(_thread_runs())
+
+
+@contextmanager
+def within_runs(runs):
+    # Files read inside the block count towards the given runs, e.g. those of the thread that submitted the work
+    thread_runs = _thread_runs()
+    saved_runs = list(thread_runs)
+    thread_runs[:] = runs
+    try:
+        yield
+    finally:
+        thread_runs[:] = saved_runs
+
+
+def track_source(path):
+    # Record a file read from the share against the active run(s); returns the path unchanged
+    with _lock:
+        for run in _thread_runs():
+            run['sources'].setdefault(str(path), None)
+    return path
+
+
+def track_share_read(outcome, size):
+    # outcome: 'hit' (served from the local mirror), 'miss' (copied into the mirror) or 'direct' (mirror off);
+    # only misses and direct reads transfer the file from the share
+    with _lock:
+        for run in _thread_runs():
+            reads = run.setdefault('reads', dict(NO_READS))
+            if outcome == 'hit':
+                reads['mirror_hits'] += 1
+                continue
+            reads['bytes_read'] += size
+            if outcome == 'miss':
+                reads['mirror_misses'] += 1
+
+
+@contextmanager
+def collect_sources():
+    # Yields a dict that collects the share files read inside the block, as a logged run does
+    run = {'sources': {}}
+    with _lock:
+        _thread_runs().append(run)
+    try:
+        yield run['sources']
+    finally:
+        with _lock:
+            _thread_runs().remove(run)
+
+
+def set_run_status(pipeline, status):
+    # Lets a wrapper inside logged_run report another status than 'ok', e.g. 'skipped'
+    with _lock:
+        for run in _thread_runs():
+            if run.get('pipeline') == pipeline:
+                run['status'] = status
+
+
+def _fingerprint_sources(sources):
+    fingerprints = {}
+    for path in sources:
+        try:
+            fingerprints[path] = fingerprint_key(file_fingerprint(path))
+        except OSError:
+            continue
+    return fingerprints
+
+
+def _rows_per_sec(rows_in, rows_out, duration_s):
+    rows = rows_in or rows_out
+    return round(rows / duration_s, 2) if rows and duration_s else None
+
+
+def _is_extract(stage_name):
+    return stage_name.rsplit('.', 1)[-1].startswith('extract')
+
+
+def build_run_log(run, result, status, error, ended_at, duration_s):
+    stages = run['stages']
+
+    # Rows read = output of the outermost extract stages (extracts calling extracts count once)
+    extract_rows = [rec['rows_out'] for rec in stages
+                    if _is_extract(rec['stage']) and not (rec['parent'] and _is_extract(rec['parent']))
+                    and rec['rows_out'] is not None]
+    rows_in = sum(extract_rows) if extract_rows else None
+    rows_out = count_rows(result)
+    fingerprints = _fingerprint_sources(run['sources'])
+    reads = run.get('reads', NO_READS)
+
+    run_row = {
+        'run_id': run['run_id'],
+        'pipeline': run['pipeline'],
+        'record_type': 'run',
+        'stage': run['pipeline'],
+        'parent_stage': None,
+        'status': status,
+        'started_at': run['started_at'],
+        'ended_at': ended_at,
+        'duration_s': round(duration_s, 4),
+        'cpu_s': None,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'rows_per_sec': _rows_per_sec(rows_in, rows_out, duration_s),
+        'bytes_read': reads['bytes_read'],
+        'mirror_hits': reads['mirror_hits'],
+        'mirror_misses': reads['mirror_misses'],
+        'source_fingerprints': json.dumps(fingerprints),
+        'error': error,
+    }
+
+    stage_rows = [{
+        'run_id': run['run_id'],
+        'pipeline': run['pipeline'],
+        'record_type': 'stage',
+        'stage': rec['stage'],
+        'parent_stage': rec['parent'],
+        'status': rec['status'],
+        'started_at': pd.Timestamp(rec['started_at']),
+        'ended_at': pd.Timestamp(rec['ended_at']),
+        'duration_s': rec['wall_s'],
+        'cpu_s': rec['cpu_s'],
+        'rows_in': rec['rows_in'],
+        'rows_out': rec['rows_out'],
+        'rows_per_sec': _rows_per_sec(rec['rows_in'], rec['rows_out'], rec['wall_s']),
+        'bytes_read': None,
+        'mirror_hits': None,
+        'mirror_misses': None,
+        'source_fingerprints': None,
+        'error': None,
+    } for rec in stages]
+
+    return pd.DataFrame([run_row] + stage_rows)
+
+
+def write_run_log(run_log_df, table=RUN_LOG_TABLE, schema=RUN_LOG_SCHEMA):
+    # Plain to_sql (not export_table) so writing the log is not itself logged as a stage
+    # The first write creates the table from the row columns; the lock keeps parallel pipelines from both creating it
+    with _write_lock, export_db.marcommdb_connection().begin() as connection:
+        run_log_df.to_sql(table, connection, schema=schema, if_exists='append', index=False)
+
+
+def check_runtime_regression(pipeline, duration_s, factor=2.0, window=10, table=RUN_LOG_TABLE, schema=RUN_LOG_SCHEMA):
+    """
+    Compares a run's duration with the median of the pipeline's previous successful runs.
+
+    Returns:
+    bool: True (and prints a warning) when the run took more than factor x the recent median.
+    """
+    engine = export_db.marcommdb_connection()
+    if engine.dialect.name != 'postgresql' or not inspect(engine).has_table(table, schema=schema):
+        return False
+
+    query = text(f"""
+        select percentile_cont(0.5) within group (order by duration_s)
+        from (
+            select duration_s from {schema}.{table}
+            where pipeline = :pipeline and record_type = 'run' and status = 'ok'
+            order by started_at desc
+            offset 1 limit :window
+        ) recent
+        """)
+    with engine.connect() as connection:
+        median = connection.execute(query, {'pipeline': pipeline, 'window': window}).scalar()
+
+    if median and duration_s > factor * median:
+        print(f"WARNING: {pipeline} took {duration_s:.1f}s, more than {factor:g}x its recent median of {median:.1f}s")
+        return True
+    return False
+
+
+def logged_run(pipeline):
+    """
+    Decorator that writes one pipeline_run_log row for the run and one per instrumented stage.
+
+    Failures to write the log are reported but never fail the pipeline itself.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = {'run_id': str(uuid.uuid4()), 'pipeline': pipeline, 'stages': [], 'sources': {},
+                   'started_at': datetime.now(timezone.utc)}
+            listener = run['stages'].append
+            add_listener(listener)
+            with _lock:
+                _thread_runs().append(run)
+
+            start = time.perf_counter()
+            result, status, error = None, 'ok', None
+            try:
+                result = func(*args, **kwargs)
+                status = run.get('status', status)
+                return result
+            except Exception as e:
+                status, error = 'error', repr(e)
+                raise
+            finally:
+                duration_s = time.perf_counter() - start
+                remove_listener(listener)
+                with _lock:
+                    _thread_runs().remove(run)
+
+                try:
+                    write_run_log(build_run_log(run, result, status, error, datetime.now(timezone.utc), duration_s))
+                    if status == 'ok':
+                        check_runtime_regression(pipeline, duration_s)
+                except Exception as e:
+                    print(f"Could not write pipeline run log for {pipeline}: {e}")
+
+        return wrapper
+    return decorator
@@ -0,0 +1,300 @@
+import ast
+import importlib
+import os
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from graphlib import TopologicalSorter
+
+from config.constants import MOHE_OUTPUT
+from r2r_pipelines.instrumentation import PROFILE_ENV, PROFILE_PATH_ENV
+from r2r_pipelines.checkpoint import RESUME_ENV
+from r2r_pipelines.source_manifest import FORCE_ENV
+
+# A pipeline entry point with the datasets it reads and writes.
+# Datasets are plain strings: "raw:<folder or file>", "clean:<intermediate name>" or "pg:<schema.table>".
+PipelineNode = namedtuple('PipelineNode', ['name', 'target', 'inputs', 'outputs'])
+
+PIPELINE_NODES = [
+    PipelineNode('mohe', 'r2r_pipelines.prep_mohe:preprocess_mohe_data',
+                 inputs=['raw:mohe_database', 'raw:mapping_files/prog_master_file.xlsx'],
+                 outputs=['clean:cleaned_mohe_prog_labels']),
+    PipelineNode('mohe_enrollment', 'r2r_pipelines.prep_mohe_enrollment:preprocess_mohe_enrollment',
+                 inputs=['raw:mohe_database', 'raw:mapping_files/prog_master_file.xlsx'],
+                 outputs=['pg:public.mohe_enrollment' if MOHE_OUTPUT == 'postgres' else 'clean:mohe_enrollment']),
+    PipelineNode('mohe_pricing', 'r2r_pipelines.prep_mohe_pricing:preprocess_mohe_pricing',
+                 inputs=['raw:pricing_dataset', 'raw:mapping_files/prog_master_file.xlsx'],
+                 outputs=[]),
+    PipelineNode('tm1_annual', 'r2r_pipelines.prep_annual_tm1:preprocess_annual_data',
+                 inputs=['raw:tm1_annual_data'],
+                 outputs=[]),
+    PipelineNode('tm1_consolidated', 'r2r_pipelines.prep_tm1_ann:preprocess_tm1_annual_data',
+                 inputs=['raw:tm1_annual_data'],
+                 outputs=['clean:cleaned_TM1_consolidated_data']),
+    PipelineNode('finance_fees', 'r2r_pipelines.prep_fin_fee:preprocess_finance_fees',
+                 inputs=['raw:finance_fee', 'pg:r2r_finance_fees'],
+                 outputs=[]),
+    PipelineNode('first_year_fee', 'r2r_pipelines.prep_fin_fee:preprocess_first_year_fee',
+                 inputs=['raw:finance_fee', 'pg:r2r_finance_fees'],
+                 outputs=[]),
+    PipelineNode('snd', 'r2r_pipelines.prep_snd:preprocess_snd',
+                 inputs=['raw:finance_fee/S&D.xlsx'],
+                 outputs=[]),
+    PipelineNode('annual_targets', 'r2r_pipelines.prep_annual_targets:preprocess_annual_targets',
+                 inputs=['raw:annual_target'],
+                 outputs=['pg:public.annual_targets']),
+    PipelineNode('closing', 'r2r_pipelines.prep_historical_closing:preprocess_closing_data',
+                 inputs=['raw:cycle_closing', 'raw:mapping_files/ImportDateStartNEndDate.xlsx'],
+                 outputs=[]),
+    PipelineNode('cycle_week', 'r2r_pipelines.prep_cycle_week:preprocess_cycle_week',
+                 inputs=['raw:mapping_files/ImportDateStartNEndDate.xlsx'],
+                 outputs=['pg:public.academic_cycle_week']),
+    PipelineNode('ctd_enreg', 'r2r_pipelines.prep_ctd_enreg:preprocess_ctd_enreg',
+                 inputs=['pg:sf_opp_enr', 'raw:mapping_files'],
+                 outputs=['pg:public.ctd_enreg']),
+    PipelineNode('cpp_enreg', 'r2r_pipelines.prep_cpp_enreg:preprocess_cpp_enreg_data',
+                 inputs=['raw:cycle_preplanning/cpp_enreg', 'raw:cycle_preplanning/cpp_data_original.xlsx'],
+                 outputs=['clean:cleaned_cpp_enreg', 'pg:public.cpp_enreg']),
+    PipelineNode('cpp_nr', 'r2r_pipelines.prep_cpp_nr:preprocess_cpp_nr_data',
+                 inputs=['raw:cycle_preplanning/cpp_nr', 'raw:cycle_preplanning/cpp_data_original.xlsx'],
+                 outputs=['clean:cleaned_cpp_nr']),
+    PipelineNode('cpp_segment', 'r2r_pipelines.prep_cpp_segment:preprocess_cpp_by_segment',
+                 inputs=['clean:cleaned_cpp_enreg', 'clean:cleaned_cpp_nr',
+                         'raw:mapping_files/isr_fees_premium.xlsx'],
+                 outputs=['clean:cleaned_cpp_segment', 'pg:public.cpp_segment']),
+    PipelineNode('ctd_actual_vs_target', 'r2r_pipelines.prep_actual_vs_target:preprocess_actual_vs_target',
+                 inputs=['pg:public.ctd_enreg', 'clean:cleaned_cpp_enreg', 'pg:r2r_finance_fees'],
+                 outputs=['pg:public.ctd_actual_vs_target']),
+    PipelineNode('net_revenue', 'r2r_pipelines.prep_net_revenue:preprocess_net_revenue',
+                 inputs=['pg:public.ctd_enreg', 'raw:finance_fee', 'pg:r2r_finance_fees'],
+                 outputs=['pg:public.net_revenue_actual']),
+    PipelineNode('daily_ctd_enreg', 'r2r_pipelines.prep_daily_ctd_enreg:fetch_and_store_sf_opportunities',
+                 inputs=['sf:Opportunity'],
+                 outputs=['pg:staging.fact_daily_enreg']),
+    PipelineNode('lead_status_transition', 'r2r_pipelines.prep_lead_history:preprocess_lead_status_transitions',
+                 inputs=['sf:LeadHistory'],
+                 outputs=['pg:public.lead_status_transition']),
+]
+
+# Registered but run only when named: the daily Salesforce load has its own schedule and appends to its table
+ON_DEMAND_NODES = {'daily_ctd_enreg'}
+
+
+# Run switches travel to the worker processes as environment variables, read when a pipeline runs
+INCREMENTAL_ENV = "R2R_INCREMENTAL"
+MIRROR_ENV = "R2R_MIRROR"
+
+
+def _env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def incremental_enabled():
+    # Pipelines with a watermark load only new rows unless R2R_INCREMENTAL is switched off
+    return _env_flag(INCREMENTAL_ENV, True)
+
+
+def set_run_options(incremental=None, cache=None, profile=None, profile_path=None, resume=None, force=None):
+    # None leaves the current environment (or the default) in place
+    for name, value in [(INCREMENTAL_ENV, incremental), (MIRROR_ENV, cache), (PROFILE_ENV, profile),
+                        (RESUME_ENV, resume), (FORCE_ENV, force)]:
+        if value is not None:
+            os.environ[name] = "1" if value else "0"
+    if profile_path:
+        os.environ[PROFILE_PATH_ENV] = profile_path
+
+
+def discover_entry_points(package_dir=os.path.dirname(__file__)):
+    """
+    Finds the top-level preprocess_* functions of the prep_* modules without importing them.
+
+    Returns:
+    list: 'module:function' targets, in file order.
+    """
+    targets = []
+    for file_name in sorted(os.listdir(package_dir)):
+        if not (file_name.startswith('prep_') and file_name.endswith('.py')):
+            continue
+        try:
+            with open(os.path.join(package_dir, file_name), encoding='utf-8') as f:
+                tree = ast.parse(f.read())
+        except SyntaxError:
+            print(f"Skipping {file_name}: not valid Python")
+            continue
+        module_name = f"{__package__}.{file_name[:-3]}"
+        targets += [f"{module_name}:{node.name}" for node in tree.body
+                    if isinstance(node, ast.FunctionDef) and node.name.startswith('preprocess_')]
+    return targets
+
+
+def discover_nodes(nodes=PIPELINE_NODES):
+    # Registered nodes plus a node without declared datasets for every other preprocess_* entry point
+    registered = {node.target for node in nodes}
+    names = {node.name for node in nodes}
+    extra = []
+    for target in discover_entry_points():
+        if target in registered:
+            continue
+        module_name, func_name = target.split(':')
+        name = func_name[len('preprocess_'):]
+        if name in names:
+            name = f"{module_name.rsplit('.', 1)[-1][len('prep_'):]}.{name}"
+        names.add(name)
+        extra.append(PipelineNode(name, target, inputs=[], outputs=[]))
+    return list(nodes) + extra
+
+
+def get_nodes(nodes=PIPELINE_NODES):
+    return {node.name: node for node in nodes}
+
+
+def build_dependency_graph(nodes):
+    # A node depends on every other node that writes one of its inputs
+    producers = {}
+    for node in nodes:
+        for output in node.outputs:
+            producers.setdefault(output, set()).add(node.name)
+
+    return {node.name: {producer for dataset in node.inputs for producer in producers.get(dataset, set())
+                        if producer != node.name}
+            for node in nodes}
+
+
+def select_nodes(names=None, with_upstream=False, nodes=PIPELINE_NODES):
+    node_map = get_nodes(nodes)
+    if not names:
+        return [node for node in node_map.values() if node.name not in ON_DEMAND_NODES]
+
+    unknown = [name for name in names if name not in node_map]
+    if unknown:
+        raise ValueError(f"Unknown pipeline(s): {', '.join(unknown)}. Available: {', '.join(node_map)}")
+
+    selected = set(names)
+    if with_upstream:
+        graph = build_dependency_graph(node_map.values())
+        pending = list(selected)
+        while pending:
+            for upstream in graph[pending.pop()]:
+                if upstream not in selected:
+                    selected.add(upstream)
+                    pending.append(upstream)
+
+    return [node for node in node_map.values() if node.name in selected]
+
+
+def load_target(target):
+    module_name, func_name = target.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def run_node(target):
+    # Runs in a worker process; only timings and the error travel back, never the DataFrame
+    start = time.time()
+    try:
+        load_target(target)()
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return start, time.time(), error
+
+
+def critical_path(graph, timings):
+    # Longest chain of dependent nodes by duration
+    finish, previous = {}, {}
+    for name in TopologicalSorter(graph).static_order():
+        duration = timings.get(name, (0, 0))[1] - timings.get(name, (0, 0))[0]
+        upstream = max(graph[name], key=lambda dep: finish[dep], default=None)
+        finish[name] = duration + (finish[upstream] if upstream else 0)
+        previous[name] = upstream
+
+    path, name = [], max(finish, key=finish.get, default=None)
+    while name:
+        path.append(name)
+        name = previous[name]
+
+    return path[::-1], finish
+
+
+def print_run_summary(graph, results, timings, run_start):
+    path, finish = critical_path(graph, timings)
+
+    print("\nPipeline run summary")
+    print(f"{'pipeline':<25}{'status':<10}{'start (s)':>11}{'duration (s)':>14}")
+    for name, status in results.items():
+        start, end = timings.get(name, (run_start, run_start))
+        print(f"{name:<25}{status:<10}{start - run_start:>11.1f}{end - start:>14.1f}")
+
+    print(f"\nWall time: {time.time() - run_start:.1f}s")
+    if path:
+        print(f"Critical path ({finish[path[-1]]:.1f}s): {' -> '.join(path)}")
+
+
+def run_pipelines(names=None, workers=None, with_upstream=False, nodes=PIPELINE_NODES):
+    """
+    Runs the selected pipelines in dependency order, independent ones in parallel worker processes.
+
+    Parameters:
+    names (list): Pipeline names to run, all pipelines if empty.
+    workers (int): Number of worker processes, defaults to the CPU count.
+    with_upstream (bool): Also run the pipelines that produce the inputs of the selected ones.
+
+    Returns:
+    dict: Status per pipeline ('success', 'failed' or 'skipped').
+    """
+    selected = select_nodes(names, with_upstream, nodes)
+    node_map = {node.name: node for node in selected}
+    graph = build_dependency_graph(selected)
+
+    sorter = TopologicalSorter(graph)
+    sorter.prepare()
+
+    results = {name: 'pending' for name in TopologicalSorter(graph).static_order()}
+    timings = {}
+    run_start = time.time()
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        running, submitted = {}, {}
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                if any(results[dep] != 'success' for dep in graph[name]):
+                    # Upstream failed: do not run on stale inputs
+                    results[name] = 'skipped'
+                    sorter.done(name)
+                    continue
+                print(f"Starting pipeline: {name}")
+                submitted[name] = time.time()
+                running[executor.submit(run_node, node_map[name].target)] = name
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            pool_broken = False
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    start, end, error = future.result()
+                except Exception as e:
+                    # The worker died (e.g. killed for memory) or its result could not be sent back;
+                    # a dead worker breaks the pool and fails every pipeline running in it
+                    start, end, error = submitted[name], time.time(), f"{type(e).__name__}: {e}"
+                    pool_broken = pool_broken or isinstance(e, BrokenProcessPool)
+                timings[name] = (start, end)
+                results[name] = 'failed' if error else 'success'
+                if error:
+                    print(f"Pipeline {name} failed:\n{error}")
+                sorter.done(name)
+
+            if pool_broken:
+                print("A worker process died; starting new workers for the remaining pipelines")
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        executor.shutdown()
+
+    print_run_summary(graph, results, timings, run_start)
+
+    return results
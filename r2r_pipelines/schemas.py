@@ -0,0 +1,225 @@
+import pandas as pd
+
+# Target dtypes per source table, applied right after extraction:
+# 'category' for low-cardinality text, sized integers for years/months/codes, dates parsed once,
+# 'text' for string keys that arrive as numbers from some files (prog_code 2019 -> '2019').
+# Identifiers (opp_id, acc_id) and free text stay as strings.
+# These double as the contracts of the extract_ functions: enforce_schema requires every declared column.
+TABLE_SCHEMAS = {
+    'sf_opp_enr': {
+        'programme_code': 'category',
+        'opp_stage': 'category',
+        'withdrawn_pre_commencement': 'category',
+        'admission_status': 'category',
+        'programme1': 'category',
+        'intake': 'category',
+        'cycle': 'category',
+        'programme_status': 'category',
+        'programme_name': 'category',
+        'prev_prog_status': 'category',
+        'prev_stage': 'category',
+        'prev_prog_name': 'category',
+        'ipt_note': 'category',
+        'bucket_domestic_int': 'category',
+        'owner_role': 'category',
+        'market_segment': 'category',
+        'enrolledbyagent': 'category',
+        'state': 'category',
+        'prog_intake_month': 'Int16',
+        'prog_intake_year': 'Int16',
+        'intake_year': 'Int16',
+        'intake_month': 'Int16',
+        'prev_intake_year': 'Int16',
+        'prev_intake_month': 'Int16',
+        'micpa_caanz_count': 'Int16',
+        'reporting_date': 'datetime64[ns]',
+        'intakeclosingdate': 'datetime64[ns]',
+        'registered_date': 'datetime64[ns]',
+    },
+    # campus and prog_name stay strings: they are groupby keys, and categorical keys would add empty groups
+    'r2r_finance_fees': {
+        'course_desc_tm1': 'text',
+        'campus': 'text',
+        'cms_progcode': 'text',
+        'intake': 'Int32',
+        'semester': 'Int16',
+        'year': 'Int16',
+        'start_date': 'datetime64[ns]',
+        'end_date': 'datetime64[ns]',
+    },
+    # Finance fee workbooks: keyed like r2r_finance_fees so the merges on prog_name/intake/intake_semester match
+    'fees_by_segment': {
+        'prog_name': 'text',
+        'intake': 'Int32',
+        'intake_semester': 'Int16',
+        'total_tuition_fees_local': 'float64',
+        'total_tuition_fees_international': 'float64',
+    },
+    'acad_calendar': {
+        'prog_name': 'text',
+        'intake': 'Int32',
+        'intake_semester': 'Int16',
+        'start_month': 'datetime64[ns]',
+        'end_month': 'datetime64[ns]',
+    },
+    'calsace': {
+        'prog_name': 'text',
+        'intake': 'Int32',
+    },
+    # S&D sheets, after renaming
+    'snd': {
+        'bursary_deduction': 'text',
+        'intake_year': 'Int64',
+        'snd_type': 'text',
+        'campus': 'text',
+        'snd_amortized': 'float64',
+    },
+    'chdr': {
+        'bursary_deduction': 'text',
+        'intake_year': 'Int64',
+        'snd_rate': 'float64',
+        'flat_waiver': 'float64',
+    },
+    'annual_target_sheet': {
+        'prog_code': 'text',
+        'prog_name': 'text',
+        'market_segment': 'text',
+        'target_type': 'text',
+    },
+    'cycle_calendar': {
+        'prog_intake_year': 'Int64',
+        'cycle': 'text',
+        'cycle_end_date': 'datetime64[ns]',
+    },
+    'ict_calendar': {
+        'prog_intake_year': 'Int64',
+        'cycle': 'text',
+        'cycle_start_date': 'datetime64[ns]',
+        'cycle_end_date': 'datetime64[ns]',
+    },
+    'prog_master': {
+        'prog_code': 'text',
+        'prog_name': 'text',
+        'campus': 'text',
+    },
+    # Redmarch TE sheet after cleaning and labelling, as written to Parquet/Postgres
+    'mohe_enrollment': {
+        'year': 'Int64',
+        'te': 'Int64',
+        'prog_label_count': 'Int64',
+    },
+}
+TABLE_SCHEMAS['cleaned_mohe_prog_labels'] = TABLE_SCHEMAS['mohe_enrollment']
+
+# Text dates in the source tables are day-first
+DATE_FORMATS = {
+    'sf_opp_enr': '%d/%m/%Y',
+}
+
+
+# Tables whose rows go through row-wise rules (df.apply, np.where on comparisons): pd.NA is ambiguous there,
+# so their integer columns with missing values become float64, as the driver returns them, not nullable Int
+NULLS_AS_FLOAT = {'sf_opp_enr'}
+
+
+class SchemaDriftError(ValueError):
+    """An extract no longer has the columns or value types its schema declares."""
+
+
+def _to_integer(series, dtype, null_dtype=None):
+    # Plain numpy ints when nothing is missing; nullable (or null_dtype) otherwise
+    numeric = pd.to_numeric(series, errors='coerce')
+    if not numeric.isna().any():
+        return numeric.astype(dtype.lower())
+    return numeric.astype(null_dtype or dtype)
+
+
+def apply_schema(df, table, report=True):
+    """
+    Casts the columns of an extracted table to the dtypes declared in TABLE_SCHEMAS.
+
+    Parameters:
+    df (pd.DataFrame): Extracted table; columns missing from the schema are left as they are.
+    table (str): Key in TABLE_SCHEMAS.
+    report (bool): Print the memory before and after.
+
+    Returns:
+    pd.DataFrame: A new DataFrame with compact dtypes.
+    """
+    schema = TABLE_SCHEMAS[table]
+    before = df.memory_usage(deep=True).sum() if report else None
+
+    df = df.copy(deep=False)
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith('datetime64'):
+            df[col] = pd.to_datetime(df[col], format=DATE_FORMATS.get(table), errors='coerce')
+        elif dtype.startswith('Int'):
+            df[col] = _to_integer(df[col], dtype, null_dtype='float64' if table in NULLS_AS_FLOAT else None)
+        elif dtype == 'text':
+            df[col] = df[col].map(_to_text, na_action='ignore').astype(object)
+        else:
+            df[col] = df[col].astype(dtype)
+
+    if report:
+        after = df.memory_usage(deep=True).sum()
+        print(f"{table}: {before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB "
+              f"({1 - after / before:.0%} smaller, {len(df)} rows)")
+
+    return df
+
+
+def enforce_schema(df, table, report=False):
+    """
+    Checks an extract against its TABLE_SCHEMAS contract, then casts it once with apply_schema.
+
+    Parameters:
+    df (pd.DataFrame): Extracted table.
+    table (str): Key in TABLE_SCHEMAS.
+    report (bool): Print the memory before and after.
+
+    Returns:
+    pd.DataFrame: A new DataFrame whose declared columns have their declared dtypes.
+
+    Raises:
+    SchemaDriftError: A declared column is missing, or holds values that do not parse as its dtype.
+    """
+    schema = TABLE_SCHEMAS[table]
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise SchemaDriftError(f"{table}: missing columns {missing}; found {list(df.columns)}")
+
+    cast = apply_schema(df, table, report=report)
+
+    # A value that was there before the cast and is missing after it did not fit the declared type
+    drifted = []
+    for col, dtype in schema.items():
+        lost = cast[col].isna().to_numpy() & df[col].notna().to_numpy()
+        if lost.any():
+            example = df[col].to_numpy()[lost.argmax()]
+            drifted.append(f"{col} ({lost.sum()} values such as {example!r} are not {dtype})")
+    if drifted:
+        raise SchemaDriftError(f"{table}: " + "; ".join(drifted))
+
+    return cast
+
+
+def apply_output_schema(df, table):
+    """
+    Fixes the column types of a table written in chunks: declared columns as in apply_schema, every other
+    column as text. Each chunk then has the same types, whatever values it happens to hold.
+    """
+    df = apply_schema(df, table, report=False)
+    declared = TABLE_SCHEMAS[table]
+    for col in df.columns:
+        if col not in declared:
+            df[col] = df[col].map(_to_text, na_action='ignore').astype(object)
+    return df
+
+
+def _to_text(value):
+    # 2019 whether the cell came through as int or as float next to blanks
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
@@ -0,0 +1,103 @@
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config.constants import SHARE_ROOTS, MIRROR_ENABLED, MIRROR_PATH, MIRROR_WORKERS
+from r2r_pipelines.fingerprints import file_fingerprint, fingerprint_key
+from r2r_pipelines.run_log import track_source, track_share_read, current_runs, within_runs
+
+FINGERPRINT_SUFFIX = '.r2r_fp'
+
+# One lock per local file so concurrent prefetch and read threads copy it only once
+_copy_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _copy_lock(local_path):
+    with _locks_lock:
+        return _copy_locks.setdefault(local_path, threading.Lock())
+
+
+def mirror_enabled():
+    # Read at call time, so R2R_MIRROR set by the CLI reaches processes that imported the constants earlier
+    return os.getenv("R2R_MIRROR", str(MIRROR_ENABLED)).lower() in ("1", "true", "yes")
+
+
+def _share_root(path):
+    # The share root a path lives under, or None for local files
+    norm = os.path.normcase(os.path.normpath(str(path)))
+    for root in SHARE_ROOTS:
+        norm_root = os.path.normcase(os.path.normpath(root))
+        if norm == norm_root or norm.startswith(norm_root.rstrip(os.sep) + os.sep):
+            return root
+    return None
+
+
+def local_mirror_path(path, root, mirror_path=MIRROR_PATH):
+    # e.g. //10.99.75.198/Qlik/dna_sandbox/x.xlsx -> <mirror>/10.99.75.198_Qlik/dna_sandbox/x.xlsx
+    root_label = re.sub(r'[^A-Za-z0-9._-]+', '_', root).strip('_')
+    return Path(mirror_path)/root_label/os.path.relpath(os.path.normpath(str(path)), os.path.normpath(root))
+
+
+def mirror_file(path, mirror_path=MIRROR_PATH):
+    """
+    Returns a local copy of a share file, copying it only when the share version (size + mtime) changed.
+
+    Paths outside the share roots, and every path when the mirror is disabled, are returned unchanged.
+    """
+    root = _share_root(path)
+    if root is None:
+        return path
+    if not mirror_enabled():
+        track_share_read('direct', os.path.getsize(path))
+        return path
+
+    fingerprint = file_fingerprint(path)
+    source_key = fingerprint_key(fingerprint)
+    local_path = local_mirror_path(path, root, mirror_path)
+    fingerprint_file = local_path.with_name(local_path.name + FINGERPRINT_SUFFIX)
+
+    with _copy_lock(str(local_path)):
+        if local_path.exists() and fingerprint_file.exists() and fingerprint_file.read_text() == source_key:
+            track_share_read('hit', 0)
+            return local_path
+
+        os.makedirs(local_path.parent, exist_ok=True)
+        # Copy next to the target and swap in, so a reader never sees a partial file
+        tmp_path = local_path.with_name(f"{local_path.name}.{os.getpid()}.tmp")
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, local_path)
+        fingerprint_file.write_text(source_key)
+        track_share_read('miss', fingerprint['size'])
+
+    return local_path
+
+
+def share_file(path):
+    # Every read from the share goes through here: recorded for the run log, served from the local mirror
+    return mirror_file(track_source(path))
+
+
+def prefetch(directory, suffixes=('.xlsx', '.csv', '.parquet'), workers=MIRROR_WORKERS):
+    """
+    Mirrors every matching file of a share directory in parallel, ahead of a loop that reads them one by one.
+
+    Returns:
+    list: Local paths of the mirrored files.
+    """
+    if not mirror_enabled() or _share_root(directory) is None:
+        return []
+
+    files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(tuple(suffixes))]
+    runs = current_runs()
+
+    def fetch(path):
+        # Copies made here count towards the calling pipeline's run
+        with within_runs(runs):
+            return mirror_file(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fetch, files))
@@ -0,0 +1,190 @@
+"""
+Source manifests: skip a pipeline while none of its inputs changed.
+
+After a successful run of a pipeline decorated with @skip_unchanged, its manifest records a fingerprint of
+every share file the run read (size, mtime and SHA-1), of the folders it lists, of its SQL sources (row count
+and latest timestamp) and of the code (every module of the package and of config), next to a Parquet copy of
+its output. It also records where the inputs live: the share roots and path constants of config.constants, so a
+run pointed at another share (R2R_STG_DIR) never reuses an output built from the previous one. The next run
+compares all of these and, when they match, returns that output instead of running.
+A file with a new mtime but the same size is compared by hash, so a copy that did not change the content is
+still a match.
+
+R2R_FORCE=1 (run --force) runs every pipeline regardless. Skips are printed and logged as status 'skipped'.
+"""
+import functools
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from config import constants
+from config.constants import MANIFEST_PATH, PARQUET_FILE_EXTENSION
+from r2r_pipelines.fingerprints import file_fingerprint, sql_fingerprint, code_fingerprint
+from r2r_pipelines.run_log import collect_sources, track_source, set_run_status
+from r2r_pipelines.share_mirror import mirror_file
+
+FORCE_ENV = "R2R_FORCE"
+
+
+def force_enabled():
+    # Read at call time, so the CLI can switch it in the worker processes
+    return os.getenv(FORCE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def folder_fingerprint(path):
+    # Names of the files in a folder, so an added or removed file counts as a change
+    return hashlib.sha1(json.dumps(sorted(os.listdir(path))).encode()).hexdigest()
+
+
+def _content_hash(path):
+    # Hashed from the local mirror when there is one, so the share is not read twice
+    return file_fingerprint(mirror_file(path), with_hash=True)['sha1']
+
+
+def _file_unchanged(recorded):
+    try:
+        current = file_fingerprint(recorded['path'])
+    except OSError:
+        return False
+    if current['size'] != recorded['size']:
+        return False
+    return current['mtime_ns'] == recorded['mtime_ns'] or _content_hash(recorded['path']) == recorded['sha1']
+
+
+def input_locations():
+    # Share roots and the folders derived from them, as this process resolved them (R2R_STG_DIR etc.)
+    return {name: value for name, value in sorted(vars(constants).items())
+            if name.endswith(('_DIR', '_PATH')) and isinstance(value, str)}
+
+
+def changed_input(manifest, func, args_key, folders, sql_sources):
+    """
+    The first input that differs from the manifest, or None when the pipeline can be skipped.
+
+    Returns:
+    str: A short description of the change, for the log.
+    """
+    locations = input_locations()
+    recorded_locations = manifest.get('locations', {})
+    for name in locations:
+        if recorded_locations.get(name) != locations[name]:
+            return f"input location {name}"
+    if manifest['code'] != code_fingerprint(func):
+        return 'pipeline code'
+    if manifest['args'] != args_key:
+        return 'arguments'
+    for path in folders:
+        if manifest['folders'].get(str(path)) != folder_fingerprint(path):
+            return f"files in {path}"
+    for connect, table, timestamp_column in sql_sources:
+        if manifest['sql'].get(table) != sql_fingerprint(connect(), table, timestamp_column):
+            return table
+    for recorded in manifest['files']:
+        if not _file_unchanged(recorded):
+            return recorded['path']
+    return None
+
+
+def _read_manifest(manifest_file):
+    try:
+        return json.loads(manifest_file.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def read_output(output_file, manifest):
+    # Arrow stores object columns of numbers as numbers; hand them back as object columns, as the run did
+    df = pd.read_parquet(output_file, engine='pyarrow')
+    object_columns = [col for col in df.columns if str(col) in manifest['object_columns'] and df[col].dtype != object]
+    if object_columns:
+        df[object_columns] = df[object_columns].astype(object)
+    return df
+
+
+def write_manifest(pipeline, result, sources, func, args_key, folders, sql_sources, folder_path=MANIFEST_PATH):
+    """
+    Records the inputs of a successful run and a copy of its output.
+
+    Returns:
+    bool: False (and nothing recorded) when the output is not a DataFrame or cannot be stored as Parquet.
+    """
+    if not isinstance(result, pd.DataFrame):
+        return False
+
+    os.makedirs(folder_path, exist_ok=True)
+    output_file = Path(folder_path)/(pipeline + PARQUET_FILE_EXTENSION)
+    tmp_file = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+    try:
+        result.to_parquet(tmp_file, engine='pyarrow')
+    except Exception as e:
+        tmp_file.unlink(missing_ok=True)
+        print(f"{pipeline}: output cannot be kept for reuse ({e}); it will run every time")
+        return False
+    os.replace(tmp_file, output_file)
+
+    files = []
+    for path in sources:
+        try:
+            files.append(dict(file_fingerprint(path), sha1=_content_hash(path)))
+        except OSError:
+            continue
+
+    manifest = {
+        'pipeline': pipeline,
+        'recorded_at': datetime.now(timezone.utc).isoformat(),
+        'code': code_fingerprint(func),
+        'locations': input_locations(),
+        'args': args_key,
+        'folders': {str(path): folder_fingerprint(path) for path in folders},
+        'sql': {table: sql_fingerprint(connect(), table, timestamp_column)
+                for connect, table, timestamp_column in sql_sources},
+        'files': files,
+        'output': output_file.name,
+        'object_columns': [str(col) for col in result.columns[result.dtypes == object]],
+    }
+    manifest_file = Path(folder_path)/f"{pipeline}.json"
+    tmp_file = manifest_file.with_name(f"{manifest_file.name}.{os.getpid()}.tmp")
+    tmp_file.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp_file, manifest_file)
+    return True
+
+
+def skip_unchanged(pipeline, folders=(), sql_sources=(), folder_path=MANIFEST_PATH):
+    """
+    Decorator that reuses a pipeline's last output while none of its inputs changed.
+
+    Parameters:
+    pipeline (str): Name of the manifest, the runner's pipeline name.
+    folders (list): Folders the pipeline lists to find its files.
+    sql_sources (list): (engine factory, table, timestamp column) per SQL table it reads.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            args_key = repr((args, sorted(kwargs.items())))
+            manifest_file = Path(folder_path)/f"{pipeline}.json"
+            manifest = None if force_enabled() else _read_manifest(manifest_file)
+
+            if manifest is not None:
+                output_file = Path(folder_path)/manifest['output']
+                change = changed_input(manifest, func, args_key, folders, sql_sources) \
+                    if output_file.exists() else 'no stored output'
+                if change is None:
+                    print(f"Skipping {pipeline}: inputs unchanged since {manifest['recorded_at']}; reusing its last output")
+                    set_run_status(pipeline, 'skipped')
+                    for recorded in manifest['files']:
+                        track_source(recorded['path'])
+                    return read_output(output_file, manifest)
+                print(f"Running {pipeline}: {change} changed since {manifest['recorded_at']}")
+
+            with collect_sources() as sources:
+                result = func(*args, **kwargs)
+            write_manifest(pipeline, result, sources, func, args_key, folders, sql_sources, folder_path)
+            return result
+
+        return wrapper
+    return decorator
@@ -1,14 +1,17 @@
+import numpy as np
 import pandas as pd
-import os
-from urllib.parse import quote
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
+from r2r_pipelines.engine_registry import get_engine
 from config.constants import MAPPING_PATH
 from pathlib import Path
+from r2r_pipelines.instrumentation import instrument_stage
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.excel_io import read_excel
+from r2r_pipelines.schemas import enforce_schema
+from r2r_pipelines.projection import usecols
 
 def assign_intake_cycle(df, column_name='prog_intake_month'):
     """
-    Assigns 'C1', 'C2', 'C3' or NA based on the intake month using if-else statements.
+    Assigns 'C1', 'C2', 'C3' or NA based on the intake month.
 
     Parameters:
     df (pd.DataFrame): Input DataFrame.
@@ -17,26 +20,24 @@ def assign_intake_cycle(df, column_name='prog_intake_month'):
     Returns:
     pd.Series: A new column with assigned cycle values.
     """
-    df[column_name] = pd.to_numeric(df[column_name], errors='coerce')
-    
-    def get_cycle(month):
-        if pd.isna(month):
-            return pd.NA
-        elif month < 3:
-            return 'C1'
-        elif month < 7:
-            return 'C2'
-        elif month < 13:
-            return 'C3'
-        else:
-            return pd.NA
+    # Months already typed at extraction (see schemas.TABLE_SCHEMAS) are used as they are
+    if not pd.api.types.is_numeric_dtype(df[column_name]):
+        df[column_name] = pd.to_numeric(df[column_name], errors='coerce')
+
+    # Below 3 is C1, below 7 C2, below 13 C3, otherwise NA: one vectorized comparison per cycle, smallest limit wins
+    month = df[column_name]
+    cycles = np.full(len(df), pd.NA, dtype=object)
+    for limit, cycle in [(13, 'C3'), (7, 'C2'), (3, 'C1')]:
+        cycles[month.lt(limit).fillna(False).to_numpy(dtype=bool)] = cycle
 
-    return df[column_name].apply(get_cycle)
+    return pd.Series(cycles, index=df.index, name=column_name)
 
 
+@instrument_stage
 def extract_ict_calendar(file_path = MAPPING_PATH, acad_calendar_file = "ImportDateStartNEndDate.xlsx"):
     # Academic Calendar -- To get the cycle end date and create the closing dataframe
-    acad_calendar = pd.read_excel(Path(file_path)/acad_calendar_file)
+    acad_calendar = read_excel(share_file(Path(file_path)/acad_calendar_file),
+                               usecols=usecols(['IntakeYear', 'Cycle', 'StartDate', 'EndDate']))
 
     # Academic Calendar -- To get the cycle end date and create the closing dataframe
     acad_calendar.rename(columns={'IntakeYear': 'prog_intake_year', 
@@ -44,10 +45,7 @@ def extract_ict_calendar(file_path = MAPPING_PATH, acad_calendar_file = "ImportD
                                   'StartDate': 'cycle_start_date',
                                   'EndDate': 'cycle_end_date'}, inplace=True)
 
-    acad_calendar['cycle_start_date'] = pd.to_datetime(acad_calendar['cycle_start_date'])
-    acad_calendar['cycle_end_date'] = pd.to_datetime(acad_calendar['cycle_end_date'])
-    
-    return acad_calendar
+    return enforce_schema(acad_calendar, 'ict_calendar')
 
 
 def create_pg_connection(user_name = "PG_USERNAME",
@@ -55,22 +53,27 @@ def create_pg_connection(user_name = "PG_USERNAME",
                              host = "PG_HOST",
                              port = "PG_PORT",
                              database = "PG_DATABASE"):
-    load_dotenv()
-    password = os.getenv(pass_word)
-    encoded_password = quote(password)
+    # Shared pooled engine for the source database, created on first use
+    return get_engine(database=database, user_name=user_name, pass_word=pass_word, host=host, port=port)
 
-    username = os.getenv(user_name)
-    host = os.getenv(host)
-    port = os.getenv(port)
-    database = os.getenv(database)
 
-    DATABASE_URL = f"postgresql+psycopg2://{username}:{encoded_password}@{host}:{port}/{database}"
-    
-    return create_engine(DATABASE_URL)
+def flatten_sf_record(record, parent_key='', sep='_'):
+    # Flatten nested Salesforce records, skipping the attributes metadata
+    items = []
+    for k, v in record.items():
+        new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        if new_key in ['attributes_type', 'attributes_url']:
+            continue
+        if isinstance(v, dict):
+            items.extend(flatten_sf_record(v, new_key, sep=sep).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
 
 
+@instrument_stage
 def extract_prog_master(file_path = MAPPING_PATH, file_name = "prog_master_file.xlsx"):
     # read programme master file mapping
-    return pd.read_excel(Path(file_path)/file_name, sheet_name="prog_master_code")
+    return enforce_schema(read_excel(share_file(Path(file_path)/file_name), sheet_name="prog_master_code"), 'prog_master')
 
     
\ No newline at end of file
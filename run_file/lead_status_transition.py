@@ -0,0 +1,9 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from r2r_pipelines import prep_lead_history
+
+prep_lead_history.preprocess_lead_status_transitions()
+
+print("Done")
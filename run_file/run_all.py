@@ -0,0 +1,11 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from r2r_pipelines import runner
+
+# Worker processes re-import this script on Windows, so the run must sit behind the main guard
+if __name__ == "__main__":
+    runner.run_pipelines(sys.argv[1:])
+
+    print("Done")
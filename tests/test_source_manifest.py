@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+
+# A pipeline reading one share file through a path constant, as prep_snd reads S&D.xlsx from FINANCE_FEE_PATH
+PIPELINE = """
+import sys
+from pathlib import Path
+import pandas as pd
+from config.constants import FINANCE_FEE_PATH
+from r2r_pipelines.share_mirror import share_file
+from r2r_pipelines.source_manifest import skip_unchanged
+
+@skip_unchanged('snd_rates')
+def preprocess_snd_rates():
+    return pd.read_csv(share_file(Path(FINANCE_FEE_PATH)/'snd.csv'))
+
+print(preprocess_snd_rates()['snd_rate'].mean())
+"""
+
+
+def run_pipeline(share_root, manifest_path):
+    env = dict(os.environ, R2R_STG_DIR=str(share_root), R2R_MANIFEST_PATH=str(manifest_path), R2R_MIRROR='0',
+               PYTHONPATH=str(REPO_DIR))
+    env.pop('R2R_FORCE', None)
+    result = subprocess.run([sys.executable, '-c', PIPELINE], env=env, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def write_share(share_root, snd_rate):
+    from config.constants import FINANCE_FEE_PATH, STG_DIR
+    folder = share_root/os.path.relpath(FINANCE_FEE_PATH, STG_DIR)
+    folder.mkdir(parents=True)
+    pd.DataFrame({'snd_rate': [snd_rate]}).to_csv(folder/'snd.csv', index=False)
+
+
+def test_skips_while_share_unchanged(tmp_path):
+    write_share(tmp_path/'share', 0.25)
+
+    run_pipeline(tmp_path/'share', tmp_path/'manifests')
+    output = run_pipeline(tmp_path/'share', tmp_path/'manifests')
+
+    assert 'Skipping snd_rates' in output
+    assert output.strip().endswith('0.25')
+
+
+def test_reruns_when_share_root_changes(tmp_path):
+    write_share(tmp_path/'share', 0.25)
+    write_share(tmp_path/'share2', 0.75)
+
+    run_pipeline(tmp_path/'share', tmp_path/'manifests')
+    output = run_pipeline(tmp_path/'share2', tmp_path/'manifests')
+
+    assert 'Skipping' not in output
+    assert 'input location' in output
+    assert output.strip().endswith('0.75')